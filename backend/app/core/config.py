@@ -25,6 +25,70 @@ class Settings(BaseSettings):
     # Supabase Settings
     supabase_url: str = os.getenv("SUPABASE_URL", "")
     supabase_key: str = os.getenv("SUPABASE_KEY", "")
+    supabase_pool_size: int = 20              # Max open connections to Supabase
+    supabase_keepalive: int = 10              # Idle connections kept for reuse
+    supabase_timeout_seconds: float = 10.0
+    supabase_connect_timeout_seconds: float = 3.0
+    supabase_page_size: int = 1000            # Rows per keyset page; PostgREST max-rows caps it
+    supabase_prefetch_pages: int = 2          # Pages read ahead while the previous one is processed
+    
+    # Upstream Isolation Settings (per upstream: "auth" is GoTrue, "data" is PostgREST)
+    auth_timeout_seconds: float = 5.0
+    auth_max_concurrency: int = 8         # Concurrent auth calls; keep below supabase_pool_size
+    auth_max_queue: int = 32              # Auth calls allowed to wait for a slot
+    data_max_concurrency: int = 12
+    data_max_queue: int = 64
+    bulkhead_queue_timeout_seconds: float = 2.0
+    breaker_failure_threshold: int = 5    # Consecutive timeouts/5xx before failing fast
+    breaker_reset_seconds: float = 30.0   # How long to fail fast before probing again
+    
+    # Auth Settings
+    supabase_jwt_secret: str = os.getenv("SUPABASE_JWT_SECRET", "")
+    jwt_audience: str = "authenticated"
+    jwks_refresh_seconds: float = 600.0
+    token_cache_size: int = 10_000        # Verified tokens kept in memory
+    auth_remote_validation: bool = False  # Also ask Supabase once per new token (catches revocation)
+    admin_role: str = "admin"             # app_metadata role (or roles entry) of admin users
+    
+    # Catalog Cache Settings
+    catalog_ttl_seconds: float = 300.0  # Serve cached rows this long before a background refresh
+    catalog_max_rows: int = 500_000     # Total rows held across all cached tables
+    catalog_history_versions: int = 16  # Older versions clients can fetch a delta from
+    payload_buffer_depth: int = 64      # Pre-rendered /api/word-matching bodies per request shape (0 disables)
+    payload_buffer_keys: int = 256      # Request shapes buffered at once
+    catalog_columnar: bool = True       # Store rows in typed columns instead of dicts
+    catalog_shared_dir: str = ""        # Share one mmap'd catalog file between workers (empty: per process)
+    
+    # Catalog Event Settings
+    catalog_events_dir: str = ""                   # Version files sheets-sync writes after a sync (empty: not watched)
+    catalog_events_poll_seconds: float = 1.0       # How often the version files are checked
+    catalog_events_heartbeat_seconds: float = 15.0 # Keep-alive comment interval on event streams
+    catalog_events_stream_seconds: float = 300.0   # Streams end after this and the client reconnects
+    catalog_events_settle_seconds: float = 30.0    # How long to keep reloading until a synced change shows up
+
+    # Progress Ingestion Settings
+    progress_table: str = "answer_events"
+    progress_buffer_size: int = 20_000    # Buffered answer events before /api/progress returns 429
+    progress_batch_size: int = 500        # Rows per bulk insert
+    progress_flush_seconds: float = 2.0   # Longest an event waits for a full batch
+    progress_max_events: int = 200        # Events accepted per request
+    progress_spill_path: str = "/tmp/mala-lingo/progress-spill.jsonl"  # Batches Supabase could not take
+
+    # Review Scheduling Settings
+    review_max_learners: int = 100_000    # Learners whose review queues are kept in memory
+    
+    # Telemetry Settings
+    metrics_enabled: bool = False        # Serve Prometheus text on /metrics
+    tracing_enabled: bool = False        # Export OTLP spans (OTEL_EXPORTER_OTLP_* env vars)
+    server_timing_enabled: bool = False  # Add Server-Timing headers to responses
+    otel_service_name: str = os.getenv("OTEL_SERVICE_NAME", "mala-lingo-backend")
+    event_loop_lag_interval_seconds: float = 0.5
+
+    # Profiling Settings (admins only)
+    profiling_enabled: bool = False       # Mount /api/admin/profile and honor X-Profile request headers
+    profiling_max_seconds: float = 60.0   # Longest sampling run
+    profiling_interval_ms: float = 10.0   # Default time between stack samples
+    profiling_kept_profiles: int = 16     # Per-request profiles kept for download
     
     # Server Settings
     host: str = "0.0.0.0"
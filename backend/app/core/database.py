@@ -1,9 +1,198 @@
-from supabase import create_client, Client
+from typing import Any, Dict, List, Optional
+import httpx
 from .config import settings
+from .resilience import Bulkhead, CircuitBreaker
+from .telemetry import telemetry
 
-def get_supabase_client() -> Client:
+
+class DatabaseError(Exception):
+    """Error response from Supabase (PostgREST or GoTrue)"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AuthClient:
+    """Async access to the Supabase auth (GoTrue) endpoints"""
+
+    def __init__(self, db: "SupabaseClient"):
+        self._db = db
+
+    async def sign_up(self, email: str, password: str) -> Dict[str, Any]:
+        """Register a user and return the created user"""
+        data = await self._db.request(
+            "POST", "/auth/v1/signup", json={"email": email, "password": password}
+        )
+        # With auto-confirm enabled GoTrue wraps the user in a session
+        return data.get("user", data)
+
+    async def sign_in_with_password(self, email: str, password: str) -> Dict[str, Any]:
+        """Exchange credentials for a session with access_token and user"""
+        return await self._db.request(
+            "POST",
+            "/auth/v1/token",
+            params={"grant_type": "password"},
+            json={"email": email, "password": password},
+        )
+
+    async def get_user(self, token: str) -> Dict[str, Any]:
+        """Resolve an access token to its user"""
+        return await self._db.request(
+            "GET", "/auth/v1/user", headers={"Authorization": f"Bearer {token}"}
+        )
+
+
+class SupabaseClient:
+    """Non-blocking Supabase client backed by a pooled keep-alive httpx client.
+
+    The underlying connection pool is opened and closed by the application
+    lifespan; it is created lazily on first use for scripts and tests.
+
+    Auth (``/auth/...``) and data calls are isolated from each other: each
+    has its own bulkhead and circuit breaker, and auth calls their own
+    timeout, so a struggling auth service cannot use up the connections the
+    word endpoints need. Calls refused by either raise
+    UpstreamUnavailableError, which the app turns into 503 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        pool_size: int = 20,
+        keepalive: int = 10,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+    ):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.auth = AuthClient(self)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.timeouts = {
+            "auth": httpx.Timeout(settings.auth_timeout_seconds, connect=connect_timeout),
+            "data": httpx.Timeout(timeout, connect=connect_timeout),
+        }
+        self.bulkheads = {
+            "auth": Bulkhead("auth", settings.auth_max_concurrency, settings.auth_max_queue,
+                             settings.bulkhead_queue_timeout_seconds),
+            "data": Bulkhead("data", settings.data_max_concurrency, settings.data_max_queue,
+                             settings.bulkhead_queue_timeout_seconds),
+        }
+        self.breakers = {
+            name: CircuitBreaker(name, settings.breaker_failure_threshold, settings.breaker_reset_seconds)
+            for name in ("auth", "data")
+        }
+
+    async def open(self) -> None:
+        """Create the shared connection pool"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=self.url,
+            headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.keepalive,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+        )
+
+    async def close(self) -> None:
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, **kwargs) -> Any:
+        """Send a request and return the decoded JSON body"""
+        if self._client is None:
+            await self.open()
+
+        upstream = "auth" if path.startswith("/auth/") else "data"
+        breaker = self.breakers[upstream]
+        breaker.before_call()
+        try:
+            async with self.bulkheads[upstream]:
+                with telemetry.upstream(f"supabase {method} {path}"):
+                    response = await self._client.request(
+                        method, path, timeout=kwargs.pop("timeout", self.timeouts[upstream]), **kwargs
+                    )
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            raise DatabaseError(f"Supabase request failed: {str(e)}", status_code=503)
+        except BaseException:
+            breaker.release()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code >= 400:
+            raise DatabaseError(_error_message(response), status_code=response.status_code)
+        if not response.content:
+            return None
+        return response.json()
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Read rows from a table; filters use PostgREST syntax, e.g. {"id": "gt.10"}"""
+        params: Dict[str, Any] = {"select": columns}
+        params.update(filters or {})
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = limit
+        return await self.request("GET", f"/rest/v1/{table}", params=params)
+
+    async def insert(self, table: str, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> None:
+        """Insert rows into a table without returning them.
+
+        With ``ignore_duplicates`` rows whose primary key already exists are
+        skipped instead of failing the whole insert.
+        """
+        prefer = "return=minimal,resolution=ignore-duplicates" if ignore_duplicates else "return=minimal"
+        await self.request(
+            "POST",
+            f"/rest/v1/{table}",
+            json=rows,
+            headers={"Prefer": prefer},
+        )
+
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text or f"HTTP {response.status_code}"
+    if isinstance(body, dict):
+        for field in ("msg", "error_description", "message", "error"):
+            if body.get(field):
+                return str(body[field])
+    return str(body)
+
+
+def get_supabase_client() -> SupabaseClient:
     """Get Supabase client instance"""
-    return create_client(settings.supabase_url, settings.supabase_key)
+    return SupabaseClient(
+        settings.supabase_url,
+        settings.supabase_key,
+        pool_size=settings.supabase_pool_size,
+        keepalive=settings.supabase_keepalive,
+        timeout=settings.supabase_timeout_seconds,
+        connect_timeout=settings.supabase_connect_timeout_seconds,
+    )
 
 # Global client instance
-supabase: Client = get_supabase_client() 
\ No newline at end of file
+supabase: SupabaseClient = get_supabase_client()
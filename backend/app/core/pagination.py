@@ -0,0 +1,93 @@
+"""Keyset-paginated reads of whole PostgREST tables.
+
+A plain ``select`` is silently capped at PostgREST's ``max-rows`` (1000 on
+Supabase by default), and returns everything it does send in one response.
+These helpers instead read ``order=<key>.asc&limit=<page_size>`` pages, each
+starting after the last key of the previous one (``<key>=gt.<last>``), so
+every row is read exactly once however large the table grows and however it
+changes between pages. Only an empty page ends the read: a short page may
+just be capped by the server's ``max-rows``, which can be lower than
+``page_size``, so it costs one extra request per read to never stop early.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .config import settings
+
+# Marks the end of the pages in the prefetch queue
+_DONE = object()
+
+
+async def iter_pages(
+    db,
+    table: str,
+    columns: str = "*",
+    key: str = "id",
+    page_size: Optional[int] = None,
+    prefetch: Optional[int] = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield a table's rows page by page in key order.
+
+    ``db`` is a ``SupabaseClient`` (anything with its ``select``). With a
+    column projection the key column is always included. While the caller
+    works on one page, up to ``prefetch`` following pages are fetched in the
+    background; pages are fetched one after another, since each starts after
+    the last key of the one before.
+    """
+    page_size = page_size or settings.supabase_page_size
+    prefetch = prefetch if prefetch is not None else settings.supabase_prefetch_pages
+    if columns != "*" and key not in columns.split(","):
+        columns = f"{key},{columns}"
+
+    async def fetch(last: Any) -> List[Dict[str, Any]]:
+        page_filters = dict(filters or {})
+        if last is not None:
+            page_filters[key] = f"gt.{last}"
+        return await db.select(table, columns, filters=page_filters, order=f"{key}.asc", limit=page_size)
+
+    if prefetch < 1:
+        last = None
+        while True:
+            page = await fetch(last)
+            if not page:
+                return
+            yield page
+            last = page[-1][key]
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+
+    async def produce() -> None:
+        last = None
+        try:
+            while True:
+                page = await fetch(last)
+                if not page:
+                    break
+                await queue.put(page)
+                last = page[-1][key]
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            page = await queue.get()
+            if page is _DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        # The caller stopped early or failed: stop fetching
+        producer.cancel()
+
+
+async def select_all(db, table: str, **kwargs) -> List[Dict[str, Any]]:
+    """Every row of a table in key order; see iter_pages for the arguments"""
+    rows: List[Dict[str, Any]] = []
+    async for page in iter_pages(db, table, **kwargs):
+        rows.extend(page)
+    return rows
@@ -0,0 +1,209 @@
+"""On-demand profiling of a live worker, in collapsed-stack format.
+
+Two profilers, both off unless ``profiling_enabled`` is set and only for
+admins:
+
+* ``SamplingProfiler`` records every thread's Python stack at a fixed
+  interval from a background thread for a number of seconds. The event loop
+  keeps serving meanwhile; the cost is one ``sys._current_frames()`` and a
+  stack walk per thread per interval.
+* ``RequestProfiler`` traces one request deterministically: a profile hook on
+  the event loop thread sees every call and return, and bills the time
+  between them to the current stack, but only while the traced request's own
+  tasks run. It slows the loop for the length of that one request.
+
+Output is one ``frame;frame;frame count`` line per distinct stack, root
+first, as read by flamegraph.pl, speedscope and inferno. Samples count
+intervals; request profiles count microseconds.
+
+With profiling disabled neither the middleware nor the routes are installed,
+so requests pay nothing. With it enabled, a request without an ``X-Profile``
+header costs one scan of its header list.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from ..dependencies.auth import admin_from_authorization
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+# The request being traced, visible to every task it starts
+_traced: ContextVar[Optional["RequestProfiler"]] = ContextVar("traced_request", default=None)
+
+_labels: Dict[object, str] = {}
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+    return label
+
+
+def collapse(frame, root: str = "") -> str:
+    """A frame's stack as ``root;outermost;...;innermost``"""
+    names = []
+    while frame is not None:
+        names.append(_label(frame.f_code))
+        frame = frame.f_back
+    if root:
+        names.append(root)
+    return ";".join(reversed(names))
+
+
+def render_collapsed(counts: Counter) -> str:
+    """Collapsed-stack text, heaviest stacks first"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread but its own"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def run(self, seconds: float) -> Counter:
+        """Sample for ``seconds``; blocks, so run it off the event loop"""
+        counts: Counter = Counter()
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id != own:
+                    counts[collapse(frame, names.get(thread_id, str(thread_id)))] += 1
+            del frames
+            time.sleep(self.interval)
+        return counts
+
+
+class RequestProfiler:
+    """Deterministic profile of one request on the event loop thread"""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.context_token = None
+        self._last: Optional[Tuple[int, str]] = None
+
+    def __call__(self, frame, event: str, arg) -> None:
+        now = time.perf_counter_ns()
+        if _traced.get() is not self:
+            # Another task's turn: its time is not ours
+            self._last = None
+            return
+        if self._last is not None:
+            started, stack = self._last
+            self.counts[stack] += (now - started) // 1000
+        if event == "return":
+            stack = collapse(frame.f_back)
+        elif event == "c_call":
+            stack = f"{collapse(frame)};{getattr(arg, '__qualname__', repr(arg))} (C)"
+        else:
+            stack = collapse(frame)
+        self._last = (time.perf_counter_ns(), stack)
+
+
+class Profiler:
+    """Runs at most one sampling profile and one traced request at a time"""
+
+    def __init__(self, interval: float, kept_profiles: int):
+        self.interval = interval
+        self.kept_profiles = kept_profiles
+        self.profiles: "OrderedDict[str, str]" = OrderedDict()
+        self._sampling = asyncio.Lock()
+        self._tracing = False
+        self._previous_hook = None
+
+    @property
+    def sampling(self) -> bool:
+        return self._sampling.locked()
+
+    async def sample(self, seconds: float, interval: Optional[float] = None) -> str:
+        """Collapsed stacks of every thread, sampled for ``seconds``"""
+        async with self._sampling:
+            sampler = SamplingProfiler(interval or self.interval)
+            counts = await asyncio.to_thread(sampler.run, seconds)
+        logger.info(f"Sampled {sum(counts.values())} stacks over {seconds}s")
+        return render_collapsed(counts)
+
+    def trace(self) -> Optional[RequestProfiler]:
+        """Start tracing the calling task and the tasks it starts, or None if already tracing"""
+        if self._tracing:
+            return None
+        self._tracing = True
+        tracer = RequestProfiler()
+        tracer.context_token = _traced.set(tracer)
+        self._previous_hook = sys.getprofile()
+        sys.setprofile(tracer)
+        return tracer
+
+    def finish(self, tracer: RequestProfiler, profile_id: str) -> None:
+        """Stop tracing and keep the profile under ``profile_id``"""
+        sys.setprofile(self._previous_hook)
+        _traced.reset(tracer.context_token)
+        self._tracing = False
+        self.profiles[profile_id] = render_collapsed(tracer.counts)
+        while len(self.profiles) > self.kept_profiles:
+            self.profiles.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware tracing requests sent by an admin with an X-Profile header.
+
+    The response carries ``X-Profile-Id``; the profile itself is fetched from
+    ``/api/admin/profiles/{id}``.
+    """
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(name == PROFILE_HEADER for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        if not await _sent_by_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                value = profile_id if tracer is not None else "busy"
+                message = dict(message, headers=[*message.get("headers", []), (b"x-profile-id", value.encode())])
+            await send(message)
+
+        tracer = self.profiler.trace()
+        if tracer is None:
+            await self.app(scope, receive, send_with_id)
+            return
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.finish(tracer, profile_id)
+
+
+async def _sent_by_admin(scope) -> bool:
+    authorization = dict(scope["headers"]).get(b"authorization")
+    return await admin_from_authorization(authorization.decode("latin-1") if authorization else None) is not None
+
+
+# Global profiler instance
+profiler = Profiler(
+    interval=settings.profiling_interval_ms / 1000,
+    kept_profiles=settings.profiling_kept_profiles,
+)
@@ -0,0 +1,129 @@
+import asyncio
+import math
+import time
+from typing import Optional
+
+from .telemetry import telemetry
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised instead of calling an upstream that is overloaded or failing"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Bulkhead:
+    """Caps concurrent calls to one upstream, with a bounded, time-limited wait queue.
+
+    A slow upstream can then only tie up ``max_concurrency`` requests plus
+    ``max_queue`` waiters; anything beyond that is rejected immediately
+    instead of piling up and starving unrelated endpoints.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "Bulkhead":
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                telemetry.upstream_rejected(self.name, "bulkhead_full")
+                raise UpstreamUnavailableError(f"Too many pending {self.name} requests")
+            self.waiting += 1
+            # Shielded, so a timeout or cancellation never interrupts an acquire
+            # that already took the permit; _give_back returns it instead
+            acquire = asyncio.ensure_future(self._semaphore.acquire())
+            try:
+                async with asyncio.timeout(self.queue_timeout):
+                    await asyncio.shield(acquire)
+            except BaseException as e:
+                acquire.add_done_callback(self._give_back)
+                acquire.cancel()
+                if isinstance(e, TimeoutError):
+                    telemetry.upstream_rejected(self.name, "bulkhead_timeout")
+                    raise UpstreamUnavailableError(f"Timed out waiting for a {self.name} slot")
+                raise
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def _give_back(self, acquire: asyncio.Future) -> None:
+        """Release the permit of an acquire whose caller gave up, if it got one"""
+        if not acquire.cancelled() and acquire.exception() is None:
+            self._semaphore.release()
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream keeps failing, then probes for recovery.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_seconds``. It then half-opens: one probe
+    call is let through, closing the circuit on success or reopening it on
+    failure.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        """Raise UpstreamUnavailableError unless a call may go through now"""
+        if self.state == CLOSED:
+            return
+        retry_after = self._opened_at + self.reset_seconds - time.monotonic()
+        if self.state == OPEN and retry_after > 0:
+            telemetry.upstream_rejected(self.name, "circuit_open")
+            raise UpstreamUnavailableError(f"{self.name} upstream is unavailable", retry_after)
+        if self._probing:
+            telemetry.upstream_rejected(self.name, "circuit_half_open")
+            raise UpstreamUnavailableError(f"{self.name} upstream is recovering")
+        self._set_state(HALF_OPEN)
+        self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def release(self) -> None:
+        """Forget a call that ended without an outcome (e.g. it was cancelled)"""
+        self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        telemetry.circuit_state(self.name, state == OPEN)
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from jose import jwt, JWTError
+
+from .config import settings
+from .database import supabase
+from .resilience import UpstreamUnavailableError
+from .telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+JWKS_PATH = "/auth/v1/.well-known/jwks.json"
+
+
+class TokenVerificationError(Exception):
+    """Raised when an access token cannot be verified"""
+
+
+class TokenVerifier:
+    """Verifies Supabase access tokens locally and caches the verified claims.
+
+    HS256 tokens are checked against the project's JWT secret; RS256/ES256
+    tokens against the project's JWKS, which is cached and refreshed
+    periodically (or early when an unknown key id shows up). Verified claims
+    are kept in a bounded LRU until the token's ``exp``, so repeat requests
+    never leave the process. With ``remote_validation`` enabled a token is
+    also checked against Supabase once before it is cached, which catches
+    revoked sessions at the cost of one round trip per new token.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: str = "",
+        audience: str = "authenticated",
+        cache_size: int = 10_000,
+        jwks_refresh_seconds: float = 600.0,
+        remote_validation: bool = False,
+    ):
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.cache_size = cache_size
+        self.jwks_refresh_seconds = jwks_refresh_seconds
+        self.remote_validation = remote_validation
+        self._cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._jwks: List[Dict[str, Any]] = []
+        self._jwks_fetched_at = float("-inf")
+        self._jwks_lock: Optional[asyncio.Lock] = None
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims, raising TokenVerificationError if invalid"""
+        cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+        claims = self._cache.get(cache_key)
+        if claims is not None:
+            if claims.get("exp", 0) > time.time():
+                self._cache.move_to_end(cache_key)
+                telemetry.cache_lookup("token", "hit")
+                return claims
+            del self._cache[cache_key]
+
+        telemetry.cache_lookup("token", "miss")
+
+        claims = await self._decode(token)
+        if claims is None or self.remote_validation:
+            remote_claims = await self._validate_remotely(token)
+            claims = claims or remote_claims
+
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or exp <= time.time():
+            # Nothing bounds how long the result stays true; ask again next time
+            return claims
+        self._cache[cache_key] = claims
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return claims
+
+    def clear(self) -> None:
+        """Forget every cached token"""
+        self._cache.clear()
+
+    async def _decode(self, token: str) -> Optional[Dict[str, Any]]:
+        """Verify the token locally, or return None if there is no key to do so"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise TokenVerificationError(str(e))
+
+        algorithm = header.get("alg")
+        if algorithm == "HS256":
+            if not self.jwt_secret:
+                # Nothing to verify against locally, defer to Supabase
+                return None
+            key: Any = self.jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = await self._signing_key(header.get("kid"))
+        else:
+            raise TokenVerificationError(f"Unsupported token algorithm: {algorithm}")
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience or None,
+                options={"verify_aud": bool(self.audience), "require_exp": True},
+            )
+        except JWTError as e:
+            raise TokenVerificationError(str(e))
+        return claims
+
+    async def _validate_remotely(self, token: str) -> Dict[str, Any]:
+        """Ask Supabase about the token and return claims derived from its user"""
+        try:
+            user = await supabase.auth.get_user(token)
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            raise TokenVerificationError(str(e))
+        try:
+            unverified = jwt.get_unverified_claims(token)
+        except JWTError:
+            unverified = {}
+        return {
+            "sub": user.get("id"),
+            "email": user.get("email"),
+            "role": user.get("role"),
+            "aud": user.get("aud"),
+            "app_metadata": user.get("app_metadata", {}),
+            "user_metadata": user.get("user_metadata", {}),
+            # Without an exp the result is not reused
+            "exp": unverified.get("exp", 0),
+        }
+
+    async def _signing_key(self, kid: Optional[str]) -> Dict[str, Any]:
+        stale = time.monotonic() - self._jwks_fetched_at >= self.jwks_refresh_seconds
+        if stale:
+            await self._refresh_jwks(min_age=self.jwks_refresh_seconds)
+
+        key = self._find_key(kid)
+        if key is None and not stale:
+            # Keys may have been rotated since the last fetch
+            await self._refresh_jwks(min_age=30.0)
+            key = self._find_key(kid)
+        if key is None:
+            raise TokenVerificationError(f"Unknown signing key: {kid}")
+        return key
+
+    def _find_key(self, kid: Optional[str]) -> Optional[Dict[str, Any]]:
+        for key in self._jwks:
+            if kid is None or key.get("kid") == kid:
+                return key
+        return None
+
+    async def _refresh_jwks(self, min_age: float) -> None:
+        """Fetch the JWKS unless it was fetched less than min_age seconds ago"""
+        if self._jwks_lock is None:
+            self._jwks_lock = asyncio.Lock()
+        async with self._jwks_lock:
+            if time.monotonic() - self._jwks_fetched_at < min_age:
+                # Another request refreshed the keys while we waited
+                return
+            try:
+                body = await supabase.request("GET", JWKS_PATH)
+                self._jwks = body.get("keys", [])
+            except Exception as e:
+                # Keep verifying with the previous keys until Supabase is back
+                logger.warning(f"Failed to refresh JWKS: {str(e)}")
+            self._jwks_fetched_at = time.monotonic()
+
+
+def user_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape verified token claims like a Supabase user"""
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "role": claims.get("role"),
+        "aud": claims.get("aud"),
+        "app_metadata": claims.get("app_metadata", {}),
+        "user_metadata": claims.get("user_metadata", {}),
+    }
+
+
+def is_admin(user: Dict[str, Any]) -> bool:
+    """Whether the user holds the admin role in app_metadata (set only by the service role)"""
+    metadata = user.get("app_metadata") or {}
+    return metadata.get("role") == settings.admin_role or settings.admin_role in (metadata.get("roles") or [])
+
+
+# Global verifier instance
+token_verifier = TokenVerifier(
+    jwt_secret=settings.supabase_jwt_secret,
+    audience=settings.jwt_audience,
+    cache_size=settings.token_cache_size,
+    jwks_refresh_seconds=settings.jwks_refresh_seconds,
+    remote_validation=settings.auth_remote_validation,
+)
@@ -0,0 +1,280 @@
+import asyncio
+import bisect
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Upstream calls made while handling the current request, for Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _label_key(labels)
+        series = self._series.get(key)
+        if series is None:
+            # One counter per bucket, then +Inf, sum
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative:g}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, labels: Optional[Dict[str, str]] = None, amount: float = 1.0) -> None:
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Telemetry:
+    """Metrics registry, upstream spans and per-request timings.
+
+    Every hook checks a plain boolean first, so with telemetry switched off
+    the instrumented code paths pay a single attribute lookup.
+    """
+
+    def __init__(self, metrics_enabled: bool = False, tracing_enabled: bool = False,
+                 server_timing_enabled: bool = False):
+        self.metrics_enabled = metrics_enabled
+        self.tracing_enabled = tracing_enabled
+        self.server_timing_enabled = server_timing_enabled
+        self._tracer = None
+
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Time spent handling HTTP requests"
+        )
+        self.upstream_latency = Histogram(
+            "upstream_request_duration_seconds", "Time spent waiting on upstream (Supabase) calls"
+        )
+        self.upstream_errors = Counter("upstream_request_errors_total", "Failed upstream calls")
+        self.cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result")
+        self.coalesced_requests = Counter(
+            "coalesced_requests_total", "Upstream calls skipped by joining one already in flight"
+        )
+        self.upstream_rejections = Counter(
+            "upstream_rejections_total", "Upstream calls refused by a bulkhead or circuit breaker"
+        )
+        self.circuit_open = Gauge("circuit_breaker_open", "1 while an upstream's circuit breaker is open")
+        self.loop_lag = Histogram(
+            "event_loop_lag_seconds", "Delay between a scheduled wakeup and the loop running it",
+            buckets=LOOP_LAG_BUCKETS,
+        )
+        self.loop_lag_last = Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+        self._metrics = [
+            self.request_latency, self.upstream_latency, self.upstream_errors,
+            self.cache_requests, self.coalesced_requests, self.upstream_rejections,
+            self.circuit_open, self.loop_lag, self.loop_lag_last,
+        ]
+
+    @property
+    def enabled(self) -> bool:
+        return self.metrics_enabled or self.tracing_enabled or self.server_timing_enabled
+
+    def cache_lookup(self, cache: str, result: str) -> None:
+        """Count a cache lookup; result is e.g. hit, miss or stale"""
+        if self.metrics_enabled:
+            self.cache_requests.inc({"cache": cache, "result": result})
+
+    def coalesced(self, name: str) -> None:
+        """Count a caller that shared another caller's in-flight upstream call"""
+        if self.metrics_enabled:
+            self.coalesced_requests.inc({"flight": name})
+
+    def upstream_rejected(self, upstream: str, reason: str) -> None:
+        if self.metrics_enabled:
+            self.upstream_rejections.inc({"upstream": upstream, "reason": reason})
+
+    def circuit_state(self, upstream: str, is_open: bool) -> None:
+        if self.metrics_enabled:
+            self.circuit_open.set(1 if is_open else 0, {"upstream": upstream})
+
+    @contextmanager
+    def upstream(self, operation: str) -> Iterator[None]:
+        """Time an upstream call as a span, a histogram sample and a Server-Timing entry"""
+        if not self.enabled:
+            yield
+            return
+
+        span = self._tracer.start_as_current_span(operation) if self._tracer else None
+        if span is not None:
+            span.__enter__()
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.metrics_enabled:
+                self.upstream_latency.observe(elapsed, {"operation": operation})
+                if failed:
+                    self.upstream_errors.inc({"operation": operation})
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append((operation, elapsed))
+            if span is not None:
+                span.__exit__(*sys.exc_info())
+
+    def render_metrics(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def setup_tracing(self, application) -> None:
+        """Install an OTLP tracer provider and instrument FastAPI and httpx"""
+        from opentelemetry import trace
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+        from opentelemetry.sdk.trace import TracerProvider
+
+        if not isinstance(trace.get_tracer_provider(), TracerProvider):
+            # Skipped when opentelemetry-instrument already configured one
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+            provider = TracerProvider(resource=Resource.create({"service.name": settings.otel_service_name}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+
+        FastAPIInstrumentor.instrument_app(application)
+        HTTPXClientInstrumentor().instrument()
+        self._tracer = trace.get_tracer("mala-lingo")
+
+    async def monitor_event_loop(self, interval: float) -> None:
+        """Sample how late the loop wakes up from a sleep of ``interval`` seconds"""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self.loop_lag.observe(lag)
+            self.loop_lag_last.set(lag)
+
+
+class TelemetryMiddleware:
+    """ASGI middleware recording request latency and emitting Server-Timing"""
+
+    def __init__(self, app, telemetry: "Telemetry"):
+        self.app = app
+        self.telemetry = telemetry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.telemetry.server_timing_enabled:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(started, timings).encode("latin-1")))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            if self.telemetry.metrics_enabled:
+                route = scope.get("route")
+                self.telemetry.request_latency.observe(
+                    time.perf_counter() - started,
+                    {
+                        "method": scope["method"],
+                        "route": getattr(route, "path", "<unmatched>"),
+                        "status": str(status_code),
+                    },
+                )
+
+
+def _server_timing(started: float, timings: List[Tuple[str, float]]) -> str:
+    upstream_ms = sum(elapsed for _, elapsed in timings) * 1000
+    total_ms = (time.perf_counter() - started) * 1000
+    entries = [f"app;dur={total_ms:.2f}"]
+    if timings:
+        entries.append(f'upstream;dur={upstream_ms:.2f};desc="{len(timings)} calls"')
+    return ", ".join(entries)
+
+
+# Global telemetry instance
+telemetry = Telemetry(
+    metrics_enabled=settings.metrics_enabled,
+    tracing_enabled=settings.tracing_enabled,
+    server_timing_enabled=settings.server_timing_enabled,
+)
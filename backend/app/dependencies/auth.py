@@ -1,18 +1,51 @@
+from typing import Any, Dict, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from ..core.database import supabase
+from fastapi.security.utils import get_authorization_scheme_param
+from ..core.resilience import UpstreamUnavailableError
+from ..core.security import token_verifier, user_from_claims, is_admin, TokenVerificationError
 
-security = HTTPBearer()
+# A missing header is a 401 like a bad token, not HTTPBearer's default 403
+security = HTTPBearer(auto_error=False)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> Dict[str, Any]:
     """Dependency to get current authenticated user"""
-    token = credentials.credentials
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     try:
-        user = supabase.auth.get_user(token)
-        return user
-    except Exception:
+        claims = await token_verifier.verify(credentials.credentials)
+        return user_from_claims(claims)
+    except TokenVerificationError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
-        ) 
\ No newline at end of file
+        )
+
+async def get_admin_user(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """Dependency to get the current user if they are an admin"""
+    if not is_admin(user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
+
+async def admin_from_authorization(authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The admin user a raw Authorization header belongs to, or None.
+
+    For code that runs outside dependency injection, such as ASGI middleware.
+    The header is parsed the way ``security`` parses it, and any failure,
+    including an unreachable auth server, counts as not an admin.
+    """
+    scheme, token = get_authorization_scheme_param(authorization)
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user = user_from_claims(await token_verifier.verify(token))
+    except (TokenVerificationError, UpstreamUnavailableError):
+        return None
+    return user if is_admin(user) else None
@@ -0,0 +1,19 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from uuid import UUID
+from ..core.config import settings
+
+class AnswerEvent(BaseModel):
+    event_id: Optional[UUID] = None          # Set by the client so a retried batch is not stored twice
+    word_id: int
+    correct: bool
+    answered_at: Optional[datetime] = None   # Defaults to when the server received it
+    response_ms: Optional[int] = Field(None, ge=0)
+    mode: Optional[str] = Field(None, max_length=32)
+
+class ProgressBatch(BaseModel):
+    events: List[AnswerEvent] = Field(..., min_length=1, max_length=settings.progress_max_events)
+
+class ProgressAccepted(BaseModel):
+    accepted: int
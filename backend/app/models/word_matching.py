@@ -9,4 +9,25 @@ class WordMatchingEntry(BaseModel):
     category: Optional[str] = None
 
 class WordMatchingResponse(BaseModel):
-    data: List[Dict[str, Any]] 
\ No newline at end of file
+    data: List[Dict[str, Any]] 
+
+class WordMatchingSessionResponse(BaseModel):
+    rounds: List[List[Dict[str, Any]]]
+    seed: int
+    version: int
+    next_cursor: Optional[str] = None
+
+class WordMatchingCatalogResponse(BaseModel):
+    version: int
+    full: bool                      # False: data and removed are changes since the requested version
+    data: List[Dict[str, Any]]
+    removed: List[Any] = []
+
+class WordReviewResponse(BaseModel):
+    data: List[Dict[str, Any]]
+    reviews: int                               # Leading entries that are due reviews; the rest are new words
+
+class WordSearchResponse(BaseModel):
+    query: str
+    version: int
+    data: List[Dict[str, Any]]                 # Best match first
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import os
+from ..core.config import settings
+from ..core.profiling import profiler
+from ..dependencies.auth import get_admin_user
+
+# Only mounted with profiling_enabled; every route is admin-only
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(get_admin_user)])
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000)
+):
+    """Sample the stacks of the worker serving this request; returns collapsed stacks for a flamegraph"""
+    if seconds > settings.profiling_max_seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Profiles are limited to {settings.profiling_max_seconds:g} seconds"
+        )
+    if profiler.sampling:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    stacks = await profiler.sample(seconds, interval_ms / 1000 if interval_ms else None)
+    return PlainTextResponse(stacks, headers={"X-Worker-Pid": str(os.getpid())})
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str):
+    """Get the collapsed stacks of a request sent with an X-Profile header (per worker, recent ones only)"""
+    stacks = profiler.profiles.get(profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found on this worker")
+    return PlainTextResponse(stacks)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from typing import Any, Dict
+from ..dependencies.auth import get_current_user
+from ..models.progress import ProgressAccepted, ProgressBatch
+from ..services.progress_service import ProgressService
+
+router = APIRouter(prefix="/api/progress", tags=["progress"])
+
+@router.post("", status_code=202, response_model=ProgressAccepted)
+async def record_progress(batch: ProgressBatch, user: Dict[str, Any] = Depends(get_current_user)):
+    """Record a batch of answer events; they are written to the database shortly after"""
+    accepted = await ProgressService.record_answers(user, batch.events)
+    return ProgressAccepted(accepted=accepted)
@@ -1,11 +1,84 @@
-from fastapi import APIRouter
-from ..models.word_matching import WordMatchingResponse
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Optional
+from ..dependencies.auth import get_current_user
+from ..models.word_matching import (
+    WordMatchingCatalogResponse,
+    WordMatchingResponse,
+    WordMatchingSessionResponse,
+    WordReviewResponse,
+    WordSearchResponse,
+)
+from ..services.catalog_events import catalog_events
 from ..services.word_service import WordService
 
 router = APIRouter(prefix="/api", tags=["words"])
 
-@router.get("/word-matching", response_model=WordMatchingResponse)
-async def get_word_matching():
-    """Get random word matching entries for game"""
-    data = await WordService.get_random_word_matching()
-    return WordMatchingResponse(data=data) 
\ No newline at end of file
+# The body is pre-serialized (see PayloadBuffer), so the model only documents it
+@router.get("/word-matching", responses={200: {"model": WordMatchingResponse}})
+async def get_word_matching(
+    count: int = Query(5, ge=1, le=50),
+    difficulty_level: Optional[int] = None,
+    category: Optional[str] = None,
+    mode: str = Query("random", pattern="^(random|challenge)$")
+):
+    """Get random word matching entries for game; mode=challenge picks look-alike words"""
+    payload = await WordService.get_word_matching_payload(count, difficulty_level, category, mode)
+    return Response(content=payload, media_type="application/json")
+
+@router.get("/word-matching/session", response_model=WordMatchingSessionResponse)
+async def get_word_matching_session(
+    rounds: int = Query(10, ge=1, le=50),
+    count: int = Query(5, ge=1, le=50),
+    difficulty_level: Optional[int] = None,
+    category: Optional[str] = None,
+    seed: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None
+):
+    """Get a batch of game rounds; pass next_cursor back to continue the session"""
+    data = await WordService.get_word_matching_session(
+        rounds, count, difficulty_level, category, seed, cursor
+    )
+    return WordMatchingSessionResponse(**data)
+
+@router.get("/word-matching/review", response_model=WordReviewResponse)
+async def get_word_matching_review(
+    count: int = Query(5, ge=1, le=50),
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get a round of the signed-in learner's due words, filled up with new ones"""
+    data = await WordService.get_review_round(user["id"], count)
+    return WordReviewResponse(**data)
+
+@router.get("/word-matching/catalog", response_model=WordMatchingCatalogResponse)
+async def get_word_matching_catalog(
+    response: Response,
+    since: Optional[int] = Query(None, ge=0),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get every word matching entry, or only changes since a catalog version"""
+    etag, data = await WordService.get_word_matching_catalog(since, if_none_match)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if data is None:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return WordMatchingCatalogResponse(**data)
+
+@router.get("/word-matching/events")
+async def get_word_matching_events(last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: the current catalog version, then each new one as it is published"""
+    return StreamingResponse(
+        catalog_events.stream(last_event_id),
+        media_type="text/event-stream",
+        # nginx would otherwise buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/words/search", response_model=WordSearchResponse)
+async def search_words(
+    q: str = Query(..., min_length=1, max_length=64),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Search words as the user types, ranked best match first"""
+    data = await WordService.search_words(q, limit)
+    return WordSearchResponse(**data)
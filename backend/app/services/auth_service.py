@@ -1,4 +1,6 @@
 from ..core.database import supabase
+from ..core.resilience import UpstreamUnavailableError
+from ..core.security import token_verifier, user_from_claims
 from ..models.user import UserCreate, UserLogin
 from fastapi import HTTPException
 
@@ -7,11 +9,10 @@ class AuthService:
     async def create_user(user_data: UserCreate):
         """Create a new user account"""
         try:
-            response = supabase.auth.sign_up({
-                "email": user_data.email,
-                "password": user_data.password
-            })
-            return {"message": "User created successfully", "user": response.user}
+            user = await supabase.auth.sign_up(user_data.email, user_data.password)
+            return {"message": "User created successfully", "user": user}
+        except UpstreamUnavailableError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
     
@@ -19,15 +20,17 @@ class AuthService:
     async def authenticate_user(user_credentials: UserLogin):
         """Authenticate user and return session"""
         try:
-            response = supabase.auth.sign_in_with_password({
-                "email": user_credentials.email,
-                "password": user_credentials.password
-            })
+            session = await supabase.auth.sign_in_with_password(
+                user_credentials.email,
+                user_credentials.password
+            )
             return {
                 "message": "Login successful",
-                "access_token": response.session.access_token,
-                "user": response.user
+                "access_token": session["access_token"],
+                "user": session["user"]
             }
+        except UpstreamUnavailableError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -35,7 +38,9 @@ class AuthService:
     async def get_user_by_token(token: str):
         """Get user information from token"""
         try:
-            user = supabase.auth.get_user(token)
-            return {"user": user}
+            claims = await token_verifier.verify(token)
+            return {"user": user_from_claims(claims)}
+        except UpstreamUnavailableError:
+            raise
         except Exception as e:
             raise HTTPException(status_code=401, detail="Invalid token") 
\ No newline at end of file
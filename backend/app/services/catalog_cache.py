@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from ..core.config import settings
+from ..core.telemetry import telemetry
+from .catalog_file import ColumnarRows
+from .coalescing import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Sequence[Dict[str, Any]]]]
+LoadHook = Callable[["CatalogSnapshot"], None]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of a table's rows at a given version"""
+    name: str
+    version: int
+    checksum: str
+    rows: Sequence[Dict[str, Any]]
+    loaded_at: float
+    derived: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    def is_stale(self, ttl_seconds: float) -> bool:
+        return time.monotonic() - self.loaded_at >= ttl_seconds
+
+    def derive(self, key: str, builder: Callable[[List[Dict[str, Any]]], Any]) -> Any:
+        """Build a structure from the rows once per version and memoize it"""
+        if key not in self.derived:
+            self.derived[key] = builder(self.rows)
+        return self.derived[key]
+
+
+def compute_checksum(rows: List[Dict[str, Any]]) -> str:
+    """Stable content hash of a list of rows, independent of key order"""
+    payload = json.dumps(rows, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def read_version_notice(directory: str, name: str) -> Optional[int]:
+    """The version sheets-sync last published for a table (``<directory>/<name>.json``), if any"""
+    if not directory:
+        return None
+    try:
+        with open(os.path.join(directory, f"{name}.json")) as f:
+            return int(json.load(f)["version"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def compute_row_index(rows: List[Dict[str, Any]], key: str = "id") -> Dict[Any, str]:
+    """Map each row's key to a hash of its content, for diffing two versions"""
+    index = {}
+    for row in rows:
+        payload = json.dumps(row, sort_keys=True, separators=(",", ":"), default=str)
+        index[row.get(key)] = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+    return index
+
+
+class CatalogCache:
+    """In-memory cache of whole tables that refreshes itself in the background.
+
+    Readers always get the latest snapshot without touching the network; once a
+    snapshot is older than ``ttl_seconds`` it keeps being served (stale) while
+    a single background reload runs. Concurrent loads of the same table, e.g.
+    every request after a restart, share one upstream call. The version only
+    moves forward, and only when the reloaded rows actually differ, so
+    consumers can key derived structures on it and clients can tell newer
+    from older. It follows the counter sheets-sync publishes after each sync
+    (see ``read_version_notice``) and the sequence in a shared snapshot's
+    header, which every worker reads alike. Without either, versions start
+    from the load time in seconds and only this process knows them.
+
+    With ``columnar`` set, loaded rows are stored as ``ColumnarRows`` (typed
+    arrays and UTF-8 buffers) instead of a list of dicts; rows are decoded to
+    dicts only when read.
+
+    For the last ``history_size`` versions whose row index was built (see
+    ``row_index``), the index is kept after the version is replaced so clients
+    holding an older version can be sent just the difference.
+    """
+
+    def __init__(self, ttl_seconds: float, max_rows: int, history_size: int = 16, columnar: bool = False,
+                 notices_dir: str = ""):
+        self.ttl_seconds = ttl_seconds
+        self.notices_dir = notices_dir
+        self.max_rows = max_rows
+        self.columnar = columnar
+        self.history_size = history_size
+        self._loaders: Dict[str, Loader] = {}
+        self._on_load: Dict[str, LoadHook] = {}
+        self._snapshots: "OrderedDict[str, CatalogSnapshot]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._history: Dict[str, "OrderedDict[int, Dict[Any, str]]"] = {}
+        self._flight = SingleFlight("catalog")
+        self.stale_served = 0
+
+    def register(self, name: str, loader: Loader, on_load: Optional[LoadHook] = None) -> None:
+        """Register the coroutine used to (re)load a table.
+
+        ``on_load`` is called with every new version of the table as soon as
+        it is cached, e.g. to start building derived structures in the
+        background; it must not block.
+        """
+        self._loaders[name] = loader
+        if on_load is not None:
+            self._on_load[name] = on_load
+
+    async def get(self, name: str) -> CatalogSnapshot:
+        """Return the cached snapshot, loading it on first use"""
+        snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            telemetry.cache_lookup("catalog", "miss")
+            snapshot = await self._flight.do(name, lambda: self._load(name))
+        elif snapshot.is_stale(self.ttl_seconds):
+            telemetry.cache_lookup("catalog", "stale")
+            self.stale_served += 1
+            self._schedule_refresh(name)
+        else:
+            telemetry.cache_lookup("catalog", "hit")
+
+        if name in self._snapshots:
+            self._snapshots.move_to_end(name)
+        return snapshot
+
+    async def refresh(self, name: str) -> CatalogSnapshot:
+        """Reload a table now, bumping its version only if the rows changed"""
+        return await self._flight.do(name, lambda: self._load(name))
+
+    def peek(self, name: str) -> Optional[CatalogSnapshot]:
+        """Return the cached snapshot without loading or refreshing it"""
+        return self._snapshots.get(name)
+
+    def row_index(self, snapshot: CatalogSnapshot) -> Dict[Any, str]:
+        """Key -> content hash for every row of a snapshot, built once per version"""
+        return snapshot.derive("row_index", compute_row_index)
+
+    def row_index_at(self, name: str, version: int) -> Optional[Dict[Any, str]]:
+        """Row index of an earlier version, or None if it is no longer known"""
+        return self._history.get(name, {}).get(version)
+
+    @property
+    def coalesced(self) -> int:
+        """Loads that joined one already in flight instead of calling upstream"""
+        return self._flight.coalesced
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop one cached table, or all of them when no name is given"""
+        names = [name] if name is not None else list(set(self._snapshots) | set(self._loaders))
+        for key in names:
+            self._snapshots.pop(key, None)
+            self._flight.cancel(key)
+
+    def _schedule_refresh(self, name: str) -> None:
+        if self._flight.in_flight(name):
+            return
+        task = self._flight.start(name, lambda: self._load(name))
+        task.add_done_callback(lambda done: self._refresh_done(name, done))
+
+    def _refresh_done(self, name: str, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            # Keep serving the previous snapshot; the next stale read retries
+            logger.warning(f"Background refresh of {name} failed: {str(task.exception())}")
+
+    async def _load(self, name: str) -> CatalogSnapshot:
+        loader = self._loaders.get(name)
+        if loader is None:
+            raise KeyError(f"No loader registered for catalog '{name}'")
+
+        rows = await loader()
+        # Shared snapshot files (see SharedCatalog) arrive versioned and checksummed
+        checksum = getattr(rows, "checksum", None)
+        if checksum is None:
+            if len(rows) > self.max_rows:
+                logger.warning(f"Catalog {name} has {len(rows)} rows, keeping the first {self.max_rows}")
+                rows = rows[:self.max_rows]
+            checksum = compute_checksum(rows)
+
+        previous = self._snapshots.get(name)
+        if previous is not None and previous.checksum == checksum:
+            # Same content: keep the rows and anything derived from them
+            snapshot = replace(previous, loaded_at=time.monotonic())
+        else:
+            version = self._next_version(name, getattr(rows, "version", None))
+            if self.columnar and isinstance(rows, list):
+                # Keep a compact copy and let the decoded dicts go
+                rows = ColumnarRows.from_rows(rows, version, checksum)
+            if previous is not None and "row_index" in previous.derived:
+                self._remember(name, previous.version, previous.derived["row_index"])
+            snapshot = CatalogSnapshot(
+                name=name,
+                version=version,
+                checksum=checksum,
+                rows=rows,
+                loaded_at=time.monotonic(),
+            )
+        self._snapshots[name] = snapshot
+        self._snapshots.move_to_end(name)
+        self._evict(keep=name)
+        if snapshot.version != getattr(previous, "version", None) and name in self._on_load:
+            self._on_load[name](snapshot)
+        return snapshot
+
+    def _next_version(self, name: str, shared: Optional[int]) -> int:
+        """Version for changed rows: never reused in this process, and the same in every worker"""
+        notice = read_version_notice(self.notices_dir, name)
+        last = self._versions.get(name)
+        if shared is not None:
+            # The leader's sequence in the shared snapshot header
+            version = max(shared, notice or 0)
+        elif notice is not None:
+            # Rows that change before sheets-sync's notice lands get the number it is about to publish
+            version = notice if last is None or notice > last else last + 1
+        else:
+            # Nothing shared to go by: count on from the load time, so restarts keep increasing
+            version = last + 1 if last is not None else int(time.time())
+        if last is not None and version <= last:
+            version = last + 1
+        self._versions[name] = version
+        return version
+
+    def _remember(self, name: str, version: int, index: Dict[Any, str]) -> None:
+        history = self._history.setdefault(name, OrderedDict())
+        history[version] = index
+        while len(history) > self.history_size:
+            history.popitem(last=False)
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used tables until the row budget is met"""
+        total = sum(len(snapshot.rows) for snapshot in self._snapshots.values())
+        for name in list(self._snapshots):
+            if total <= self.max_rows:
+                break
+            if name == keep:
+                continue
+            total -= len(self._snapshots.pop(name).rows)
+            logger.info(f"Evicted catalog {name} from cache")
+
+
+# Global cache instance
+catalog_cache = CatalogCache(
+    ttl_seconds=settings.catalog_ttl_seconds,
+    max_rows=settings.catalog_max_rows,
+    history_size=settings.catalog_history_versions,
+    columnar=settings.catalog_columnar,
+    notices_dir=settings.catalog_events_dir,
+)
@@ -0,0 +1,202 @@
+"""Catalog version changes, fanned out to server-sent event streams.
+
+After a sync that changes a table, sheets-sync replaces ``<table>.json`` in a
+directory shared with the backend (``catalog_events_dir``). There is no
+broker: each worker runs a single task that stats those files every
+``poll_seconds``. When one changes, the task refreshes the table in the
+catalog cache. Whenever a cached table's version moves, for that reason or a
+TTL refresh, the task hands the new version to every subscriber.
+
+Subscribers are the open event streams. Each holds a one-slot queue that only
+ever keeps the latest message, so a slow client holds up nobody and buffers
+at most one event. An idle stream is just a suspended coroutine: the same
+task sends keep-alive comments to every stream, so no stream has a timer of
+its own.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+from .catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+# Queue markers besides real messages
+HEARTBEAT = object()
+CLOSE = object()
+
+# How long EventSource waits before reconnecting to an ended stream
+RECONNECT_MS = 3000
+
+
+def format_event(message: Dict[str, Any]) -> str:
+    """One ``catalog`` event in text/event-stream framing"""
+    data = json.dumps(message, separators=(",", ":"))
+    return f"id: {message['version']}\nevent: catalog\ndata: {data}\n\n"
+
+
+class CatalogEvents:
+    """Watches sheets-sync's version files and broadcasts catalog versions"""
+
+    def __init__(self, directory: str, poll_seconds: float, heartbeat_seconds: float,
+                 stream_seconds: float, settle_seconds: float):
+        self.directory = directory
+        self.tables: List[str] = []
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stream_seconds = stream_seconds
+        self.settle_seconds = settle_seconds
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._notices: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def watch(self, table: str) -> None:
+        """Announce a cached table's versions, and refresh it when sheets-sync changes it"""
+        if table not in self.tables:
+            self.tables.append(table)
+
+    async def start(self) -> None:
+        """Start the watch and fan-out task"""
+        if self._task is None:
+            # Notices already there before startup are reflected in the first load
+            self._notices = {table: self._notice_key(table) for table in self.tables}
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop watching and end every open stream"""
+        if self._task is not None:
+            for task in [self._task, *self._refreshing.values()]:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            self._task = None
+            self._refreshing.clear()
+        self.publish(CLOSE)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, message: Any) -> None:
+        """Give every subscriber the message, replacing one it has not taken yet"""
+        for queue in self._subscribers:
+            if queue.full():
+                if message is HEARTBEAT:
+                    continue
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """text/event-stream body: current versions, then every change.
+
+        The stream ends after ``stream_seconds``; EventSource reconnects by
+        itself and sends ``Last-Event-ID``, so a version the client already
+        has is not sent again.
+        """
+        queue = self.subscribe()
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            for message in list(self.latest.values()):
+                if str(message["version"]) != last_event_id:
+                    yield format_event(message)
+            deadline = time.monotonic() + self.stream_seconds
+            while True:
+                message = await queue.get()
+                if message is CLOSE:
+                    return
+                if message is HEARTBEAT:
+                    if time.monotonic() >= deadline:
+                        return
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(message)
+        finally:
+            self.unsubscribe(queue)
+
+    async def _run(self) -> None:
+        beat = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                for table in self.tables:
+                    key = self._notice_key(table)
+                    if key != self._notices.get(table):
+                        self._notices[table] = key
+                        if key is not None:
+                            self._start_refresh(table)
+                    self._broadcast_version(table)
+            except Exception as e:
+                logger.error(f"Checking catalog versions failed: {str(e)}")
+            if time.monotonic() - beat >= self.heartbeat_seconds:
+                beat = time.monotonic()
+                self.publish(HEARTBEAT)
+
+    def _broadcast_version(self, table: str) -> None:
+        snapshot = catalog_cache.peek(table)
+        if snapshot is None or self.latest.get(table, {}).get("version") == snapshot.version:
+            return
+        message = {"table": table, "version": snapshot.version, "checksum": snapshot.checksum[:16]}
+        self.latest[table] = message
+        self.publish(message)
+
+    def _start_refresh(self, table: str) -> None:
+        # A newer sync supersedes a refresh still waiting for the previous one
+        running = self._refreshing.pop(table, None)
+        if running is not None:
+            running.cancel()
+        self._refreshing[table] = asyncio.create_task(self._refresh(table))
+
+    async def _refresh(self, table: str) -> None:
+        """Reload a table sheets-sync changed until the change shows up"""
+        previous = catalog_cache.peek(table)
+        deadline = time.monotonic() + self.settle_seconds
+        delay = self.poll_seconds
+        while True:
+            try:
+                snapshot = await catalog_cache.refresh(table)
+                if previous is None or snapshot.checksum != previous.checksum:
+                    self._broadcast_version(table)
+                    return
+            except Exception as e:
+                logger.warning(f"Refreshing {table} after a sync failed: {str(e)}")
+            # Another worker may not have published the new shared snapshot yet
+            if time.monotonic() + delay > deadline:
+                logger.info(f"No change in {table} showed up within {self.settle_seconds}s of a sync")
+                return
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    def _notice_key(self, table: str) -> Optional[Tuple[int, int, int]]:
+        if not self.directory:
+            return None
+        try:
+            stat = os.stat(os.path.join(self.directory, f"{table}.json"))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+# Global catalog events instance
+catalog_events = CatalogEvents(
+    directory=settings.catalog_events_dir,
+    poll_seconds=settings.catalog_events_poll_seconds,
+    heartbeat_seconds=settings.catalog_events_heartbeat_seconds,
+    stream_seconds=settings.catalog_events_stream_seconds,
+    settle_seconds=settings.catalog_events_settle_seconds,
+)
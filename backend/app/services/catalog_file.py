@@ -0,0 +1,259 @@
+"""Immutable, columnar binary snapshot of a catalog table.
+
+Layout (native byte order; a file is only shared between processes on one
+host)::
+
+    MAGIC | u32 header length | JSON header | sections, each 8-byte aligned
+
+The header holds the version, checksum, row count and, per column, its kind
+and section offsets:
+
+* ``int``: one fixed-width integer per row (``typecode`` ``i`` or ``q``),
+  ``INT_NULL`` for missing values. Used for ids and difficulty levels.
+* ``dict``: one u32 code per row (``CODE_NULL`` for missing) into a small
+  string table. Used for low-cardinality strings such as categories.
+* ``text``: u32/u64 end offsets into one contiguous UTF-8 buffer, plus a null
+  bitmap when the column has missing values. Used for the words themselves.
+* ``json``: like ``text``, holding each value JSON-encoded (anything else).
+
+``ColumnarRows`` reads the sections in place through memoryviews, so a
+file mapped with ``open_catalog_file`` is shared by every process that maps
+it, and a dict is only built for a row when it is asked for.
+"""
+import itertools
+import json
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+MAGIC = b"MLCATv1\n"
+INT_NULL = {"i": -(2 ** 31), "q": -(2 ** 63)}
+CODE_NULL = 0xFFFFFFFF
+ALIGNMENT = 8
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def _column_kind(values: List[Any]) -> str:
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return "int"
+    if all(isinstance(value, str) for value in present):
+        # Strings that mostly repeat are stored once in a string table
+        return "dict" if len(set(present)) * 2 <= len(present) else "text"
+    return "json"
+
+
+def _text_sections(values: List[Optional[str]]) -> Tuple[Dict[str, Any], List[bytes]]:
+    encoded = [b"" if value is None else value.encode("utf-8") for value in values]
+    total = sum(len(chunk) for chunk in encoded)
+    typecode = "I" if total < 2 ** 32 else "Q"
+    ends = array(typecode)
+    position = 0
+    for chunk in encoded:
+        position += len(chunk)
+        ends.append(position)
+    sections = [ends.tobytes(), b"".join(encoded)]
+    meta: Dict[str, Any] = {"offset_typecode": typecode}
+    if any(value is None for value in values):
+        bitmap = bytearray((len(values) + 7) // 8)
+        for i, value in enumerate(values):
+            if value is None:
+                bitmap[i >> 3] |= 1 << (i & 7)
+        sections.append(bytes(bitmap))
+    return meta, sections
+
+
+def encode_catalog(rows: List[Dict[str, Any]], version: int, checksum: str) -> bytes:
+    """Serialize rows into the columnar snapshot format"""
+    names: List[str] = []
+    for row in rows:
+        for name in row:
+            if name not in names:
+                names.append(name)
+
+    columns = []
+    sections: List[bytes] = []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        kind = _column_kind(values)
+        meta: Dict[str, Any] = {"name": name, "kind": kind}
+        if kind == "int":
+            present = [value for value in values if value is not None]
+            typecode = "i" if all(-(2 ** 31) < value < 2 ** 31 for value in present) else "q"
+            null = INT_NULL[typecode]
+            meta["typecode"] = typecode
+            parts = [array(typecode, (null if value is None else value for value in values)).tobytes()]
+        elif kind == "dict":
+            strings = sorted({value for value in values if value is not None})
+            codes = {value: code for code, value in enumerate(strings)}
+            table_meta, table_parts = _text_sections(strings)
+            meta.update(table_meta)
+            parts = [array("I", (CODE_NULL if value is None else codes[value] for value in values)).tobytes()]
+            parts += table_parts
+            meta["strings"] = len(strings)
+        elif kind == "text":
+            text_meta, parts = _text_sections(values)
+            meta.update(text_meta)
+        else:
+            text_meta, parts = _text_sections(
+                [json.dumps(value, separators=(",", ":"), ensure_ascii=False) for value in values]
+            )
+            meta.update(text_meta)
+        meta["sections"] = [len(sections) + i for i in range(len(parts))]
+        sections.extend(parts)
+        columns.append(meta)
+
+    # Offsets depend on the header length, which depends on the offsets
+    header: Dict[str, Any] = {"version": version, "checksum": checksum, "rows": len(rows), "columns": columns}
+    offsets = [0] * len(sections)
+    while True:
+        header["offsets"] = offsets
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        position = _align(len(MAGIC) + 4 + len(header_bytes))
+        settled = []
+        for section in sections:
+            settled.append(position)
+            position = _align(position + len(section))
+        if settled == offsets:
+            break
+        offsets = settled
+
+    out = bytearray(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+    for offset, section in zip(offsets, sections):
+        out.extend(b"\0" * (offset - len(out)))
+        out.extend(section)
+    return bytes(out)
+
+
+def _align(position: int) -> int:
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class ColumnarRows(Sequence):
+    """Read-only sequence of row dicts decoded on demand from a snapshot buffer"""
+
+    def __init__(self, buffer: Buffer):
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError("Not a catalog snapshot")
+        (header_length,) = struct.unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(view[start:start + header_length]))
+
+        self._buffer = buffer
+        self.version: int = header["version"]
+        self.checksum: str = header["checksum"]
+        self._length: int = header["rows"]
+        self._columns: Dict[str, Dict[str, Any]] = {}
+        offsets = header["offsets"]
+        n = self._length
+
+        for meta in header["columns"]:
+            sections = [offsets[i] for i in meta["sections"]]
+            column: Dict[str, Any] = {"kind": meta["kind"]}
+            if meta["kind"] == "int":
+                size = array(meta["typecode"]).itemsize
+                column["values"] = view[sections[0]:sections[0] + n * size].cast(meta["typecode"])
+                column["null"] = INT_NULL[meta["typecode"]]
+            elif meta["kind"] == "dict":
+                column["codes"] = view[sections[0]:sections[0] + n * 4].cast("I")
+                table = self._text_view(view, meta, sections[1:], meta["strings"])
+                # The string table is small: decode it once, shared by every row
+                column["strings"] = [self._decode_text(table, i) for i in range(meta["strings"])]
+            else:
+                column.update(self._text_view(view, meta, sections, n))
+            self._columns[meta["name"]] = column
+        self.columns = list(self._columns)
+
+    @staticmethod
+    def _text_view(view: memoryview, meta: Dict[str, Any], sections: List[int], n: int) -> Dict[str, Any]:
+        typecode = meta["offset_typecode"]
+        ends = view[sections[0]:sections[0] + n * array(typecode).itemsize].cast(typecode)
+        size = ends[n - 1] if n else 0
+        text = {"ends": ends, "data": view[sections[1]:sections[1] + size], "nulls": None}
+        if len(sections) > 2:
+            text["nulls"] = view[sections[2]:sections[2] + (n + 7) // 8]
+        return text
+
+    @staticmethod
+    def _decode_text(text: Dict[str, Any], i: int) -> Optional[str]:
+        nulls = text["nulls"]
+        if nulls is not None and nulls[i >> 3] & (1 << (i & 7)):
+            return None
+        start = text["ends"][i - 1] if i else 0
+        return str(text["data"][start:text["ends"][i]], "utf-8")
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], version: int = 0, checksum: str = "") -> "ColumnarRows":
+        """Compact in-memory copy of rows; the dicts can be dropped afterwards"""
+        return cls(encode_catalog(rows, version, checksum))
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the underlying buffer"""
+        return len(self._buffer)
+
+    def value(self, i: int, name: str) -> Any:
+        """One field of row i, without building the row"""
+        column = self._columns[name]
+        kind = column["kind"]
+        if kind == "int":
+            value = column["values"][i]
+            return None if value == column["null"] else value
+        if kind == "dict":
+            code = column["codes"][i]
+            return None if code == CODE_NULL else column["strings"][code]
+        text = self._decode_text(column, i)
+        return json.loads(text) if kind == "json" else text
+
+    def values(self, name: str) -> Iterator[Any]:
+        """Every value of one column in row order (all None if the column is absent)"""
+        if name not in self._columns:
+            return itertools.repeat(None, self._length)
+        return (self.value(i, name) for i in range(self._length))
+
+    def column(self, name: str) -> Optional[Dict[str, Any]]:
+        """Raw column sections (``values``/``codes``/``strings``/...), or None"""
+        return self._columns.get(name)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return {name: self.value(index, name) for name in self.columns}
+
+
+def write_catalog_file(path: str, rows: List[Dict[str, Any]], version: int, checksum: str) -> None:
+    """Write a snapshot next to path and atomically rename it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    payload = encode_catalog(rows, version, checksum)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".catalog-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def open_catalog_file(path: str) -> ColumnarRows:
+    """Map a snapshot file read-only; the mapping lives as long as the rows"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return ColumnarRows(mapped)
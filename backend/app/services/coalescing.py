@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from ..core.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one upstream call.
+
+    The first caller for a key starts ``fn`` as a task; callers arriving while
+    it runs await the same task instead of starting their own. The task is
+    shielded, so a caller that goes away (e.g. a disconnected client) does not
+    cancel the call for everyone else.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.coalesced = 0
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the call already in flight"""
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start fn for key unless it is already running, and return its task"""
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced += 1
+            telemetry.coalesced(self.name)
+            return task
+
+        task = asyncio.get_running_loop().create_task(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return task
+
+    def in_flight(self, key: Hashable) -> bool:
+        task = self._inflight.get(key)
+        return task is not None and not task.done()
+
+    def cancel(self, key: Hashable) -> None:
+        task = self._inflight.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
@@ -0,0 +1,166 @@
+"""Nearest-neighbor ("confusable word") table for challenge rounds.
+
+For every catalog row, the positions of the ``k`` rows most easily confused
+with it: close in edit distance between transliteration keys (so Malayalam
+script and Manglish spellings compare alike), preferably in the same category
+and at a similar difficulty. Comparing every pair is quadratic, so candidates
+are the rows within a window of each row in two sort orders — by key within
+its category, and by key alone — and the distances for one window offset are
+computed for all rows at once with NumPy.
+
+The table is built once per catalog version. With a shared catalog directory
+it is saved there as ``<name>.neighbors-<checksum>.npy`` by the first worker
+to need it, and memory-mapped by the rest.
+"""
+import glob
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from .word_sampler import normalize_category, normalize_difficulty
+from .word_search import transliteration_key
+
+logger = logging.getLogger(__name__)
+
+NEIGHBORS = 8
+WINDOW = 16
+MAX_KEY_LENGTH = 12
+
+# Added to the normalized edit distance (0..1) of a candidate pair
+CATEGORY_PENALTY = 0.5
+DIFFICULTY_PENALTY = 0.15
+UNKNOWN_DIFFICULTY_PENALTY = 0.3
+
+
+def _word(row: Dict[str, Any]) -> str:
+    for field in ("malayalam_word", "english_word", "english_meaning"):
+        if row.get(field):
+            return row[field]
+    return ""
+
+
+def edit_distances(a: np.ndarray, a_lengths: np.ndarray, b: np.ndarray, b_lengths: np.ndarray) -> np.ndarray:
+    """Levenshtein distance between a[i] and b[i] for every i at once.
+
+    ``a`` and ``b`` are (n, L) uint8 arrays of padded keys; padding past a
+    key's length never affects its distance.
+    """
+    n, width = a.shape
+    # One contiguous row per DP column keeps every step a straight vector op
+    a, b = np.ascontiguousarray(a.T), np.ascontiguousarray(b.T)
+    previous = np.repeat(np.arange(width + 1, dtype=np.int16)[:, None], n, axis=1)
+    current = np.empty_like(previous)
+    # Keys of length 0 never enter the loop below
+    distances = b_lengths.astype(np.int16)
+    columns = np.arange(n)
+    for i in range(1, width + 1):
+        current[0] = i
+        best = np.minimum(previous[:-1] + (a[i - 1] != b), previous[1:] + 1)
+        for j in range(1, width + 1):
+            np.minimum(best[j - 1], current[j - 1] + 1, out=current[j])
+        done = a_lengths == i
+        distances[done] = current[b_lengths[done], columns[done]]
+        previous, current = current, previous
+    return distances
+
+
+def build_neighbor_table(rows: Sequence[Dict[str, Any]], k: int = NEIGHBORS, window: int = WINDOW) -> np.ndarray:
+    """(len(rows), k) int32 array of neighbor positions, closest first, -1 padded"""
+    started = time.perf_counter()
+    n = len(rows)
+    table = np.full((n, k), -1, dtype=np.int32)
+    if n < 2:
+        return table
+
+    keys = np.zeros((n, MAX_KEY_LENGTH), dtype=np.uint8)
+    lengths = np.zeros(n, dtype=np.int16)
+    difficulties = np.full(n, -1, dtype=np.int32)
+    categories = []
+    for position in range(n):
+        row = rows[position]
+        key = transliteration_key(_word(row)).encode("ascii")[:MAX_KEY_LENGTH]
+        keys[position, :len(key)] = np.frombuffer(key, dtype=np.uint8)
+        lengths[position] = len(key)
+        difficulty = normalize_difficulty(row.get("difficulty_level"))
+        if difficulty is not None:
+            difficulties[position] = difficulty
+        categories.append(normalize_category(row.get("category")) or "")
+    categories = np.array(categories)
+    _, category_codes = np.unique(categories, return_inverse=True)
+    category_codes[categories == ""] = -1
+
+    # lexsort's last key is the primary one: the first character
+    key_order = np.lexsort(keys.T[::-1])
+    by_category = key_order[np.argsort(category_codes[key_order], kind="stable")]
+
+    scores = np.full((n, k), np.inf)
+    for order in (by_category, key_order):
+        for offset in range(1, min(window, n - 1) + 1):
+            left, right = order[:-offset], order[offset:]
+            distance = edit_distances(keys[left], lengths[left], keys[right], lengths[right])
+            score = distance / np.maximum(np.maximum(lengths[left], lengths[right]), 1)
+            score += CATEGORY_PENALTY * ((category_codes[left] != category_codes[right]) | (category_codes[left] < 0))
+            known = (difficulties[left] >= 0) & (difficulties[right] >= 0)
+            score += np.where(
+                known,
+                DIFFICULTY_PENALTY * np.abs(difficulties[left] - difficulties[right]),
+                UNKNOWN_DIFFICULTY_PENALTY,
+            )
+            # The same word spelled the same way is no distractor
+            score[distance == 0] = np.inf
+            _keep_best(table, scores, left, right, score)
+            _keep_best(table, scores, right, left, score)
+
+    # Closest first
+    ranked = np.argsort(scores, axis=1, kind="stable")
+    table = np.take_along_axis(table, ranked, axis=1)
+    table[np.isinf(np.take_along_axis(scores, ranked, axis=1))] = -1
+    logger.info(f"Built neighbor table for {n} rows in {time.perf_counter() - started:.2f}s")
+    return table
+
+
+def _keep_best(table: np.ndarray, scores: np.ndarray, rows: np.ndarray, candidates: np.ndarray,
+               candidate_scores: np.ndarray) -> None:
+    """Replace each row's worst neighbor with its candidate when the candidate scores better"""
+    # Already a neighbor (found through the other sort order)
+    present = (table[rows] == candidates[:, None]).any(axis=1)
+    worst = np.argmax(scores[rows], axis=1)
+    better = ~present & (candidate_scores < scores[rows, worst])
+    rows, worst = rows[better], worst[better]
+    table[rows, worst] = candidates[better]
+    scores[rows, worst] = candidate_scores[better]
+
+
+def load_neighbor_table(rows: Sequence[Dict[str, Any]], checksum: str, directory: str = "",
+                        name: str = "catalog") -> np.ndarray:
+    """Neighbor table for rows, reusing one saved in directory for the same checksum"""
+    if not directory:
+        return build_neighbor_table(rows)
+
+    path = os.path.join(directory, f"{name}.neighbors-{checksum[:16]}.npy")
+    table: Optional[np.ndarray] = None
+    if os.path.exists(path):
+        table = np.load(path, mmap_mode="r")
+        if table.shape[0] == len(rows):
+            return table
+
+    table = build_neighbor_table(rows)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".neighbors-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    # Tables of older versions; workers still mapping them keep their copy
+    for old in glob.glob(os.path.join(directory, f"{name}.neighbors-*.npy")):
+        if old != path:
+            os.unlink(old)
+    return table
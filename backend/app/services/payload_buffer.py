@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable
+
+from ..core.config import settings
+from ..core.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+Renderer = Callable[[], bytes]
+
+# Payloads rendered between yields to the event loop while refilling
+REFILL_BATCH = 16
+
+
+class PayloadBuffer:
+    """Bounded queues of ready-to-send response bodies, one per request shape.
+
+    Each queue is tagged with the catalog version its payloads were rendered
+    from. A request for a newer version discards the queue before taking from
+    it, so a payload is never served from a stale catalog. Every payload is an
+    independent draw, so popping them in order keeps responses uniformly
+    random. Queues refill in the background once they drop below half of
+    ``depth``; only the ``max_keys`` most recently requested shapes are kept.
+    """
+
+    def __init__(self, depth: int, max_keys: int):
+        self.depth = depth
+        self.max_keys = max_keys
+        self._queues: "OrderedDict[Hashable, Deque[bytes]]" = OrderedDict()
+        self._versions: Dict[Hashable, int] = {}
+        self._refill_tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def take(self, key: Hashable, version: int, render: Renderer) -> bytes:
+        """Pop a buffered payload for key at version, rendering one if none is ready"""
+        if self.depth <= 0:
+            return render()
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._evict()
+        elif self._versions.get(key) != version:
+            queue.clear()
+        self._versions[key] = version
+        self._queues.move_to_end(key)
+
+        if queue:
+            telemetry.cache_lookup("payload", "hit")
+            payload = queue.popleft()
+        else:
+            telemetry.cache_lookup("payload", "miss")
+            payload = render()
+
+        if len(queue) < self.depth // 2:
+            self._schedule_refill(key, version, render)
+        return payload
+
+    def buffered(self, key: Hashable) -> int:
+        """Number of payloads ready for key"""
+        return len(self._queues.get(key, ()))
+
+    def clear(self) -> None:
+        """Drop every buffered payload"""
+        for task in self._refill_tasks.values():
+            task.cancel()
+        self._refill_tasks.clear()
+        self._queues.clear()
+        self._versions.clear()
+
+    def _schedule_refill(self, key: Hashable, version: int, render: Renderer) -> None:
+        task = self._refill_tasks.get(key)
+        if task is not None and not task.done():
+            return
+        self._refill_tasks[key] = asyncio.get_running_loop().create_task(self._refill(key, version, render))
+
+    async def _refill(self, key: Hashable, version: int, render: Renderer) -> None:
+        try:
+            while True:
+                queue = self._queues.get(key)
+                # Stop if the shape was evicted or a newer version took over
+                if queue is None or self._versions.get(key) != version or len(queue) >= self.depth:
+                    return
+                for _ in range(min(REFILL_BATCH, self.depth - len(queue))):
+                    queue.append(render())
+                await asyncio.sleep(0)
+        except Exception as e:
+            logger.warning(f"Refilling payloads for {key} failed: {str(e)}")
+        finally:
+            if self._refill_tasks.get(key) is asyncio.current_task():
+                del self._refill_tasks[key]
+
+    def _evict(self) -> None:
+        while len(self._queues) > self.max_keys:
+            key, _ = self._queues.popitem(last=False)
+            self._versions.pop(key, None)
+            task = self._refill_tasks.pop(key, None)
+            if task is not None:
+                task.cancel()
+
+
+# Global buffer instance
+payload_buffer = PayloadBuffer(
+    depth=settings.payload_buffer_depth,
+    max_keys=settings.payload_buffer_keys,
+)
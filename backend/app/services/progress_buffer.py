@@ -0,0 +1,286 @@
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import settings
+from ..core.database import supabase
+from ..core.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+Insert = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class WriteBehindBuffer:
+    """Bounded in-process buffer that writes rows to Supabase in bulk inserts.
+
+    ``offer`` only appends to memory; a background task inserts up to
+    ``batch_size`` rows at a time as soon as a batch is full or
+    ``flush_seconds`` after the oldest buffered row arrived. Once
+    ``max_rows`` are waiting, ``offer`` refuses new rows so callers can push
+    back (429) instead of growing without bound. A batch Supabase rejects or
+    cannot take is appended to a JSON-lines spill file instead of being
+    dropped, and the spill is replayed on a later flush once inserts succeed
+    again. Rows carry their own unique id, so a batch that was written but
+    reported as failed is not duplicated by the replay.
+    """
+
+    def __init__(self, insert: Insert, max_rows: int, batch_size: int, flush_seconds: float,
+                 spill_path: str = ""):
+        self.insert = insert
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spill_path = spill_path
+        self.rows: List[Dict[str, Any]] = []
+        self.spilled = 0
+        self._writing: List[List[Dict[str, Any]]] = []
+        self._oldest = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def in_flight(self) -> int:
+        """Rows of the batches being inserted right now"""
+        return sum(len(batch) for batch in self._writing)
+
+    @property
+    def pending(self) -> int:
+        """Rows accepted but not yet written or spilled"""
+        return len(self.rows) + self.in_flight
+
+    async def pending_rows(self, match: Callable[[Dict[str, Any]], bool]) -> List[Dict[str, Any]]:
+        """Accepted rows ``match`` selects that may not be in Supabase yet.
+
+        That is rows still buffered, in a batch being inserted, or spilled
+        (by any worker sharing the spill file). Read before querying the
+        table, every row is in the result or already in the table; a row
+        can be in both.
+        """
+        rows = [row for row in self.rows if match(row)]
+        rows.extend(row for batch in self._writing for row in batch if match(row))
+        if self.spill_path:
+            rows.extend(row for row in await asyncio.to_thread(self._read_spills) if match(row))
+        return rows
+
+    def offer(self, rows: List[Dict[str, Any]]) -> bool:
+        """Buffer rows for writing, or return False if there is no room for all of them"""
+        if self.pending + len(rows) > self.max_rows:
+            telemetry.upstream_rejected("progress", "buffer_full")
+            return False
+        if not self.rows:
+            self._oldest = time.monotonic()
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def start(self) -> None:
+        """Start the background flusher"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._stopping = False
+            self._claim_orphaned_spills()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and drain every buffered row (to Supabase, or the spill file)"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush(everything=True)
+
+    async def flush(self, everything: bool = False) -> None:
+        """Write what is due in batches (every row with everything), then replay any spill"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            healthy = True
+            while self.rows:
+                batch = self.rows[:self.batch_size]
+                del self.rows[:len(batch)]
+                self._oldest = time.monotonic()
+                if not await self._write(batch):
+                    healthy = False
+                    # Upstream is down; leave the rest to the next flush
+                    if not everything:
+                        break
+                elif not everything and len(self.rows) < self.batch_size:
+                    break
+            if healthy:
+                await self._replay()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            if self.rows:
+                timeout = max(0.0, self._oldest + self.flush_seconds - time.monotonic())
+            else:
+                timeout = self.flush_seconds
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Flushing buffered progress failed: {str(e)}")
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        self._writing.append(batch)
+        try:
+            await self.insert(batch)
+            return True
+        except Exception as e:
+            logger.warning(f"Insert of {len(batch)} buffered rows failed, spilling them: {str(e)}")
+            await asyncio.to_thread(self._spill, batch)
+            self.spilled += len(batch)
+            return False
+        finally:
+            # Spilled by now, if the insert failed
+            self._writing.remove(batch)
+
+    def _spill(self, batch: List[Dict[str, Any]]) -> None:
+        if not self.spill_path:
+            logger.error(f"No spill file configured, dropping {len(batch)} rows")
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+        lines = "".join(json.dumps(row, separators=(",", ":"), default=str) + "\n" for row in batch)
+        while True:
+            with open(self.spill_path, "a") as f:
+                # Other workers append to and take over the same file
+                fcntl.flock(f, fcntl.LOCK_EX)
+                if not _same_file(f, self.spill_path):
+                    # Taken for replay between our open and lock
+                    continue
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+                break
+
+    async def _replay(self) -> None:
+        """Insert spilled rows again, putting back whatever still fails"""
+        claimed = f"{self.spill_path}.{os.getpid()}.replay"
+        if not self.spill_path or not (os.path.exists(claimed) or os.path.exists(self.spill_path)):
+            return
+        rows = await asyncio.to_thread(self._take_spill, claimed)
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                await self.insert(batch)
+            except Exception as e:
+                logger.warning(f"Replaying spilled rows failed, keeping them: {str(e)}")
+                await asyncio.to_thread(self._spill, rows[start:])
+                break
+        else:
+            if rows:
+                logger.info(f"Replayed {len(rows)} spilled rows")
+        await asyncio.to_thread(os.unlink, claimed)
+
+    def _take_spill(self, claimed: str) -> List[Dict[str, Any]]:
+        # Rename under the appenders' lock so no append lands after our read
+        if not os.path.exists(claimed):
+            try:
+                with open(self.spill_path) as f:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    os.replace(self.spill_path, claimed)
+            except FileNotFoundError:
+                open(claimed, "w").close()
+        with open(claimed) as f:
+            return _read_rows(f)
+
+    def _read_spills(self) -> List[Dict[str, Any]]:
+        """Rows of the spill file and of every replay in progress"""
+        try:
+            spill = open(self.spill_path)
+        except FileNotFoundError:
+            spill = None
+        try:
+            if spill is not None:
+                # Appends and claims, which move rows between these files, wait for us
+                fcntl.flock(spill, fcntl.LOCK_EX)
+            rows = []
+            for path in glob.glob(f"{glob.escape(self.spill_path)}.*.replay"):
+                try:
+                    with open(path) as f:
+                        rows.extend(_read_rows(f))
+                except FileNotFoundError:
+                    # Replayed and removed since the glob
+                    continue
+            if spill is not None:
+                rows.extend(_read_rows(spill))
+            return rows
+        finally:
+            if spill is not None:
+                spill.close()
+
+    def _claim_orphaned_spills(self) -> None:
+        """Take over spills a dead worker was replaying"""
+        if not self.spill_path:
+            return
+        for path in glob.glob(f"{glob.escape(self.spill_path)}.*.replay"):
+            pid = int(path.rsplit(".", 2)[-2])
+            if pid == os.getpid() or _alive(pid):
+                continue
+            claimed = f"{self.spill_path}.{os.getpid()}.replay"
+            if os.path.exists(claimed):
+                continue
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+
+
+def _read_rows(f) -> List[Dict[str, Any]]:
+    rows = []
+    for line in f:
+        # A worker killed mid-write can leave a torn last line
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            logger.warning("Skipping a corrupt line in the progress spill file")
+    return rows
+
+
+def _same_file(f, path: str) -> bool:
+    try:
+        return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+async def _insert_answers(rows: List[Dict[str, Any]]) -> None:
+    await supabase.insert(settings.progress_table, rows, ignore_duplicates=True)
+
+
+# Global progress buffer instance
+progress_buffer = WriteBehindBuffer(
+    insert=_insert_answers,
+    max_rows=settings.progress_buffer_size,
+    batch_size=settings.progress_batch_size,
+    flush_seconds=settings.progress_flush_seconds,
+    spill_path=settings.progress_spill_path,
+)
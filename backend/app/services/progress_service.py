@@ -0,0 +1,37 @@
+from ..core.config import settings
+from ..models.progress import AnswerEvent
+from .progress_buffer import progress_buffer
+from .review_scheduler import review_scheduler
+from typing import Any, Dict, List
+from datetime import datetime, timezone
+from fastapi import HTTPException
+import uuid
+
+class ProgressService:
+    @staticmethod
+    async def record_answers(user: Dict[str, Any], events: List[AnswerEvent]) -> int:
+        """Queue a learner's answer events for a batched write to Supabase"""
+        received_at = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {
+                # Lets retried inserts and client retries skip rows that already made it
+                "event_id": str(event.event_id or uuid.uuid4()),
+                "user_id": user["id"],
+                "word_id": event.word_id,
+                "correct": event.correct,
+                "response_ms": event.response_ms,
+                "mode": event.mode,
+                "answered_at": event.answered_at.isoformat() if event.answered_at else received_at,
+                "received_at": received_at,
+            }
+            for event in events
+        ]
+        if not progress_buffer.offer(rows):
+            raise HTTPException(
+                status_code=429,
+                detail="Too many progress events pending, retry shortly",
+                headers={"Retry-After": str(max(1, round(settings.progress_flush_seconds)))}
+            )
+        # Reschedules the words in the learner's review queue right away
+        review_scheduler.record(rows)
+        return len(rows)
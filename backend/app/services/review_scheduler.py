@@ -0,0 +1,232 @@
+"""Spaced-repetition (SM-2) review scheduling per learner.
+
+Every word a learner has answered gets a card: an SM-2 ease factor, the
+current interval and the time it is next due. A learner's cards sit in a
+min-heap keyed by due time, so "the next n due words" walks only the top of
+the heap (O(n log n) however many cards the learner has), and an answer
+updates one card and pushes one heap entry. A rescheduled card leaves its old
+entry behind; entries whose due time no longer matches their card are
+skipped, and dropped when the heap is rebuilt.
+
+Queues are kept for the most recently active learners. A learner's queue is
+loaded from their answer events the first time it is asked for, then updated
+in place as this worker records their answers. Answers of learners without a
+queue are left to the answer table, where the first load finds them. With
+several workers, answers recorded by another worker reach this one's copy
+when it is next loaded.
+"""
+import heapq
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.database import supabase
+from ..core.pagination import select_all
+from .coalescing import SingleFlight
+from .progress_buffer import progress_buffer
+
+DAY = 86_400.0
+START_EASE = 2.5
+MIN_EASE = 1.3
+RELEARN_SECONDS = 600.0    # A missed word comes back within the same sitting
+FAST_ANSWER_MS = 3_000     # Correct answers this fast count as easy recalls
+SLOW_ANSWER_MS = 15_000    # ... and this slow as hard ones
+MAX_UNLOADED_EVENTS = 1_000
+
+HISTORY_COLUMNS = "event_id,word_id,correct,response_ms,answered_at"
+
+LoadHistory = Callable[[str], Awaitable[List[Dict[str, Any]]]]
+
+
+def answer_quality(correct: bool, response_ms: Optional[int] = None) -> int:
+    """SM-2 recall quality (0..5) of one answer"""
+    if not correct:
+        return 1
+    if response_ms is None:
+        return 4
+    if response_ms <= FAST_ANSWER_MS:
+        return 5
+    return 3 if response_ms >= SLOW_ANSWER_MS else 4
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class Card:
+    """SM-2 state of one word for one learner; times are epoch seconds"""
+
+    __slots__ = ("due", "interval", "ease", "repetitions")
+
+    def __init__(self):
+        self.due = 0.0
+        self.interval = 0.0
+        self.ease = START_EASE
+        self.repetitions = 0
+
+    def review(self, quality: int, at: float) -> None:
+        """Reschedule after an answer of the given quality at time ``at``"""
+        if quality >= 3:
+            if self.repetitions == 0:
+                self.interval = DAY
+            elif self.repetitions == 1:
+                self.interval = 6 * DAY
+            else:
+                self.interval *= self.ease
+            self.repetitions += 1
+            self.due = at + self.interval
+        else:
+            self.repetitions = 0
+            self.interval = 0.0
+            self.due = at + RELEARN_SECONDS
+        miss = 5 - quality
+        self.ease = max(MIN_EASE, self.ease + 0.1 - miss * (0.08 + miss * 0.02))
+
+
+class LearnerQueue:
+    """One learner's cards and a min-heap of their (due, word_id) entries"""
+
+    __slots__ = ("cards", "heap", "loaded", "unloaded_events")
+
+    def __init__(self):
+        self.cards: Dict[int, Card] = {}
+        self.heap: List[Tuple[float, int]] = []
+        self.loaded = False
+        # Answers recorded while the history loads, merged in by the load
+        self.unloaded_events: List[Dict[str, Any]] = []
+
+    def review(self, word_id: int, quality: int, at: float) -> None:
+        """Apply one answer to the word's card and index its new due time"""
+        card = self.cards.get(word_id)
+        if card is None:
+            card = self.cards[word_id] = Card()
+        card.review(quality, at)
+        heapq.heappush(self.heap, (card.due, word_id))
+        if len(self.heap) > 2 * len(self.cards) + 64:
+            # Mostly stale entries: rebuild from the cards
+            self.heap = [(card.due, word_id) for word_id, card in self.cards.items()]
+            heapq.heapify(self.heap)
+
+    def due(self, now: float, limit: int, keep: Optional[Callable[[int], bool]] = None) -> List[int]:
+        """Up to ``limit`` words due at ``now``, most overdue first.
+
+        Visits heap entries in due order without popping them: a second,
+        small heap holds the frontier of heap positions still to look at.
+        Words ``keep`` rejects are passed over.
+        """
+        heap, cards = self.heap, self.cards
+        found: List[int] = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(found) < limit:
+            (due, word_id), index = heapq.heappop(frontier)
+            if due > now:
+                break
+            if cards[word_id].due == due and word_id not in found and (keep is None or keep(word_id)):
+                found.append(word_id)
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+
+class ReviewScheduler:
+    """Review queues of the most recently active learners, bounded LRU"""
+
+    def __init__(self, load_history: LoadHistory, max_learners: int):
+        self.load_history = load_history
+        self.max_learners = max_learners
+        self._learners: "OrderedDict[str, LearnerQueue]" = OrderedDict()
+        self._flight = SingleFlight("review_history")
+
+    def __len__(self) -> int:
+        return len(self._learners)
+
+    def record(self, rows: List[Dict[str, Any]]) -> None:
+        """Apply answer rows, as written to the progress table, to the learners' queues"""
+        for row in rows:
+            user_id = row["user_id"]
+            queue = self._learners.get(user_id)
+            if queue is None:
+                # Nobody asked for this learner's reviews; a first load reads the table
+                continue
+            if queue.loaded:
+                self._learners.move_to_end(user_id)
+                queue.review(row["word_id"], answer_quality(row["correct"], row.get("response_ms")),
+                             _timestamp(row["answered_at"]))
+            else:
+                queue.unloaded_events.append(row)
+                if len(queue.unloaded_events) > MAX_UNLOADED_EVENTS:
+                    # Not worth holding; by the next load most are in the table
+                    del self._learners[user_id]
+
+    async def learner(self, user_id: str) -> LearnerQueue:
+        """A learner's queue, loading their answer history on first use"""
+        queue = self._learners.get(user_id)
+        if queue is not None and queue.loaded:
+            self._learners.move_to_end(user_id)
+            return queue
+
+        if queue is None:
+            # From here on this learner's answers are held for the load to merge
+            self._queue(user_id)
+        history = await self._flight.do(user_id, lambda: self.load_history(user_id))
+        queue = self._learners.get(user_id)
+        if queue is None:
+            # Dropped while loading: answer from the history and load again next time
+            queue = LearnerQueue()
+        if not queue.loaded:
+            # Answers recorded while loading may or may not be in the history
+            events = {row["event_id"]: row for row in queue.unloaded_events}
+            events.update((row["event_id"], row) for row in history)
+            timed = sorted(((_timestamp(row["answered_at"]), row) for row in events.values()),
+                           key=lambda item: item[0])
+            for at, row in timed:
+                queue.review(row["word_id"], answer_quality(row["correct"], row.get("response_ms")), at)
+            queue.loaded = True
+            queue.unloaded_events = []
+        return queue
+
+    async def due_words(self, user_id: str, limit: int, now: Optional[float] = None,
+                        keep: Optional[Callable[[int], bool]] = None) -> List[int]:
+        """Up to ``limit`` of a learner's due words, most overdue first"""
+        queue = await self.learner(user_id)
+        return queue.due(time.time() if now is None else now, limit, keep)
+
+    def _queue(self, user_id: str) -> LearnerQueue:
+        queue = self._learners.get(user_id)
+        if queue is not None:
+            self._learners.move_to_end(user_id)
+            return queue
+        queue = self._learners[user_id] = LearnerQueue()
+        while len(self._learners) > self.max_learners:
+            self._learners.popitem(last=False)
+        return queue
+
+
+async def _load_answer_history(user_id: str) -> List[Dict[str, Any]]:
+    # Answers recorded before the learner had a queue but not written yet. Taken
+    # before the read, so a batch written meanwhile is in one or the other.
+    pending = await progress_buffer.pending_rows(lambda row: row["user_id"] == user_id)
+    rows = await select_all(
+        supabase,
+        settings.progress_table,
+        columns=HISTORY_COLUMNS,
+        key="event_id",
+        filters={"user_id": f"eq.{user_id}"},
+    )
+    return rows + pending
+
+
+# Global review scheduler instance
+review_scheduler = ReviewScheduler(
+    load_history=_load_answer_history,
+    max_learners=settings.review_max_learners,
+)
@@ -0,0 +1,108 @@
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .catalog_cache import compute_checksum, read_version_notice
+from .catalog_file import ColumnarRows, open_catalog_file, write_catalog_file
+
+logger = logging.getLogger(__name__)
+
+Fetch = Callable[[], Awaitable[List[Dict[str, Any]]]]
+
+
+class SharedCatalog:
+    """One catalog snapshot file shared by every worker process on a host.
+
+    Whichever worker holds an exclusive lock on ``<path>.lock`` is the leader:
+    only it calls ``fetch`` (i.e. Supabase), and when the rows changed it
+    writes a new snapshot beside the old one and renames it over ``path``.
+    Every worker, the leader included, maps the current file read-only, so
+    the rows live once in the page cache rather than once per process. Old
+    mappings stay valid until the last snapshot using them is dropped. If the
+    leader exits, its lock is released and the next worker to load takes over.
+    """
+
+    def __init__(self, path: str, fetch: Fetch, wait_seconds: float = 10.0,
+                 version_notice: Callable[[], Optional[int]] = lambda: None):
+        self.path = path
+        self.fetch = fetch
+        self.version_notice = version_notice
+        self.wait_seconds = wait_seconds
+        self._lock_file = None
+        self._mapped: Optional[ColumnarRows] = None
+        self._mapped_key: Optional[Tuple[int, int, int]] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    async def load(self) -> ColumnarRows:
+        """Return the current snapshot, publishing a new one first if this worker leads"""
+        if self._try_lead():
+            return await self._publish()
+
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            current = self._current()
+            if current is not None:
+                return current
+            if self._try_lead():
+                return await self._publish()
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"No catalog snapshot was published to {self.path}")
+            # The leader is still writing the first snapshot
+            await asyncio.sleep(0.1)
+
+    async def _publish(self) -> ColumnarRows:
+        rows = await self.fetch()
+        checksum = compute_checksum(rows)
+        current = self._current()
+        if current is not None and current.checksum == checksum:
+            return current
+
+        # One sequence for every worker: sheets-sync's counter, else the time, never going back
+        notice = self.version_notice()
+        version = max(current.version + 1 if current is not None else 0,
+                      notice if notice is not None else int(time.time()))
+        await asyncio.to_thread(write_catalog_file, self.path, rows, version, checksum)
+        logger.info(f"Published catalog snapshot {self.path} version {version} ({len(rows)} rows)")
+        return self._current()
+
+    def _current(self) -> Optional[ColumnarRows]:
+        """Map the file at path, reusing the mapping while the file is unchanged"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._mapped_key:
+            self._mapped = open_catalog_file(self.path)
+            self._mapped_key = key
+        return self._mapped
+
+    def _try_lead(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        logger.info(f"Worker {os.getpid()} now publishes {self.path}")
+        self._lock_file = lock_file
+        return True
+
+
+def shared_loader(directory: str, name: str, fetch: Fetch, notices_dir: str = "") -> Callable[[], Awaitable[Any]]:
+    """Loader for CatalogCache.register: fetch itself, or via a SharedCatalog if directory is set"""
+    if not directory:
+        return fetch
+    return SharedCatalog(
+        os.path.join(directory, f"{name}.bin"), fetch,
+        version_notice=lambda: read_version_notice(notices_dir, name),
+    ).load
@@ -0,0 +1,205 @@
+import random
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .catalog_file import ColumnarRows
+
+BucketKey = Tuple[Optional[int], Optional[str]]
+
+MASK64 = (1 << 64) - 1
+
+
+def normalize_difficulty(value: Any) -> Optional[int]:
+    """Coerce a difficulty value from the database or a query string to an int"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_category(value: Any) -> Optional[str]:
+    """Case- and whitespace-insensitive category key"""
+    if value is None:
+        return None
+    key = str(value).strip().lower()
+    return key or None
+
+
+def _mix64(value: int) -> int:
+    """splitmix64 finalizer: a cheap, well-distributed integer hash"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+class SeededPermutation:
+    """Random permutation of range(n) where any position is computed in O(1).
+
+    A balanced Feistel network over the smallest even-bit domain covering n,
+    with cycle walking to stay inside range(n). The same seed always yields
+    the same order, so a consumer can resume at any offset without
+    materializing or replaying the permutation.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, n: int, seed: int):
+        self.n = n
+        self.seed = seed & MASK64
+        half_bits = max(1, ((max(n, 2) - 1).bit_length() + 1) // 2)
+        self._half_bits = half_bits
+        self._half_mask = (1 << half_bits) - 1
+        self._keys = [_mix64(self.seed ^ _mix64(r)) for r in range(self.ROUNDS)]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.n:
+            raise IndexError(index)
+        value = self._encrypt(index)
+        # The domain is at most 4n, so this walks a couple of steps on average
+        while value >= self.n:
+            value = self._encrypt(value)
+        return value
+
+    def _encrypt(self, value: int) -> int:
+        left = value >> self._half_bits
+        right = value & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix64(key ^ right) & self._half_mask)
+        return (left << self._half_bits) | right
+
+
+def _column(rows: Sequence[Dict[str, Any]], name: str) -> Iterable[Any]:
+    if isinstance(rows, ColumnarRows):
+        return rows.values(name)
+    return (row.get(name) for row in rows)
+
+
+def row_positions(rows: Sequence[Dict[str, Any]]) -> Dict[Any, int]:
+    """Position of every row by id"""
+    return {row_id: position for position, row_id in enumerate(_column(rows, "id"))}
+
+
+class WordSampler:
+    """Random sampler over catalog rows with per-bucket index arrays.
+
+    Every row position is recorded in four buckets: all rows, its difficulty,
+    its category, and its (difficulty, category) pair. A filtered draw picks k
+    offsets into the matching bucket, so it costs O(k) regardless of how large
+    the catalog is or how rare the bucket is.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]]):
+        self.rows = rows
+        self._buckets: Dict[BucketKey, array] = {}
+
+        # Reads the two columns without building a dict per row
+        categories: Dict[Any, Optional[str]] = {}
+        columns = zip(_column(rows, "difficulty_level"), _column(rows, "category"))
+        for position, (raw_difficulty, raw_category) in enumerate(columns):
+            difficulty = normalize_difficulty(raw_difficulty)
+            if raw_category not in categories:
+                categories[raw_category] = normalize_category(raw_category)
+            category = categories[raw_category]
+            self._add((None, None), position)
+            if difficulty is not None:
+                self._add((difficulty, None), position)
+            if category is not None:
+                self._add((None, category), position)
+            if difficulty is not None and category is not None:
+                self._add((difficulty, category), position)
+
+    def _add(self, key: BucketKey, position: int) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = array("I")
+        bucket.append(position)
+
+    def bucket_size(self, difficulty_level: Optional[int] = None, category: Optional[str] = None) -> int:
+        """Number of rows matching the given filters"""
+        return len(self._bucket(difficulty_level, category))
+
+    def sample(
+        self,
+        count: int,
+        difficulty_level: Optional[int] = None,
+        category: Optional[str] = None,
+        rng: Optional[random.Random] = None,
+    ) -> List[Dict[str, Any]]:
+        """Draw up to ``count`` distinct rows matching the filters"""
+        bucket = self._bucket(difficulty_level, category)
+        if len(bucket) <= count:
+            return [self.rows[position] for position in bucket]
+
+        # Sampling offsets from a range avoids copying the bucket
+        offsets = (rng or random).sample(range(len(bucket)), count)
+        return [self.rows[bucket[offset]] for offset in offsets]
+
+    def challenge(
+        self,
+        count: int,
+        neighbors: Sequence[Sequence[int]],
+        difficulty_level: Optional[int] = None,
+        category: Optional[str] = None,
+        rng: Optional[random.Random] = None,
+    ) -> List[Dict[str, Any]]:
+        """Draw a random row plus rows easily confused with it, from a neighbor table.
+
+        ``neighbors[position]`` lists the positions of a row's neighbors,
+        closest first, padded with -1. Neighbors outside the filters are
+        skipped, and the round is topped up with random rows, so it costs
+        O(count) like ``sample``.
+        """
+        rng = rng or random
+        bucket = self._bucket(difficulty_level, category)
+        if len(bucket) <= count:
+            return [self.rows[position] for position in bucket]
+
+        difficulty_level = normalize_difficulty(difficulty_level)
+        category = normalize_category(category)
+        anchor = bucket[rng.randrange(len(bucket))]
+        chosen = [anchor]
+        for position in neighbors[anchor]:
+            if len(chosen) == count or position < 0:
+                break
+            position = int(position)
+            if position not in chosen and self._matches(position, difficulty_level, category):
+                chosen.append(position)
+        while len(chosen) < count:
+            position = bucket[rng.randrange(len(bucket))]
+            if position not in chosen:
+                chosen.append(position)
+
+        rng.shuffle(chosen)
+        return [self.rows[position] for position in chosen]
+
+    def permuted(
+        self,
+        seed: int,
+        start: int,
+        stop: int,
+        difficulty_level: Optional[int] = None,
+        category: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Rows at positions [start, stop) of a seeded shuffle of the matching bucket"""
+        bucket = self._bucket(difficulty_level, category)
+        permutation = SeededPermutation(len(bucket), seed)
+        stop = min(stop, len(bucket))
+        return [self.rows[bucket[permutation[i]]] for i in range(start, stop)]
+
+    def _matches(self, position: int, difficulty_level: Optional[int], category: Optional[str]) -> bool:
+        if difficulty_level is None and category is None:
+            return True
+        row = self.rows[position]
+        if difficulty_level is not None and normalize_difficulty(row.get("difficulty_level")) != difficulty_level:
+            return False
+        return category is None or normalize_category(row.get("category")) == category
+
+    def _bucket(self, difficulty_level: Optional[int], category: Optional[str]) -> array:
+        key = (normalize_difficulty(difficulty_level), normalize_category(category))
+        return self._buckets.get(key, array("I"))
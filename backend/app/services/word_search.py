@@ -0,0 +1,327 @@
+import asyncio
+import logging
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .catalog_file import ColumnarRows
+from .coalescing import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ("english_word", "english_meaning", "malayalam_word")
+
+# Malayalam script -> the Latin spelling people type (Manglish)
+VOWELS = {
+    "അ": "a", "ആ": "a", "ഇ": "i", "ഈ": "i", "ഉ": "u", "ഊ": "u", "ഋ": "ru",
+    "എ": "e", "ഏ": "e", "ഐ": "ai", "ഒ": "o", "ഓ": "o", "ഔ": "au",
+}
+VOWEL_SIGNS = {
+    "ാ": "a", "ി": "i", "ീ": "i", "ു": "u", "ൂ": "u", "ൃ": "ru",
+    "െ": "e", "േ": "e", "ൈ": "ai", "ൊ": "o", "ോ": "o", "ൌ": "au", "ൗ": "au",
+}
+CONSONANTS = {
+    "ക": "k", "ഖ": "kh", "ഗ": "g", "ഘ": "gh", "ങ": "ng",
+    "ച": "ch", "ഛ": "chh", "ജ": "j", "ഝ": "jh", "ഞ": "nj",
+    "ട": "t", "ഠ": "th", "ഡ": "d", "ഢ": "dh", "ണ": "n",
+    "ത": "th", "ഥ": "th", "ദ": "d", "ധ": "dh", "ന": "n",
+    "പ": "p", "ഫ": "ph", "ബ": "b", "ഭ": "bh", "മ": "m",
+    "യ": "y", "ര": "r", "ല": "l", "വ": "v", "ശ": "sh",
+    "ഷ": "sh", "സ": "s", "ഹ": "h", "ള": "l", "ഴ": "zh", "റ": "r",
+}
+# Chillu letters and signs that end a syllable without a vowel
+FINALS = {"ൺ": "n", "ൻ": "n", "ർ": "r", "ൽ": "l", "ൾ": "l", "ൿ": "k", "ം": "m", "ഃ": "h"}
+VIRAMA = "്"
+
+# Spelling variants that sound alike, folded in order
+KEY_FOLDS = (
+    ("zh", "l"), ("ee", "i"), ("oo", "u"), ("chh", "c"), ("ch", "c"), ("sh", "s"),
+    ("th", "t"), ("dh", "d"), ("kh", "k"), ("gh", "g"), ("jh", "j"), ("bh", "b"),
+    ("ph", "f"), ("w", "v"), ("q", "k"), ("x", "ks"), ("z", "s"),
+    # ട is typed as either t or d (kadala for കടല)
+    ("d", "t"),
+)
+
+NGRAM = 3
+# N-grams shared by more terms than this carry no signal (think "the")
+MAX_NGRAM_POSTINGS = 5000
+
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+MIN_NGRAM_SIMILARITY = 0.5
+
+
+def normalize_text(value: Any) -> str:
+    """Case-folded NFC text, for comparing words as typed"""
+    return unicodedata.normalize("NFC", str(value)).casefold().strip()
+
+
+def romanize(text: str) -> str:
+    """Spell Malayalam script the way it is commonly typed in Latin letters"""
+    out: List[str] = []
+    inherent = False
+    for i, char in enumerate(text):
+        if char in CONSONANTS:
+            out.append(CONSONANTS[char] + "a")
+            inherent = True
+            continue
+        if inherent and char in VOWEL_SIGNS:
+            out[-1] = out[-1][:-1] + VOWEL_SIGNS[char]
+        elif inherent and char == VIRAMA:
+            out[-1] = out[-1][:-1]
+            # A word-final virama is the half-u of e.g. ചോറ് (choru)
+            following = text[i + 1:i + 2]
+            if not following or not ("ഀ" <= following <= "ൿ"):
+                out[-1] += "u"
+        elif char in VOWELS:
+            out.append(VOWELS[char])
+        elif char in FINALS:
+            out.append(FINALS[char])
+        elif char not in VOWEL_SIGNS and char != VIRAMA:
+            out.append(char)
+        inherent = False
+    return "".join(out)
+
+
+def transliteration_key(value: Any) -> str:
+    """Spelling-insensitive key shared by Malayalam script and its Manglish forms.
+
+    ``പഴം``, ``pazham`` and ``palam`` all map to ``palam``; ``മാങ്ങ`` and
+    ``manga`` to ``manga``.
+    """
+    text = romanize(normalize_text(value))
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if char.isascii() and char.isalnum())
+    for variant, folded in KEY_FOLDS:
+        text = text.replace(variant, folded)
+    text = text.replace("ngng", "ng")
+    # Doubled letters are optional in Manglish (appam / apam)
+    return "".join(char for i, char in enumerate(text) if i == 0 or char != text[i - 1])
+
+
+def row_terms(row: Dict[str, Any]) -> Set[str]:
+    """Every searchable term of a row: whole values, their words, and their keys"""
+    terms: Set[str] = set()
+    for field in SEARCH_FIELDS:
+        value = row.get(field)
+        if value is None:
+            continue
+        text = normalize_text(value)
+        for term in [text] + text.split():
+            if term:
+                terms.add(term)
+            key = transliteration_key(term)
+            if key:
+                terms.add(key)
+    return terms
+
+
+def ngrams(term: str, closed: bool = True) -> Set[str]:
+    """Character n-grams of a padded term; an open one (a partial query) is not padded at the end"""
+    padded = f" {term} " if closed else f" {term}"
+    return {padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))}
+
+
+def _row_keys(rows: Sequence[Dict[str, Any]]) -> Iterable[Any]:
+    if isinstance(rows, ColumnarRows):
+        return rows.values("id")
+    return (row.get("id") for row in rows)
+
+
+class WordSearchIndex:
+    """Type-ahead search over the word catalog.
+
+    Terms (see ``row_terms``) are kept in a prefix trie and a character
+    n-gram index. A query is matched on its normalized text and its
+    transliteration key: exact terms rank first, then prefix completions
+    (closest first), then n-gram matches that tolerate typos. The index stores
+    row keys, not rows, and ``sync`` only re-indexes rows whose content hash
+    changed, so a catalog refresh costs in proportion to what changed.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._trie: Dict[str, Any] = {}
+        self._term_rows: Dict[str, Set[Hashable]] = {}
+        self._ngrams: Dict[str, Set[str]] = {}
+        self._row_terms: Dict[Hashable, Set[str]] = {}
+        self._hashes: Dict[Hashable, str] = {}
+        self._positions: Dict[Hashable, int] = {}
+        self._rows: Sequence[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._row_terms)
+
+    def sync(self, version: int, rows: Sequence[Dict[str, Any]], row_index: Dict[Any, str]) -> int:
+        """Bring the index up to a catalog version; returns how many rows were re-indexed"""
+        if version == self.version:
+            return 0
+
+        positions: Dict[Hashable, int] = {}
+        for position, key in enumerate(_row_keys(rows)):
+            positions[key if key is not None else ("row", position)] = position
+
+        changed = 0
+        for key in [key for key in self._row_terms if key not in positions]:
+            self._remove(key)
+            changed += 1
+        for key, position in positions.items():
+            digest = row_index.get(key) if not isinstance(key, tuple) else None
+            if key in self._hashes and digest is not None and self._hashes[key] == digest:
+                continue
+            if key in self._row_terms:
+                self._remove(key)
+            self._add(key, rows[position])
+            self._hashes[key] = digest
+            changed += 1
+
+        self._positions = positions
+        self._rows = rows
+        self.version = version
+        return changed
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best matching rows for query, best first"""
+        scores: Dict[Hashable, float] = {}
+        for text in {normalize_text(query), transliteration_key(query)}:
+            if text:
+                self._score(text, limit, scores)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._positions[item[0]]))
+        return [self._rows[self._positions[key]] for key, _ in ranked[:limit]]
+
+    def _score(self, text: str, limit: int, scores: Dict[Hashable, float]) -> None:
+        for term, rank in self._completions(text, limit * 4):
+            for key in self._term_rows[term]:
+                if rank > scores.get(key, 0.0):
+                    scores[key] = rank
+        if len(scores) >= limit or len(text) < NGRAM - 1:
+            return
+
+        # Too few prefix matches: fall back to fuzzy n-gram matches
+        grams = ngrams(text, closed=False)
+        counts: Counter = Counter()
+        for gram in grams:
+            postings = self._ngrams.get(gram, ())
+            if len(postings) <= MAX_NGRAM_POSTINGS:
+                counts.update(postings)
+        for term, shared in counts.items():
+            similarity = shared / len(grams)
+            if similarity < MIN_NGRAM_SIMILARITY:
+                continue
+            for key in self._term_rows[term]:
+                if similarity > scores.get(key, 0.0):
+                    scores[key] = similarity
+
+    def _completions(self, prefix: str, max_rows: int) -> List[Tuple[str, float]]:
+        """Terms starting with prefix, shortest first, until max_rows rows are covered"""
+        node = self._trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        found: List[Tuple[str, float]] = []
+        covered = 0
+        level = [(node, prefix)]
+        while level and covered < max_rows:
+            following = []
+            for node, term in level:
+                if "" in node:
+                    rank = EXACT_SCORE if term == prefix else PREFIX_SCORE + len(prefix) / len(term)
+                    found.append((term, rank))
+                    covered += len(self._term_rows[term])
+                following.extend((child, term + char) for char, child in node.items() if char)
+            level = following
+        return found
+
+    def _add(self, key: Hashable, row: Dict[str, Any]) -> None:
+        terms = row_terms(row)
+        self._row_terms[key] = terms
+        for term in terms:
+            rows = self._term_rows.get(term)
+            if rows is None:
+                rows = self._term_rows[term] = set()
+                node = self._trie
+                for char in term:
+                    node = node.setdefault(char, {})
+                node[""] = True
+                for gram in ngrams(term):
+                    self._ngrams.setdefault(gram, set()).add(term)
+            rows.add(key)
+
+    def _remove(self, key: Hashable) -> None:
+        self._hashes.pop(key, None)
+        for term in self._row_terms.pop(key, ()):
+            rows = self._term_rows[term]
+            rows.discard(key)
+            if rows:
+                continue
+            del self._term_rows[term]
+            for gram in ngrams(term):
+                postings = self._ngrams[gram]
+                postings.discard(term)
+                if not postings:
+                    del self._ngrams[gram]
+            self._prune(term)
+
+    def _prune(self, term: str) -> None:
+        """Unmark term in the trie and drop the nodes only it used"""
+        path = [self._trie]
+        for char in term:
+            path.append(path[-1][char])
+        del path[-1][""]
+        for depth in range(len(term), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][term[depth - 1]]
+
+
+class LiveSearchIndex:
+    """A ``WordSearchIndex`` kept current without blocking the event loop.
+
+    Two indexes take turns: searches read the active one while the other is
+    synced to the new catalog version in a worker thread, then they swap. The
+    standby index is one version behind, so a sync still re-indexes only the
+    rows that changed since it was last current. One build runs at a time;
+    only the very first has nothing to serve meanwhile and is waited for.
+    """
+
+    def __init__(self):
+        self.active = WordSearchIndex()
+        self._standby = WordSearchIndex()
+        self._flight = SingleFlight("word_search")
+
+    async def current(self, version: int, rows: Sequence[Dict[str, Any]],
+                      row_index: Callable[[], Dict[Any, str]]) -> WordSearchIndex:
+        """The index to search now, starting a build of ``version`` if it is not that one"""
+        if self.active.version != version:
+            task = self._flight.start("build", lambda: self._build(version, rows, row_index))
+            if self.active.version is None:
+                await asyncio.shield(task)
+        return self.active
+
+    async def build(self, version: int, rows: Sequence[Dict[str, Any]],
+                    row_index: Callable[[], Dict[Any, str]]) -> int:
+        """Bring the active index up to ``version``, joining a build already running"""
+        if self.active.version == version:
+            return 0
+        return await self._flight.do("build", lambda: self._build(version, rows, row_index))
+
+    async def _build(self, version: int, rows: Sequence[Dict[str, Any]],
+                     row_index: Callable[[], Dict[Any, str]]) -> int:
+        standby = self._standby
+        try:
+            changed = await asyncio.to_thread(lambda: standby.sync(version, rows, row_index()))
+        except Exception as e:
+            if self.active.version is None:
+                raise
+            # Keep serving the previous version; the next search retries
+            logger.warning(f"Building the search index for version {version} failed: {str(e)}")
+            return 0
+        self._standby, self.active = self.active, standby
+        return changed
+
+
+# Global search index instance
+word_search_index = LiveSearchIndex()
@@ -1,25 +1,298 @@
+from ..core.config import settings
 from ..core.database import supabase
-import random
+from ..core.pagination import select_all
+from ..core.resilience import UpstreamUnavailableError
+from .catalog_cache import CatalogSnapshot, catalog_cache
+from .catalog_events import catalog_events
+from .coalescing import SingleFlight
+from .neighbors import load_neighbor_table
+from .payload_buffer import payload_buffer
+from .review_scheduler import review_scheduler
+from .shared_catalog import shared_loader
+from .word_sampler import WordSampler, normalize_category, normalize_difficulty, row_positions
+from .word_search import word_search_index
+from typing import Any, Dict, Optional, Tuple
 from fastapi import HTTPException
+import asyncio
+import base64
+import json
+import logging
+import random
+import time
+import orjson
+
+logger = logging.getLogger(__name__)
+
+WORD_MATCHING_TABLE = "word_matching"
+CHALLENGE_MODE = "challenge"
+
+# One neighbor table build per catalog version, however many requests wait on it
+neighbor_flight = SingleFlight("neighbors")
+
+async def _load_word_matching():
+    """Fetch every word matching row from the database, in id order"""
+    return await select_all(supabase, WORD_MATCHING_TABLE)
+
+def _build_neighbor_table(snapshot: CatalogSnapshot):
+    return asyncio.to_thread(
+        load_neighbor_table, snapshot.rows, snapshot.checksum, settings.catalog_shared_dir, WORD_MATCHING_TABLE
+    )
+
+def _neighbor_table_built(snapshot: CatalogSnapshot, task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        # The next challenge request starts it again
+        logger.warning(f"Neighbor table build for version {snapshot.version} failed: {str(task.exception())}")
+        return
+    snapshot.derived["neighbors"] = task.result()
+
+def start_neighbor_table(snapshot: CatalogSnapshot) -> None:
+    """Build a snapshot's confusable-word table off the event loop, once per version"""
+    if "neighbors" in snapshot.derived or neighbor_flight.in_flight(snapshot.version):
+        return
+    task = neighbor_flight.start(snapshot.version, lambda: _build_neighbor_table(snapshot))
+    task.add_done_callback(lambda done: _neighbor_table_built(snapshot, done))
+
+async def neighbor_table(snapshot: CatalogSnapshot):
+    """Confusable-word table of a snapshot, waiting for its build to finish"""
+    table = snapshot.derived.get("neighbors")
+    if table is None:
+        start_neighbor_table(snapshot)
+        table = await neighbor_flight.do(snapshot.version, lambda: _build_neighbor_table(snapshot))
+        snapshot.derived["neighbors"] = table
+    return table
+
+# With several workers only the one leading the shared catalog queries Supabase.
+# The neighbor table (about 5s to build at 100k rows) starts as each version loads.
+catalog_cache.register(
+    WORD_MATCHING_TABLE,
+    shared_loader(settings.catalog_shared_dir, WORD_MATCHING_TABLE, _load_word_matching,
+                  settings.catalog_events_dir),
+    on_load=start_neighbor_table,
+)
+catalog_events.watch(WORD_MATCHING_TABLE)
+
+def encode_session_cursor(state: Dict[str, Any]) -> str:
+    """Opaque, URL-safe cursor for resuming a game session"""
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_session_cursor(cursor: str) -> Dict[str, Any]:
+    """Inverse of encode_session_cursor; raises 400 on a malformed cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return {
+            "seed": int(state["seed"]),
+            "version": int(state["version"]),
+            "offset": int(state["offset"]),
+            "difficulty_level": state.get("difficulty_level"),
+            "category": state.get("category"),
+        }
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid session cursor")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag.removeprefix("W/") for tag in candidates]
 
 class WordService:
     @staticmethod
-    async def get_random_word_matching(count: int = 5):
-        """Get random word matching entries for the game"""
+    async def get_word_matching_payload(
+        count: int = 5,
+        difficulty_level: Optional[int] = None,
+        category: Optional[str] = None,
+        mode: str = "random"
+    ) -> bytes:
+        """Get a serialized WordMatchingResponse body of random entries.
+
+        In challenge mode the entries are one random word and the words most
+        easily confused with it (see neighbors.py); until the catalog version's
+        neighbor table is built they are random entries.
+        """
+        try:
+            snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+            sampler = snapshot.derive("sampler", WordSampler)
+            difficulty_level = normalize_difficulty(difficulty_level)
+            category = normalize_category(category)
+
+            neighbors = snapshot.derived.get("neighbors") if mode == CHALLENGE_MODE else None
+            if mode == CHALLENGE_MODE and neighbors is None:
+                # Still building: plain random rounds rather than a request held for seconds
+                start_neighbor_table(snapshot)
+                mode = "random"
+
+            if mode == CHALLENGE_MODE:
+                def render() -> bytes:
+                    return orjson.dumps({"data": sampler.challenge(count, neighbors, difficulty_level, category)})
+            else:
+                def render() -> bytes:
+                    return orjson.dumps({"data": sampler.sample(count, difficulty_level, category)})
+
+            key = (count, difficulty_level, category, mode)
+            return payload_buffer.take(key, snapshot.version, render)
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error fetching word matching data: {str(e)}"
+            )
+
+    @staticmethod
+    async def get_word_matching_session(
+        rounds: int = 10,
+        count: int = 5,
+        difficulty_level: Optional[int] = None,
+        category: Optional[str] = None,
+        seed: Optional[int] = None,
+        cursor: Optional[str] = None
+    ):
+        """Get several game rounds at once with no word repeated across the session"""
+        state = decode_session_cursor(cursor) if cursor else None
         try:
-            # Fetch all entries from the database
-            response = supabase.table("word_matching").select("*").execute()
-            all_data = response.data
-            
-            # If we have fewer than requested count, return all of them
-            if len(all_data) <= count:
-                return all_data
-            
-            # Otherwise, randomly select the requested number of entries
-            random_entries = random.sample(all_data, count) 
-            return random_entries
+            snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+            sampler = snapshot.derive("sampler", WordSampler)
+        except UpstreamUnavailableError:
+            raise
         except Exception as e:
             raise HTTPException(
-                status_code=500, 
+                status_code=500,
                 detail=f"Error fetching word matching data: {str(e)}"
-            ) 
\ No newline at end of file
+            )
+
+        if state is not None:
+            # Every worker numbers versions alike (see CatalogCache), so a page may
+            # land on any of them; only a real change breaks the no-repeat guarantee
+            if state["version"] != snapshot.version:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Word catalog changed since this session started, start a new session"
+                )
+            seed = state["seed"]
+            difficulty_level = state["difficulty_level"]
+            category = state["category"]
+            offset = state["offset"]
+        else:
+            seed = seed if seed is not None else random.getrandbits(32)
+            offset = 0
+
+        # Consecutive slices of one seeded shuffle never share a word
+        end = offset + rounds * count
+        entries = sampler.permuted(seed, offset, end, difficulty_level, category)
+        session_rounds = [entries[i:i + count] for i in range(0, len(entries), count)]
+
+        next_cursor = None
+        if offset + len(entries) < sampler.bucket_size(difficulty_level, category):
+            next_cursor = encode_session_cursor({
+                "seed": seed,
+                "version": snapshot.version,
+                "offset": offset + len(entries),
+                "difficulty_level": difficulty_level,
+                "category": category,
+            })
+
+        return {
+            "rounds": session_rounds,
+            "seed": seed,
+            "version": snapshot.version,
+            "next_cursor": next_cursor,
+        }
+
+    @staticmethod
+    async def get_word_matching_catalog(
+        since: Optional[int] = None,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Get the whole catalog, or only what changed after version ``since``.
+
+        Returns the ETag and the body, which is None when the client's copy
+        (per ``since`` or If-None-Match) is already current.
+        """
+        try:
+            snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+            current = catalog_cache.row_index(snapshot)
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error fetching word matching data: {str(e)}"
+            )
+
+        etag = f'"{snapshot.version}-{snapshot.checksum[:16]}"'
+        if since == snapshot.version or etag_matches(if_none_match, etag):
+            return etag, None
+
+        # Unknown or evicted versions fall back to the full catalog
+        base = catalog_cache.row_index_at(WORD_MATCHING_TABLE, since) if since is not None else None
+        if base is not None:
+            etag = f'"{snapshot.version}-{snapshot.checksum[:16]}-{since}"'
+            if etag_matches(if_none_match, etag):
+                return etag, None
+
+        if base is None:
+            return etag, {"version": snapshot.version, "full": True, "data": list(snapshot.rows), "removed": []}
+        return etag, {
+            "version": snapshot.version,
+            "full": False,
+            "data": [row for row in snapshot.rows if base.get(row.get("id")) != current[row.get("id")]],
+            "removed": [key for key in base if key not in current],
+        }
+
+    @staticmethod
+    async def get_review_round(user_id: str, count: int = 5) -> Dict[str, Any]:
+        """Get a learner's due words (spaced repetition), topped up with words they have not seen"""
+        try:
+            snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+            sampler = snapshot.derive("sampler", WordSampler)
+            positions = snapshot.derive("positions", row_positions)
+            queue = await review_scheduler.learner(user_id)
+
+            # Words removed from the catalog since they were answered are passed over
+            due = queue.due(time.time(), count, keep=positions.__contains__)
+            rows = [snapshot.rows[positions[word_id]] for word_id in due]
+            picked = set(due)
+            # Prefer new words; repeat seen ones only once the learner has seen nearly everything
+            for unseen_only in (True, True, False):
+                if len(rows) >= count:
+                    break
+                for row in sampler.sample(count):
+                    word_id = row.get("id")
+                    if len(rows) < count and word_id not in picked and not (unseen_only and word_id in queue.cards):
+                        rows.append(row)
+                        picked.add(word_id)
+            return {"data": rows, "reviews": len(due)}
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error fetching review words: {str(e)}"
+            )
+
+    @staticmethod
+    async def search_words(query: str, limit: int = 10) -> Dict[str, Any]:
+        """Search words by English, Malayalam or Manglish spelling"""
+        try:
+            snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+            # A new version is indexed off the event loop; until then the previous one answers
+            index = await word_search_index.current(
+                snapshot.version, snapshot.rows, lambda: catalog_cache.row_index(snapshot)
+            )
+            return {
+                "query": query,
+                "version": index.version,
+                "data": index.search(query, limit),
+            }
+        except UpstreamUnavailableError:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error searching words: {str(e)}"
+            )
@@ -0,0 +1,164 @@
+"""In-process stand-in for Supabase's PostgREST and GoTrue APIs.
+
+``FakeSupabaseTransport`` is an httpx transport, so it plugs into the real
+``SupabaseClient`` and the benchmark exercises the same request building and
+JSON decoding as production, minus the network. Every request waits
+``latency`` seconds (plus up to ``jitter``) to model the upstream round trip.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+from jose import jwt
+
+
+def make_catalog(size: int, categories: int = 20, difficulties: int = 5) -> List[Dict[str, Any]]:
+    """Synthetic word_matching rows"""
+    return [
+        {
+            "id": i + 1,
+            "english_word": f"word{i}",
+            "malayalam_word": f"vaakku{i}",
+            "difficulty_level": i % difficulties + 1,
+            "category": f"category{i % categories}",
+        }
+        for i in range(size)
+    ]
+
+
+class FakeSupabaseTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        jwt_secret: str = "benchmark-jwt-secret",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        max_rows: Optional[int] = None,
+    ):
+        self.tables = tables or {}
+        self.jwt_secret = jwt_secret
+        self.latency = latency
+        self.jitter = jitter
+        self.max_rows = max_rows
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add_user(self, email: str, password: str) -> Dict[str, Any]:
+        user = {"id": str(uuid.uuid4()), "email": email, "aud": "authenticated", "role": "authenticated"}
+        self.users[email] = dict(user, password=password)
+        return user
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        path = request.url.path
+        self.calls[path] = self.calls.get(path, 0) + 1
+        if path.startswith("/rest/v1/"):
+            return self._rest(request, path[len("/rest/v1/"):])
+        if path == "/auth/v1/token":
+            return self._token(request)
+        if path == "/auth/v1/signup":
+            return self._signup(request)
+        if path == "/auth/v1/user":
+            return self._user(request)
+        if path == "/auth/v1/.well-known/jwks.json":
+            return httpx.Response(200, json={"keys": []})
+        return httpx.Response(404, json={"message": f"Unknown path {path}"})
+
+    # PostgREST
+
+    def _rest(self, request: httpx.Request, table: str) -> httpx.Response:
+        rows = self.tables.setdefault(table, [])
+        if request.method == "POST":
+            body = json.loads(request.content or b"[]")
+            rows.extend(body if isinstance(body, list) else [body])
+            return httpx.Response(201)
+        if request.method != "GET":
+            return httpx.Response(405)
+
+        params = dict(parse_qsl(request.url.query.decode("ascii")))
+        columns = params.pop("select", "*")
+        order = params.pop("order", None)
+        limit = params.pop("limit", None)
+        offset = int(params.pop("offset", 0))
+
+        result = [row for row in rows if all(_matches(row, column, spec) for column, spec in params.items())]
+        if order:
+            column, _, direction = order.partition(".")
+            result.sort(key=lambda row: row.get(column), reverse=direction.startswith("desc"))
+        caps = [int(limit)] if limit is not None else []
+        if self.max_rows is not None:
+            caps.append(self.max_rows)
+        result = result[offset:offset + min(caps)] if caps else result[offset:]
+        if columns != "*":
+            keep = columns.split(",")
+            result = [{column: row.get(column) for column in keep} for row in result]
+        return httpx.Response(200, json=result)
+
+    # GoTrue
+
+    def _session(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        public = {k: v for k, v in user.items() if k != "password"}
+        claims = {
+            "sub": user["id"],
+            "email": user["email"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "exp": int(time.time()) + 3600,
+        }
+        return {
+            "access_token": jwt.encode(claims, self.jwt_secret, algorithm="HS256"),
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user": public,
+        }
+
+    def _token(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        user = self.users.get(body.get("email"))
+        if user is None or user["password"] != body.get("password"):
+            return httpx.Response(400, json={"error_description": "Invalid login credentials"})
+        return httpx.Response(200, json=self._session(user))
+
+    def _signup(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if body.get("email") in self.users:
+            return httpx.Response(422, json={"msg": "User already registered"})
+        return httpx.Response(200, json=self.add_user(body["email"], body["password"]))
+
+    def _user(self, request: httpx.Request) -> httpx.Response:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except Exception:
+            return httpx.Response(401, json={"msg": "invalid JWT"})
+        for user in self.users.values():
+            if user["id"] == claims["sub"]:
+                return httpx.Response(200, json={k: v for k, v in user.items() if k != "password"})
+        return httpx.Response(404, json={"msg": "User not found"})
+
+
+def _matches(row: Dict[str, Any], column: str, spec: str) -> bool:
+    operator, _, value = spec.partition(".")
+    current = row.get(column)
+    if operator == "eq":
+        return str(current) == value
+    if operator == "in":
+        return str(current) in value.strip("()").split(",")
+    if current is None:
+        return False
+    if operator in ("gt", "gte", "lt", "lte"):
+        target: Any = type(current)(value) if isinstance(current, (int, float)) else value
+        return {
+            "gt": current > target,
+            "gte": current >= target,
+            "lt": current < target,
+            "lte": current <= target,
+        }[operator]
+    raise ValueError(f"Unsupported filter {column}={spec}")
@@ -0,0 +1,114 @@
+"""Memory benchmark for the word catalog representations.
+
+Compares the list of dicts decoded from Supabase's JSON with the columnar
+``ColumnarRows`` store the catalog cache keeps by default. Reports the bytes
+each retains, the peak while building it, and the time to build the sampler
+and draw a round. Run from the ``backend`` directory::
+
+    python -m benchmarks.memory --sizes 10000,100000,1000000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.services.catalog_file import ColumnarRows
+from app.services.word_sampler import WordSampler
+from .fake_supabase import make_catalog
+from .run import RESULTS_DIR, git_commit
+
+
+def measure(build) -> Dict[str, Any]:
+    """Bytes retained by build()'s result and the peak while building it"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"result": result, "retained_bytes": current, "peak_bytes": peak, "build_s": round(elapsed, 3)}
+
+
+def profile(name: str, size: int, rows_factory, draws: int) -> Dict[str, Any]:
+    stats = measure(rows_factory)
+    rows = stats.pop("result")
+
+    started = time.perf_counter()
+    sampler = WordSampler(rows)
+    sampler_s = time.perf_counter() - started
+
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for _ in range(draws):
+        sampler.sample(5, difficulty_level=rng.randint(1, 5), rng=rng)
+    draw_us = (time.perf_counter() - started) / draws * 1e6
+
+    return {
+        "representation": name,
+        "catalog_size": size,
+        **stats,
+        "bytes_per_row": round(stats["retained_bytes"] / size, 1),
+        "sampler_build_s": round(sampler_s, 3),
+        "draw_us": round(draw_us, 2),
+    }
+
+
+def run(sizes: List[int], draws: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        # Decoded from JSON like a PostgREST response, so no strings are shared
+        payload = json.dumps(make_catalog(size)).encode("utf-8")
+        dicts = profile("dicts", size, lambda: json.loads(payload), draws)
+        rows = json.loads(payload)
+        columnar = profile("columnar", size, lambda: ColumnarRows.from_rows(rows), draws)
+        del rows
+        for result in (dicts, columnar):
+            results.append(result)
+            print(
+                f"{result['representation']:<9} size={size:<8} "
+                f"retained={result['retained_bytes'] / 2 ** 20:8.1f}MiB "
+                f"per_row={result['bytes_per_row']:<7} peak={result['peak_bytes'] / 2 ** 20:8.1f}MiB "
+                f"build={result['build_s']}s sampler={result['sampler_build_s']}s draw={result['draw_us']}us"
+            )
+        print(f"{'':<9} columnar uses {columnar['retained_bytes'] / dicts['retained_bytes']:.1%} of the dicts' memory")
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated catalog sizes")
+    parser.add_argument("--draws", type=int, default=10000, help="sampler draws timed per size")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/memory-<commit>.json)")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+        },
+        "results": run(args.sizes, args.draws),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"memory-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
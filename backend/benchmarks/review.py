@@ -0,0 +1,155 @@
+"""Due-queue benchmark for the spaced-repetition review scheduler.
+
+Fills a ``ReviewScheduler`` through its answer-ingestion path with
+``--users`` learners, each holding ``--cards`` of a ``--words`` catalog, plus
+``--heavy-users`` learners who have answered every word. Reports how fast
+answers are applied and the latency of "next n due words" lookups, next to a
+scan of a heavy learner's cards for comparison. Lookups walk only the top of
+each learner's heap, so their cost follows n and the log of the learner's
+card count rather than the number of learners. Run from the ``backend``
+directory::
+
+    python -m benchmarks.review --users 100000 --words 10000 --cards 20 --heavy-users 10
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.services.review_scheduler import DAY, ReviewScheduler
+from .run import RESULTS_DIR, git_commit, percentile
+
+
+async def _no_history(user_id: str) -> List[Dict[str, Any]]:
+    return []
+
+
+def build(args: argparse.Namespace, now: float, rng: random.Random) -> Dict[str, Any]:
+    """Scheduler filled with answers spread over the last ``--days`` days"""
+    scheduler = ReviewScheduler(_no_history, max_learners=args.users + args.heavy_users)
+    users = [f"user-{n}" for n in range(args.users)]
+    heavy = [f"heavy-{n}" for n in range(args.heavy_users)]
+
+    async def load_all():
+        return {user_id: await scheduler.learner(user_id) for user_id in users + heavy}
+
+    learners = asyncio.run(load_all())
+
+    answers = 0
+    elapsed = 0.0
+    for user_id in users + heavy:
+        words = range(args.words) if user_id in heavy else rng.sample(range(args.words), args.cards)
+        rows = []
+        for word_id in words:
+            at = now - rng.random() * args.days * DAY
+            for _ in range(rng.randint(1, 4)):
+                rows.append({"event_id": answers, "user_id": user_id, "word_id": word_id,
+                             "correct": rng.random() < 0.8, "response_ms": rng.randint(500, 20_000),
+                             "answered_at": at})
+                answers += 1
+                at += rng.random() * 3 * DAY
+        started = time.perf_counter()
+        scheduler.record(rows)
+        elapsed += time.perf_counter() - started
+
+    return {"learners": learners, "users": users, "heavy": heavy, "answers": answers, "record_s": elapsed}
+
+
+def time_lookups(lookup, user_ids: List[str], lookups: int, rng: random.Random) -> Dict[str, Any]:
+    latencies = []
+    found = 0
+    for _ in range(lookups):
+        user_id = rng.choice(user_ids)
+        started = time.perf_counter()
+        found += len(lookup(user_id))
+        latencies.append(time.perf_counter() - started)
+    return {
+        "lookups": lookups,
+        "mean_words": round(found / lookups, 2),
+        "p50_us": round(percentile(latencies, 50) * 1e6, 2),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 2),
+        "max_us": round(max(latencies) * 1e6, 2),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    now = time.time()
+    built = build(args, now, rng)
+    learners = built["learners"]
+    cards = sum(len(learners[user_id].cards) for user_id in learners)
+    print(f"{len(learners)} learners, {cards} cards from {built['answers']} answers: "
+          f"{built['record_s'] / built['answers'] * 1e6:.2f}us per answer applied")
+
+    def heap_lookup(user_id):
+        return learners[user_id].due(now, args.limit)
+
+    def scan_lookup(user_id):
+        queue = learners[user_id]
+        due = [(card.due, word_id) for word_id, card in queue.cards.items() if card.due <= now]
+        return [word_id for _, word_id in heapq.nsmallest(args.limit, due)]
+
+    results = []
+    for name, lookup, user_ids in (
+        ("heap", heap_lookup, built["users"]),
+        ("heap_heavy", heap_lookup, built["heavy"]),
+        ("scan_heavy", scan_lookup, built["heavy"]),
+    ):
+        if not user_ids:
+            continue
+        result = {"method": name, "limit": args.limit, **time_lookups(lookup, user_ids, args.lookups, rng)}
+        results.append(result)
+        print(f"{name:<11} limit={args.limit:<3} words={result['mean_words']:<6} "
+              f"p50={result['p50_us']}us p99={result['p99_us']}us max={result['max_us']}us")
+
+    return {
+        "users": args.users,
+        "heavy_users": args.heavy_users,
+        "words": args.words,
+        "cards": cards,
+        "answers": built["answers"],
+        "record_us": round(built["record_s"] / built["answers"] * 1e6, 3),
+        "lookups": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=100_000, help="learners with --cards cards each")
+    parser.add_argument("--words", type=int, default=10_000, help="catalog size")
+    parser.add_argument("--cards", type=int, default=20, help="words answered per learner")
+    parser.add_argument("--heavy-users", type=int, default=10, help="learners who answered every word")
+    parser.add_argument("--days", type=float, default=60.0, help="period the answers are spread over")
+    parser.add_argument("--limit", type=int, default=10, help="due words per lookup")
+    parser.add_argument("--lookups", type=int, default=10_000, help="lookups timed per method")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/review-<commit>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+        },
+        "results": run(args),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"review-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
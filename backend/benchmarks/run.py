@@ -0,0 +1,221 @@
+"""Load and latency benchmark for the backend hot paths.
+
+Drives the ASGI app in-process against ``FakeSupabaseTransport`` and reports
+throughput and p50/p95/p99 latency per endpoint and catalog size. Run from the
+``backend`` directory::
+
+    python -m benchmarks.run --sizes 1000,10000,100000,1000000 --latency-ms 20
+    python -m benchmarks.run --compare benchmarks/results/<older-commit>.json
+
+Results are written as JSON (by default ``benchmarks/results/<commit>.json``)
+so runs on different commits can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from main import app
+from app.core.database import supabase
+from app.core.security import token_verifier
+from app.services.catalog_cache import catalog_cache
+from .fake_supabase import FakeSupabaseTransport, make_catalog
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SCENARIOS = ("word_matching", "word_search", "auth_login", "auth_user")
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark-password"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def drive(client: httpx.AsyncClient, send, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Issue ``requests`` calls from ``concurrency`` workers and time each one"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await send(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_size(size: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    transport = FakeSupabaseTransport(
+        tables={"word_matching": make_catalog(size)},
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+    )
+    transport.add_user(EMAIL, PASSWORD)
+
+    # Point the real data layer at the fake upstream
+    await supabase.close()
+    supabase._client = httpx.AsyncClient(base_url="http://supabase.local", transport=transport)
+    catalog_cache.invalidate()
+    catalog_cache.max_rows = max(catalog_cache.max_rows, size)
+    token_verifier.clear()
+    token_verifier.jwt_secret = "" if args.remote_auth else transport.jwt_secret
+
+    results = []
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        login = await client.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        token = login.json()["access_token"]
+
+        load_started = time.perf_counter()
+        await client.get("/api/word-matching")
+        cold_ms = (time.perf_counter() - load_started) * 1000
+
+        senders = {
+            "word_matching": lambda c: c.get("/api/word-matching", params={"count": 5}),
+            "word_search": lambda c: c.get("/api/words/search", params={"q": "vaakku12"}),
+            "auth_login": lambda c: c.post("/api/auth/login", json={"email": EMAIL, "password": PASSWORD}),
+            "auth_user": lambda c: c.get("/api/auth/user", params={"token": token}),
+        }
+        for scenario in args.scenarios:
+            send = senders[scenario]
+            await drive(client, send, min(args.warmup, args.requests), args.concurrency)
+            calls_before = sum(transport.calls.values())
+            stats = await drive(client, send, args.requests, args.concurrency)
+            stats["upstream_calls"] = sum(transport.calls.values()) - calls_before
+            result = {"scenario": scenario, "catalog_size": size, **stats}
+            if scenario == "word_matching":
+                result["cold_load_ms"] = round(cold_ms, 3)
+            results.append(result)
+            print(
+                f"{scenario:<14} size={size:<8} rps={stats['throughput_rps']:<9} "
+                f"p50={stats['p50_ms']:<8} p95={stats['p95_ms']:<8} p99={stats['p99_ms']:<8} "
+                f"upstream={stats['upstream_calls']} errors={stats['errors']}"
+            )
+
+    await supabase.close()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    """Print p50/p99/throughput changes against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["scenario"], r["catalog_size"]): r for r in baseline["results"]}
+
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline_path}):")
+    for result in current["results"]:
+        before = previous.get((result["scenario"], result["catalog_size"]))
+        if before is None:
+            continue
+        changes = []
+        for metric in ("throughput_rps", "p50_ms", "p99_ms"):
+            if before[metric]:
+                delta = (result[metric] - before[metric]) / before[metric] * 100
+                changes.append(f"{metric} {delta:+.1f}%")
+        print(f"  {result['scenario']:<14} size={result['catalog_size']:<8} " + "  ".join(changes))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    saved = (token_verifier.jwt_secret, catalog_cache.max_rows)
+    results = []
+    try:
+        for size in args.sizes:
+            results.extend(await run_size(size, args))
+    finally:
+        token_verifier.jwt_secret, catalog_cache.max_rows = saved
+        token_verifier.clear()
+        catalog_cache.invalidate()
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "remote_auth": args.remote_auth,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="comma separated catalog sizes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="extra random upstream latency")
+    parser.add_argument("--remote-auth", action="store_true",
+                        help="validate tokens with the fake GoTrue instead of locally")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
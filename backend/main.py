@@ -1,8 +1,47 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.core.config import settings
-from app.routers import auth, words
+from app.core.database import supabase
+from app.core.profiling import ProfilingMiddleware, profiler
+from app.core.resilience import UpstreamUnavailableError
+from app.core.telemetry import TelemetryMiddleware, telemetry
+from app.routers import admin, auth, progress, words
+from app.services.catalog_events import catalog_events
+from app.services.progress_buffer import progress_buffer
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """Open shared upstream connections on startup and close them on shutdown"""
+    await supabase.open()
+    await progress_buffer.start()
+    await catalog_events.start()
+    lag_monitor = None
+    if telemetry.metrics_enabled:
+        lag_monitor = asyncio.create_task(
+            telemetry.monitor_event_loop(settings.event_loop_lag_interval_seconds)
+        )
+    yield
+    if lag_monitor is not None:
+        lag_monitor.cancel()
+        with suppress(asyncio.CancelledError):
+            await lag_monitor
+    await catalog_events.stop()
+    # Write out buffered answer events before the connections close
+    await progress_buffer.stop()
+    await supabase.close()
+
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailableError):
+    """Fail fast with 503 while Supabase is overloaded or its circuit is open"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 def create_application() -> FastAPI:
     """Create and configure the FastAPI application"""
@@ -11,7 +50,8 @@ def create_application() -> FastAPI:
     application = FastAPI(
         title=settings.api_title,
         version=settings.api_version,
-        description=settings.api_description
+        description=settings.api_description,
+        lifespan=lifespan
     )
     
     # Configure CORS middleware
@@ -23,9 +63,33 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Admin-only profiling; nothing is installed while it is off
+    if settings.profiling_enabled:
+        application.add_middleware(ProfilingMiddleware, profiler=profiler)
+    
+    # Request latency histograms and Server-Timing headers
+    if telemetry.metrics_enabled or telemetry.server_timing_enabled:
+        application.add_middleware(TelemetryMiddleware, telemetry=telemetry)
+    if telemetry.tracing_enabled:
+        telemetry.setup_tracing(application)
+    
+    application.add_exception_handler(UpstreamUnavailableError, upstream_unavailable_handler)
+    
     # Include routers
     application.include_router(auth.router)
     application.include_router(words.router)
+    application.include_router(progress.router)
+    if settings.profiling_enabled:
+        application.include_router(admin.router)
+    
+    # Internal only: nginx proxies /api, not /metrics
+    if telemetry.metrics_enabled:
+        @application.get("/metrics", include_in_schema=False)
+        async def metrics():
+            """Prometheus text exposition of the app's metrics"""
+            return PlainTextResponse(
+                telemetry.render_metrics(), media_type="text/plain; version=0.0.4"
+            )
     
     return application
 
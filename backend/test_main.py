@@ -1,61 +1,63 @@
+import time
 import pytest
+from jose import jwt
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, call, MagicMock, AsyncMock
 from main import app
+from app.core.security import token_verifier
+from app.services.catalog_cache import catalog_cache
 
 client = TestClient(app)
 
 # Mock Supabase responses
 @pytest.fixture
 def mock_supabase_auth():
-    with patch("main.supabase") as mock_supabase:
+    with patch("app.services.auth_service.supabase") as mock_supabase:
         # Setup auth mock
         mock_auth = MagicMock()
         mock_supabase.auth = mock_auth
         
         # Setup user response
-        mock_user = MagicMock()
-        mock_user.id = "user-id-123"
-        mock_user.email = "test@example.com"
+        mock_user = {"id": "user-id-123", "email": "test@example.com"}
         
         # Setup session response
-        mock_session = MagicMock()
-        mock_session.access_token = "mock-access-token"
-        
-        # Setup auth response
-        mock_auth_response = MagicMock()
-        mock_auth_response.user = mock_user
-        mock_auth_response.session = mock_session
+        mock_session = {"access_token": "mock-access-token", "user": mock_user}
         
         # Setup auth methods
-        mock_auth.sign_up.return_value = mock_auth_response
-        mock_auth.sign_in_with_password.return_value = mock_auth_response
-        mock_auth.get_user.return_value = mock_user
+        mock_auth.sign_up = AsyncMock(return_value=mock_user)
+        mock_auth.sign_in_with_password = AsyncMock(return_value=mock_session)
+        mock_auth.get_user = AsyncMock(return_value=mock_user)
         
         yield mock_supabase
 
 
+def keyset_pages(mock_select):
+    """Serve the rows set as mock_select's return value in keyset pages, like PostgREST"""
+    def select(table=None, columns="*", filters=None, order=None, limit=None):
+        rows = mock_select.return_value
+        for column, condition in (filters or {}).items():
+            if condition.startswith("gt."):
+                rows = [row for row in rows if row[column] > int(condition[3:])]
+        return rows[:limit] if limit else rows
+    return select
+
+
 @pytest.fixture
 def mock_supabase_table():
-    with patch("main.supabase") as mock_supabase:
-        # Setup table mock
-        mock_table = MagicMock()
-        mock_supabase.table.return_value = mock_table
-        
-        # Setup execute response
-        mock_execute = MagicMock()
-        mock_execute.data = [
+    catalog_cache.invalidate()
+    with patch("app.services.word_service.supabase") as mock_supabase:
+        # Setup select response
+        mock_supabase.select = AsyncMock(return_value=[
             {"id": 1, "malayalam_word": "manga", "english_meaning": "mango"},
             {"id": 2, "malayalam_word": "bhakshanam", "english_meaning": "food"},
             {"id": 3, "malayalam_word": "chore", "english_meaning": "rice"},
             {"id": 4, "malayalam_word": "kadala", "english_meaning": "beans"},
             {"id": 5, "malayalam_word": "kadala", "english_meaning": "beans"},
-        ]
-        
-        # Setup table chain
-        mock_table.select.return_value.execute.return_value = mock_execute
+        ])
+        mock_supabase.select.side_effect = keyset_pages(mock_supabase.select)
         
         yield mock_supabase
+    catalog_cache.invalidate()
 
 
 # /api/auth/signup tests
@@ -113,14 +115,120 @@ def test_login_failure(mock_supabase_auth):
     assert "Invalid credentials" in response.json()["detail"]
 
 
+def test_login_fails_fast_when_auth_is_unavailable(mock_supabase_auth):
+    """Test refused upstream calls surface as 503 with Retry-After"""
+    from app.core.resilience import UpstreamUnavailableError
+
+    mock_supabase_auth.auth.sign_in_with_password.side_effect = UpstreamUnavailableError(
+        "auth upstream is unavailable", retry_after=12.5
+    )
+    response = client.post(
+        "/api/auth/login",
+        json={"email": "test@example.com", "password": "password123"}
+    )
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "13"
+
+
 # /api/auth/user tests
-def test_get_user_success(mock_supabase_auth):
+@pytest.fixture
+def jwt_secret():
+    token_verifier.clear()
+    with patch.object(token_verifier, "jwt_secret", "test-jwt-secret"):
+        yield "test-jwt-secret"
+    token_verifier.clear()
+
+
+def make_token(key, algorithm="HS256", headers=None, **claims):
+    payload = {"sub": "user-id-123", "email": "test@example.com", "aud": "authenticated",
+               "role": "authenticated", "exp": int(time.time()) + 3600}
+    payload.update(claims)
+    return jwt.encode(payload, key, algorithm=algorithm, headers=headers)
+
+
+def test_get_user_success(mock_supabase_auth, jwt_secret):
     """Test successful user retrieval"""
-    response = client.get("/api/auth/user?token=valid-token")
-    
+    token = make_token(jwt_secret)
+    with patch("app.core.security.supabase") as mock_remote:
+        response = client.get(f"/api/auth/user?token={token}")
+        client.get(f"/api/auth/user?token={token}")
+
+    assert response.status_code == 200
+    assert response.json()["user"]["id"] == "user-id-123"
+    assert response.json()["user"]["email"] == "test@example.com"
+    mock_remote.auth.get_user.assert_not_called()
+
+
+def test_get_user_rejects_bad_tokens(jwt_secret):
+    """Test expired, forged and malformed tokens are rejected"""
+    expired = make_token(jwt_secret, exp=int(time.time()) - 10)
+    forged = make_token("some-other-secret")
+    for token in (expired, forged, "valid-token"):
+        response = client.get(f"/api/auth/user?token={token}")
+        assert response.status_code == 401
+
+
+def test_get_user_remote_fallback():
+    """Test tokens are validated by Supabase once when no secret is configured"""
+    token_verifier.clear()
+    token = make_token("unknown-secret")
+    with patch("app.core.security.supabase") as mock_remote:
+        mock_remote.auth.get_user = AsyncMock(return_value={"id": "user-id-123", "email": "test@example.com"})
+        for _ in range(2):
+            response = client.get(f"/api/auth/user?token={token}")
+            assert response.status_code == 200
+            assert response.json()["user"]["id"] == "user-id-123"
+
+    mock_remote.auth.get_user.assert_called_once_with(token)
+    token_verifier.clear()
+
+
+def test_get_user_remote_fallback_without_expiry():
+    """Test remotely validated tokens without a future exp are checked every time"""
+    token_verifier.clear()
+    payload = {"sub": "user-id-123", "aud": "authenticated"}
+    tokens = [jwt.encode(payload, "unknown-secret"),
+              jwt.encode({**payload, "exp": 0}, "unknown-secret"),
+              jwt.encode({**payload, "exp": int(time.time()) - 10}, "unknown-secret")]
+    with patch("app.core.security.supabase") as mock_remote:
+        mock_remote.auth.get_user = AsyncMock(return_value={"id": "user-id-123", "email": "test@example.com"})
+        for token in tokens:
+            for _ in range(2):
+                assert client.get(f"/api/auth/user?token={token}").status_code == 200
+
+    assert mock_remote.auth.get_user.await_count == 6
+    # Nor do they take room in the cache from tokens that can be reused
+    assert len(token_verifier._cache) == 0
+    token_verifier.clear()
+
+
+def test_get_user_with_jwks():
+    """Test asymmetric tokens are verified against the cached JWKS"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = dict(jwk.construct(public_pem, "RS256").to_dict(), kid="key-1")
+    token = make_token(private_pem, algorithm="RS256", headers={"kid": "key-1"})
+
+    token_verifier.clear()
+    with patch("app.core.security.supabase") as mock_remote, \
+            patch.object(token_verifier, "_jwks_fetched_at", float("-inf")):
+        mock_remote.request = AsyncMock(return_value={"keys": [public_jwk]})
+        response = client.get(f"/api/auth/user?token={token}")
+
     assert response.status_code == 200
-    assert "user" in response.json()
-    mock_supabase_auth.auth.get_user.assert_called_once_with("valid-token")
+    assert response.json()["user"]["id"] == "user-id-123"
+    mock_remote.request.assert_called_once_with("GET", "/auth/v1/.well-known/jwks.json")
+    token_verifier.clear()
 
 
 # /api/word-matching tests
@@ -131,14 +239,29 @@ def test_get_word_matching_success(mock_supabase_table):
     assert response.status_code == 200
     assert "data" in response.json()
     assert len(response.json()["data"]) == 5
-    mock_supabase_table.table.assert_called_once_with("word_matching")
+    # One keyset page, then the empty page that ends the read
+    assert mock_supabase_table.select.call_args_list == [
+        call("word_matching", "*", filters={}, order="id.asc", limit=1000),
+        call("word_matching", "*", filters={"id": "gt.5"}, order="id.asc", limit=1000),
+    ]
+
+
+def test_get_word_matching_matches_documented_model(mock_supabase_table):
+    """Test the pre-serialized body is a WordMatchingResponse, as the OpenAPI schema says"""
+    from app.models.word_matching import WordMatchingResponse
+
+    response = client.get("/api/word-matching?count=3")
+    assert response.headers["content-type"] == "application/json"
+    assert len(WordMatchingResponse.model_validate_json(response.content).data) == 3
+
+    schema = app.openapi()["paths"]["/api/word-matching"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/WordMatchingResponse"}
 
 
 def test_get_word_matching_few_entries(mock_supabase_table):
     """Test word matching with fewer than 5 entries"""
     # Change the data to have fewer than 5 entries
-    mock_execute = mock_supabase_table.table.return_value.select.return_value.execute.return_value
-    mock_execute.data = [
+    mock_supabase_table.select.return_value = [
         {"id": 1, "malayalam_word": "ആപ്പിൾ", "english_meaning": "apple"},
         {"id": 2, "malayalam_word": "പഴം", "english_meaning": "fruit"}
     ]
@@ -146,4 +269,934 @@ def test_get_word_matching_few_entries(mock_supabase_table):
     response = client.get("/api/word-matching")
     
     assert response.status_code == 200
-    assert len(response.json()["data"]) == 2 
\ No newline at end of file
+    assert len(response.json()["data"]) == 2 
+
+
+def test_get_word_matching_served_from_cache(mock_supabase_table):
+    """Test repeated requests reuse the cached catalog"""
+    for _ in range(3):
+        response = client.get("/api/word-matching")
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 5
+
+    # One keyset page, then the empty page that ends the read
+    assert mock_supabase_table.select.call_args_list == [
+        call("word_matching", "*", filters={}, order="id.asc", limit=1000),
+        call("word_matching", "*", filters={"id": "gt.5"}, order="id.asc", limit=1000),
+    ]
+
+
+def test_get_word_matching_filters(mock_supabase_table):
+    """Test count, difficulty and category filters"""
+    mock_supabase_table.select.return_value = [
+        {"id": i, "malayalam_word": f"word{i}", "english_meaning": f"meaning{i}",
+         "difficulty_level": i % 3, "category": "Fruits" if i % 2 else "food"}
+        for i in range(30)
+    ]
+
+    response = client.get("/api/word-matching?count=8")
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 8
+
+    response = client.get("/api/word-matching?count=10&difficulty_level=1&category=fruits")
+    data = response.json()["data"]
+    assert len(data) == 5
+    assert all(row["difficulty_level"] == 1 and row["category"] == "Fruits" for row in data)
+
+    response = client.get("/api/word-matching?category=vegetables")
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+
+    response = client.get("/api/word-matching?count=0")
+    assert response.status_code == 422
+
+
+def test_payload_buffer_refills_and_drops_stale_versions():
+    """Test buffered payloads are reused per version and never served stale"""
+    import asyncio
+    import itertools
+    from app.services.payload_buffer import PayloadBuffer
+
+    async def run():
+        buffer = PayloadBuffer(depth=8, max_keys=2)
+        counter = itertools.count()
+        v1 = lambda: b"v1-%d" % next(counter)
+        v2 = lambda: b"v2-%d" % next(counter)
+
+        first = buffer.take("key", 1, v1)
+        await asyncio.sleep(0.01)
+        assert buffer.buffered("key") == 8
+        second = buffer.take("key", 1, v1)
+
+        # A new catalog version discards everything rendered from the old one
+        third = buffer.take("key", 2, v2)
+        await asyncio.sleep(0.01)
+        remaining = [buffer.take("key", 2, v2) for _ in range(8)]
+
+        buffer.take("other", 1, v1)
+        buffer.take("third", 1, v1)
+        assert buffer.buffered("key") == 0
+        buffer.clear()
+        return first, second, third, remaining
+
+    first, second, third, remaining = asyncio.run(run())
+    assert first.startswith(b"v1") and second.startswith(b"v1") and first != second
+    assert third.startswith(b"v2")
+    assert all(payload.startswith(b"v2") for payload in remaining)
+    assert len(set(remaining)) == len(remaining)
+
+
+def test_word_matching_challenge_mode(mock_supabase_table):
+    """Test challenge rounds pair each word with its look-alikes"""
+    import asyncio
+    from app.services.word_service import WORD_MATCHING_TABLE, neighbor_flight, neighbor_table
+    mock_supabase_table.select.return_value = [
+        {"id": 1, "malayalam_word": "manga", "english_meaning": "mango", "category": "fruit"},
+        {"id": 2, "malayalam_word": "chore", "english_meaning": "rice", "category": "food"},
+        {"id": 3, "malayalam_word": "panga", "english_meaning": "share", "category": "fruit"},
+        {"id": 4, "malayalam_word": "ചോറ്", "english_meaning": "rice", "category": "food"},
+    ]
+
+    async def load():
+        snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+        # Loading the catalog started the build; waiting joins it
+        assert neighbor_flight.in_flight(snapshot.version)
+        coalesced = neighbor_flight.coalesced
+        await neighbor_table(snapshot)
+        assert neighbor_flight.coalesced == coalesced + 1
+
+    asyncio.run(load())
+    for _ in range(10):
+        response = client.get("/api/word-matching?count=2&mode=challenge")
+        assert response.status_code == 200
+        assert sorted(row["id"] for row in response.json()["data"]) in ([1, 3], [2, 4])
+
+    assert client.get("/api/word-matching?mode=hard").status_code == 422
+
+
+def test_word_matching_challenge_mode_while_neighbors_build(mock_supabase_table):
+    """Test challenge requests get random rounds instead of waiting for the neighbor table"""
+    import asyncio
+    import orjson
+    from app.services.word_service import WORD_MATCHING_TABLE, WordService, neighbor_flight
+
+    async def run():
+        snapshot = await catalog_cache.get(WORD_MATCHING_TABLE)
+        payload = await WordService.get_word_matching_payload(count=3, mode="challenge")
+        assert "neighbors" not in snapshot.derived
+        assert neighbor_flight.in_flight(snapshot.version)
+        return orjson.loads(payload)["data"]
+
+    data = asyncio.run(run())
+    assert len(data) == 3
+    assert len({row["id"] for row in data}) == 3
+
+
+def test_neighbor_table():
+    """Test neighbors prefer close spellings in the same category and skip duplicates"""
+    from app.services.neighbors import build_neighbor_table
+
+    rows = [
+        {"malayalam_word": "manga", "category": "fruit", "difficulty_level": 1},
+        {"malayalam_word": "മാങ്ങ", "category": "fruit", "difficulty_level": 1},
+        {"malayalam_word": "panga", "category": "fruit", "difficulty_level": 1},
+        {"malayalam_word": "mangosteen", "category": "fruit", "difficulty_level": 3},
+        {"malayalam_word": "manja", "category": "colour", "difficulty_level": 1},
+    ]
+    table = build_neighbor_table(rows, k=3)
+    assert table.shape == (5, 3)
+    # The same word in another script is not a distractor
+    assert list(table[0]) == [2, 4, 3]
+    assert list(table[1]) == list(table[0])
+
+
+# Word catalog cache tests
+def test_catalog_version_bumps_only_on_change(mock_supabase_table):
+    """Test refreshing the catalog keeps the version until rows change"""
+    import asyncio
+    from app.services.catalog_cache import CatalogCache
+
+    first = asyncio.run(catalog_cache.refresh("word_matching"))
+    unchanged = asyncio.run(catalog_cache.refresh("word_matching"))
+    assert unchanged.version == first.version
+
+    mock_supabase_table.select.return_value = [{"id": 6, "malayalam_word": "pazham", "english_meaning": "banana"}]
+    changed = asyncio.run(catalog_cache.refresh("word_matching"))
+    assert changed.version > first.version
+    assert list(changed.rows) == mock_supabase_table.select.return_value
+
+
+def test_catalog_version_follows_sheets_sync(tmp_path):
+    """Test workers take the version sheets-sync published, and rows that change first get the next one"""
+    import asyncio
+    from app.services.catalog_cache import CatalogCache
+
+    rows = [{"id": 1, "malayalam_word": "manga", "english_meaning": "mango"}]
+
+    async def load():
+        return list(rows)
+
+    (tmp_path / "words.json").write_text('{"table": "words", "version": 41}')
+    workers = [CatalogCache(ttl_seconds=300, max_rows=100, notices_dir=str(tmp_path)) for _ in range(2)]
+    for worker in workers:
+        worker.register("words", load)
+    assert asyncio.run(workers[0].refresh("words")).version == 41
+
+    # Synced rows show up in one worker before the notice does
+    rows.append({"id": 2, "malayalam_word": "pazham", "english_meaning": "banana"})
+    assert asyncio.run(workers[0].refresh("words")).version == 42
+    (tmp_path / "words.json").write_text('{"table": "words", "version": 42}')
+    assert asyncio.run(workers[0].refresh("words")).version == 42
+    assert asyncio.run(workers[1].refresh("words")).version == 42
+
+
+def test_catalog_loads_coalesce_and_serve_stale():
+    """Test concurrent misses share one load and expired snapshots are served stale"""
+    import asyncio
+    from app.services.catalog_cache import CatalogCache
+
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [{"id": len(calls)}]
+
+    async def run():
+        cache = CatalogCache(ttl_seconds=0, max_rows=100)
+        cache.register("words", loader)
+        first = await asyncio.gather(*(cache.get("words") for _ in range(10)))
+        assert len(calls) == 1 and cache.coalesced == 9
+
+        # Expired: the old rows come back immediately, one refresh runs behind them
+        stale = await asyncio.gather(*(cache.get("words") for _ in range(5)))
+        await asyncio.sleep(0.02)
+        fresh = cache.peek("words")
+        return first, stale, fresh, cache.stale_served
+
+    first, stale, fresh, stale_served = asyncio.run(run())
+    assert all(snapshot.rows == [{"id": 1}] for snapshot in first + stale)
+    assert stale_served == 5
+    assert len(calls) == 2 and fresh.rows == [{"id": 2}]
+
+
+def test_shared_catalog_single_publisher(tmp_path):
+    """Test only the leading worker fetches, and others map its snapshot file"""
+    import asyncio
+    from app.services.catalog_cache import CatalogCache
+    from app.services.shared_catalog import SharedCatalog
+
+    rows = [{"id": 1, "malayalam_word": "manga", "english_word": "mango", "difficulty_level": 1, "category": "Fruits"},
+            {"id": 2, "malayalam_word": "chore", "english_word": "rice", "difficulty_level": None, "category": None}]
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        return [dict(row) for row in rows]
+
+    async def run():
+        path = str(tmp_path / "word_matching.bin")
+        leader, follower = SharedCatalog(path, fetch), SharedCatalog(path, fetch)
+        caches = [CatalogCache(ttl_seconds=300, max_rows=100) for _ in range(2)]
+        caches[0].register("words", leader.load)
+        caches[1].register("words", follower.load)
+
+        first = [await cache.get("words") for cache in caches]
+        rows.append({"id": 3, "malayalam_word": "pazham", "english_word": "banana",
+                     "difficulty_level": 2, "category": "Fruits"})
+        second = [await cache.refresh("words") for cache in caches]
+        return leader, follower, first, second
+
+    leader, follower, first, second = asyncio.run(run())
+    assert leader.is_leader and not follower.is_leader
+    assert len(fetches) == 2
+    assert first[0].version == first[1].version
+    assert list(first[1].rows) == rows[:2]
+    assert second[0].version == second[1].version > first[0].version
+    assert second[1].rows[2]["english_word"] == "banana"
+
+
+def test_columnar_catalog_matches_rows():
+    """Test the columnar catalog returns the same rows in less memory"""
+    import random
+    import sys
+    from app.services.catalog_file import ColumnarRows
+    from app.services.word_sampler import WordSampler
+    from benchmarks.fake_supabase import make_catalog
+
+    rows = make_catalog(500)
+    rows[3]["category"] = None
+    rows[4]["malayalam_word"] = None
+    columnar = ColumnarRows.from_rows(rows, version=7, checksum="abc")
+
+    assert columnar.version == 7
+    assert list(columnar) == rows
+    assert columnar[-1] == rows[-1]
+    assert list(columnar.values("category")) == [row["category"] for row in rows]
+    assert columnar.nbytes < sum(sys.getsizeof(row) for row in rows)
+
+    sample = WordSampler(columnar).sample(5, difficulty_level=2, rng=random.Random(0))
+    assert len(sample) == 5
+    assert all(row["difficulty_level"] == 2 for row in sample)
+
+
+# Supabase data layer tests
+def test_supabase_client_requests():
+    """Test the async client's PostgREST params and error mapping"""
+    import asyncio
+    import httpx
+    from app.core.database import SupabaseClient, DatabaseError
+
+    def handler(request):
+        if request.url.path == "/auth/v1/user":
+            return httpx.Response(401, json={"msg": "invalid JWT"})
+        assert request.url.params["select"] == "id,malayalam_word"
+        assert request.url.params["id"] == "gt.10"
+        return httpx.Response(200, json=[{"id": 11, "malayalam_word": "manga"}])
+
+    async def run():
+        db = SupabaseClient("https://example.supabase.co", "anon-key")
+        db._client = httpx.AsyncClient(base_url=db.url, transport=httpx.MockTransport(handler))
+        rows = await db.select("word_matching", "id,malayalam_word", filters={"id": "gt.10"})
+        with pytest.raises(DatabaseError) as exc_info:
+            await db.auth.get_user("bad-token")
+        await db.close()
+        return rows, exc_info.value
+
+    rows, error = asyncio.run(run())
+    assert rows == [{"id": 11, "malayalam_word": "manga"}]
+    assert error.status_code == 401
+    assert str(error) == "invalid JWT"
+
+
+def test_supabase_circuit_breaker_and_bulkhead():
+    """Test repeated upstream failures open the circuit and half-open probes close it"""
+    import asyncio
+    import httpx
+    from app.core.database import SupabaseClient, DatabaseError
+    from app.core.resilience import Bulkhead, UpstreamUnavailableError
+
+    healthy = False
+
+    def handler(request):
+        if not healthy:
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(200, json=[])
+
+    async def run():
+        nonlocal healthy
+        db = SupabaseClient("https://example.supabase.co", "anon-key")
+        db._client = httpx.AsyncClient(base_url=db.url, transport=httpx.MockTransport(handler))
+        breaker = db.breakers["data"]
+        breaker.failure_threshold, breaker.reset_seconds = 2, 0.05
+
+        for _ in range(2):
+            with pytest.raises(DatabaseError):
+                await db.select("word_matching")
+        with pytest.raises(UpstreamUnavailableError) as exc_info:
+            await db.select("word_matching")
+        assert exc_info.value.retry_after == 1
+
+        # Auth has its own breaker and is unaffected
+        assert db.breakers["auth"].state == "closed"
+
+        await asyncio.sleep(0.06)
+        healthy = True
+        assert await db.select("word_matching") == []
+        assert breaker.state == "closed"
+        await db.close()
+
+        # A full bulkhead rejects instead of queueing without bound
+        bulkhead = Bulkhead("auth", max_concurrency=1, max_queue=0, queue_timeout=1)
+        async with bulkhead:
+            with pytest.raises(UpstreamUnavailableError):
+                async with bulkhead:
+                    pass
+
+    asyncio.run(run())
+
+
+def test_bulkhead_returns_permits_of_abandoned_waits():
+    """Test a waiter that times out or is cancelled never keeps a permit"""
+    import asyncio
+    from app.core.resilience import Bulkhead, UpstreamUnavailableError
+
+    async def wait(bulkhead):
+        async with bulkhead:
+            pass
+
+    async def run():
+        bulkhead = Bulkhead("data", max_concurrency=1, max_queue=2, queue_timeout=0.05)
+        await bulkhead.__aenter__()
+        with pytest.raises(UpstreamUnavailableError):
+            await wait(bulkhead)
+
+        # Cancelled in the same step the slot is handed over to it
+        waiter = asyncio.create_task(wait(bulkhead))
+        await asyncio.sleep(0.01)
+        assert bulkhead.waiting == 1
+        await bulkhead.__aexit__(None, None, None)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+        assert (bulkhead.active, bulkhead.waiting) == (0, 0)
+        assert not bulkhead._semaphore.locked()
+        async with asyncio.timeout(0.01):
+            await wait(bulkhead)
+
+    asyncio.run(run())
+
+
+def test_keyset_pagination_reads_past_max_rows():
+    """Test paginated reads return every row even when PostgREST caps responses"""
+    import asyncio
+    import httpx
+    from app.core.database import SupabaseClient
+    from app.core.pagination import iter_pages, select_all
+    from benchmarks.fake_supabase import FakeSupabaseTransport, make_catalog
+
+    rows = make_catalog(2500)
+    transport = FakeSupabaseTransport(tables={"word_matching": rows[::-1]}, max_rows=1000)
+
+    async def run():
+        db = SupabaseClient("https://example.supabase.co", "anon-key")
+        db._client = httpx.AsyncClient(base_url=db.url, transport=transport)
+        capped = await db.select("word_matching")
+        everything = await select_all(db, "word_matching", page_size=1000, prefetch=2)
+        projected = await select_all(db, "word_matching", columns="category", page_size=700, prefetch=0)
+        # Pages come back capped at max-rows, shorter than asked for
+        oversized = await select_all(db, "word_matching", page_size=5000, prefetch=2)
+        oversized_sync = await select_all(db, "word_matching", page_size=1500, prefetch=0)
+
+        first_pages = []
+        async for page in iter_pages(db, "word_matching", page_size=100):
+            first_pages.append(page)
+            if len(first_pages) == 2:
+                break
+        await db.close()
+        return capped, everything, projected, oversized, oversized_sync, first_pages
+
+    capped, everything, projected, oversized, oversized_sync, first_pages = asyncio.run(run())
+    assert len(capped) == 1000
+    assert everything == rows
+    assert oversized == rows
+    assert oversized_sync == rows
+    assert projected[-1] == {"id": 2500, "category": rows[-1]["category"]}
+    assert len(projected) == 2500
+    assert [page[0]["id"] for page in first_pages] == [1, 101]
+
+
+# /api/word-matching/session tests
+def test_word_matching_session_pages_without_repeats(mock_supabase_table):
+    """Test a session returns many rounds and resumes from its cursor"""
+    mock_supabase_table.select.return_value = [
+        {"id": i, "malayalam_word": f"word{i}", "english_meaning": f"meaning{i}"}
+        for i in range(23)
+    ]
+
+    response = client.get("/api/word-matching/session?rounds=2&count=5&seed=42")
+    assert response.status_code == 200
+    body = response.json()
+    assert [len(r) for r in body["rounds"]] == [5, 5]
+    assert body["seed"] == 42
+
+    # The same seed reproduces the same session
+    again = client.get("/api/word-matching/session?rounds=2&count=5&seed=42").json()
+    assert again["rounds"] == body["rounds"]
+
+    seen = [row["id"] for r in body["rounds"] for row in r]
+    cursor = body["next_cursor"]
+    while cursor:
+        page = client.get(f"/api/word-matching/session?rounds=2&count=5&cursor={cursor}").json()
+        seen += [row["id"] for r in page["rounds"] for row in r]
+        cursor = page["next_cursor"]
+
+    assert sorted(seen) == list(range(23))
+    # One keyset page, then the empty page that ends the read
+    assert mock_supabase_table.select.call_args_list == [
+        call("word_matching", "*", filters={}, order="id.asc", limit=1000),
+        call("word_matching", "*", filters={"id": "gt.22"}, order="id.asc", limit=1000),
+    ]
+
+
+def test_word_matching_session_stale_cursor(mock_supabase_table, tmp_path):
+    """Test a cursor is honoured by any worker with the same rows and rejected once they change"""
+    import asyncio
+    from app.services.catalog_cache import CatalogCache
+
+    (tmp_path / "word_matching.json").write_text('{"table": "word_matching", "version": 41}')
+    # As in a fresh worker: no earlier version numbered by this process
+    with patch.object(catalog_cache, "notices_dir", str(tmp_path)), patch.object(catalog_cache, "_versions", {}):
+        body = client.get("/api/word-matching/session?rounds=1&count=2").json()
+    assert body["version"] == 41
+
+    # Another worker loads the same rows and numbers them the same
+    other = CatalogCache(ttl_seconds=300, max_rows=100, notices_dir=str(tmp_path))
+    other.register("word_matching", lambda: mock_supabase_table.select())
+    with patch("app.services.word_service.catalog_cache", other):
+        assert client.get(f"/api/word-matching/session?cursor={body['next_cursor']}").status_code == 200
+
+    mock_supabase_table.select.return_value = [{"id": 9, "malayalam_word": "pazham", "english_meaning": "banana"}]
+    asyncio.run(catalog_cache.refresh("word_matching"))
+
+    response = client.get(f"/api/word-matching/session?cursor={body['next_cursor']}")
+    assert response.status_code == 409
+
+    response = client.get("/api/word-matching/session?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+# /api/word-matching/catalog tests
+def test_word_matching_catalog_etag_and_delta(mock_supabase_table):
+    """Test the catalog honours If-None-Match and serves deltas since a version"""
+    import asyncio
+
+    response = client.get("/api/word-matching/catalog")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["full"] is True
+    assert len(body["data"]) == 5
+
+    etag = response.headers["etag"]
+    response = client.get("/api/word-matching/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    # Change one row, drop one and add one
+    mock_supabase_table.select.return_value = [
+        {"id": 1, "malayalam_word": "manga", "english_meaning": "mango"},
+        {"id": 2, "malayalam_word": "bhakshanam", "english_meaning": "meal"},
+        {"id": 3, "malayalam_word": "chore", "english_meaning": "rice"},
+        {"id": 4, "malayalam_word": "kadala", "english_meaning": "beans"},
+        {"id": 6, "malayalam_word": "pazham", "english_meaning": "banana"},
+    ]
+    asyncio.run(catalog_cache.refresh("word_matching"))
+
+    delta = client.get(f"/api/word-matching/catalog?since={body['version']}").json()
+    assert delta["full"] is False
+    assert delta["version"] > body["version"]
+    assert sorted(row["id"] for row in delta["data"]) == [2, 6]
+    assert delta["removed"] == [5]
+
+    current = client.get(f"/api/word-matching/catalog?since={delta['version']}")
+    assert current.status_code == 304
+
+    # A version the server no longer knows gets the whole catalog
+    unknown = client.get("/api/word-matching/catalog?since=0").json()
+    assert unknown["full"] is True
+    assert len(unknown["data"]) == 5
+
+
+# /api/word-matching/events tests
+def test_catalog_events_stream(mock_supabase_table, tmp_path):
+    """Test a sheets-sync notice reloads the catalog and reaches open event streams"""
+    import asyncio
+    from app.services.catalog_events import CatalogEvents
+
+    async def next_event(stream):
+        async with asyncio.timeout(2):
+            while True:
+                chunk = await anext(stream)
+                if not chunk.startswith(": ping"):
+                    return chunk
+
+    async def run():
+        events = CatalogEvents(str(tmp_path), poll_seconds=0.01, heartbeat_seconds=0.02,
+                               stream_seconds=0.3, settle_seconds=1.0)
+        events.watch("word_matching")
+        await events.start()
+        stream = events.stream()
+        assert (await anext(stream)).startswith("retry: ")
+        first = await catalog_cache.get("word_matching")
+        assert f"id: {first.version}\nevent: catalog\n" in await next_event(stream)
+        assert events.subscribers == 1
+
+        # sheets-sync changed the table and replaced the notice
+        mock_supabase_table.select.return_value = [{"id": 1, "malayalam_word": "manga", "english_meaning": "mango"}]
+        (tmp_path / "word_matching.json").write_text('{"table": "word_matching", "version": 2}')
+        chunk = await next_event(stream)
+        second = catalog_cache.peek("word_matching")
+        assert second.version > first.version
+        assert f"id: {second.version}\n" in chunk
+        # Two loads of one keyset page each
+        assert mock_supabase_table.select.await_count == 4
+
+        # Only keep-alives until the stream ends by itself
+        rest = [chunk async for chunk in stream]
+        assert rest and all(chunk == ": ping\n\n" for chunk in rest)
+        assert events.subscribers == 0
+        await events.stop()
+
+    asyncio.run(run())
+
+
+# /api/words/search tests
+def test_search_words(mock_supabase_table):
+    """Test search matches Manglish, Malayalam script and English, best first"""
+    import asyncio
+    from app.services.catalog_cache import compute_row_index
+    from app.services.word_search import WordSearchIndex, word_search_index
+
+    mock_supabase_table.select.return_value = [
+        {"id": 1, "malayalam_word": "manga", "english_meaning": "mango"},
+        {"id": 2, "malayalam_word": "പഴം", "english_meaning": "banana"},
+        {"id": 3, "malayalam_word": "chore", "english_meaning": "rice"},
+        {"id": 4, "malayalam_word": "മാങ്ങ", "english_meaning": "green mango"},
+    ]
+    response = client.get("/api/words/search?q=man")
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()["data"]] == [1, 4]
+
+    # Typed in Latin letters, found in Malayalam script and the other way round
+    assert [row["id"] for row in client.get("/api/words/search?q=pazham").json()["data"]] == [2]
+    assert [row["id"] for row in client.get("/api/words/search?q=മാങ്ങ").json()["data"]] == [1, 4]
+    # A typo still finds the word
+    assert [row["id"] for row in client.get("/api/words/search?q=banan").json()["data"]] == [2]
+    assert [row["id"] for row in client.get("/api/words/search?q=bnana").json()["data"]] == [2]
+
+    # After a refresh the previous index answers until the new one is built off the event loop
+    previous = word_search_index.active.version
+    mock_supabase_table.select.return_value = [
+        {"id": 1, "malayalam_word": "manga", "english_meaning": "mango"},
+        {"id": 2, "malayalam_word": "പഴം", "english_meaning": "banana"},
+        {"id": 3, "malayalam_word": "chore", "english_meaning": "cooked rice"},
+    ]
+    snapshot = asyncio.run(catalog_cache.refresh("word_matching"))
+
+    async def search_during_rebuild():
+        row_index = lambda: catalog_cache.row_index(snapshot)
+        served = await word_search_index.current(snapshot.version, snapshot.rows, row_index)
+        assert served.version == previous
+        await word_search_index.build(snapshot.version, snapshot.rows, row_index)
+        return word_search_index.active
+
+    assert asyncio.run(search_during_rebuild()).version == snapshot.version
+    assert [row["id"] for row in client.get("/api/words/search?q=cooked").json()["data"]] == [3]
+    assert [row["id"] for row in client.get("/api/words/search?q=man").json()["data"]] == [1]
+
+    assert client.get("/api/words/search?q=").status_code == 422
+
+    # A sync re-indexes only the rows that changed
+    index = WordSearchIndex()
+    rows = mock_supabase_table.select.return_value
+    assert index.sync(1, rows, compute_row_index(rows)) == 3
+    rows = rows[:2] + [{"id": 3, "malayalam_word": "chore", "english_meaning": "rice"}]
+    assert index.sync(2, rows, compute_row_index(rows)) == 1
+
+
+# /api/progress tests
+def test_record_progress(jwt_secret):
+    """Test answer events are buffered for the signed-in user, with 401, 422 and 429 guards"""
+    from app.core.config import settings
+    from app.services.progress_buffer import progress_buffer
+
+    headers = {"Authorization": f"Bearer {make_token(jwt_secret)}"}
+    client_id = "0b7c3a52-6f1e-4d8e-9a43-1f2d3c4b5a69"
+    events = {"events": [{"event_id": client_id, "word_id": 1, "correct": True, "response_ms": 850},
+                         {"word_id": 2, "correct": False}]}
+    with patch.object(progress_buffer, "rows", []), patch.object(progress_buffer, "max_rows", 3), \
+            patch("app.services.progress_service.review_scheduler"):
+        response = client.post("/api/progress", json=events, headers=headers)
+        assert response.status_code == 202
+        assert response.json() == {"accepted": 2}
+        assert [row["word_id"] for row in progress_buffer.rows] == [1, 2]
+        assert progress_buffer.rows[0]["user_id"] == "user-id-123"
+        # A client id is kept so a retry dedupes; missing ones are filled in
+        assert progress_buffer.rows[0]["event_id"] == client_id
+        assert progress_buffer.rows[1]["event_id"] not in ("", None, client_id)
+
+        # Full buffer: push back instead of queueing without bound
+        response = client.post("/api/progress", json=events, headers=headers)
+        assert response.status_code == 429
+        assert "retry-after" in response.headers
+        assert len(progress_buffer.rows) == 2
+
+    assert client.post("/api/progress", json=events).status_code == 401
+    too_many = {"events": [{"word_id": 1, "correct": True}] * (settings.progress_max_events + 1)}
+    assert client.post("/api/progress", json=too_many, headers=headers).status_code == 422
+
+
+def test_write_behind_buffer_batches_and_spills(tmp_path):
+    """Test bulk inserts by size and time, and that failed batches spill and replay"""
+    import asyncio
+    from app.services.progress_buffer import WriteBehindBuffer
+
+    inserted = []
+    healthy = True
+
+    async def insert(rows):
+        if not healthy:
+            raise RuntimeError("Supabase is down")
+        inserted.append([row["n"] for row in rows])
+
+    spill = tmp_path / "spill.jsonl"
+
+    async def run():
+        nonlocal healthy
+        buffer = WriteBehindBuffer(insert, max_rows=100, batch_size=3, flush_seconds=0.05,
+                                   spill_path=str(spill))
+        await buffer.start()
+        # A full batch goes out right away, the rest after flush_seconds
+        assert buffer.offer([{"n": n} for n in range(4)])
+        await asyncio.sleep(0.01)
+        assert inserted == [[0, 1, 2]]
+        await asyncio.sleep(0.1)
+        assert inserted == [[0, 1, 2], [3]]
+
+        # Outage: the batch lands in the spill file, nothing is lost
+        healthy = False
+        buffer.offer([{"n": 4}, {"n": 5}])
+        await asyncio.sleep(0.1)
+        assert buffer.spilled == 2
+        assert len(spill.read_text().splitlines()) == 2
+
+        # Recovery: the next flush replays the spill
+        healthy = True
+        buffer.offer([{"n": 6}])
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert inserted[2:] == [[6], [4, 5]]
+    assert buffer.pending == 0
+    assert not spill.exists()
+
+
+# /api/word-matching/review tests
+def test_review_scheduler():
+    """Test SM-2 rescheduling, due order from the heap, and history merged with new answers"""
+    import asyncio
+    from app.services.review_scheduler import DAY, LearnerQueue, ReviewScheduler
+
+    queue = LearnerQueue()
+    queue.review(1, 4, 0.0)
+    queue.review(2, 1, 0.0)            # Missed: due again within minutes
+    queue.review(3, 5, -10 * DAY)
+    queue.review(3, 5, -9 * DAY)       # Second recall: due six days later
+    assert queue.cards[1].due == DAY
+    assert queue.cards[3].due == -3 * DAY
+    assert queue.due(now=60.0, limit=10) == [3]
+    assert queue.due(now=DAY, limit=10) == [3, 2, 1]
+    assert queue.due(now=DAY, limit=2) == [3, 2]
+    assert queue.due(now=DAY, limit=10, keep=lambda word_id: word_id != 2) == [3, 1]
+    # The old heap entry of a rescheduled word is skipped
+    queue.review(3, 4, DAY)
+    assert queue.due(now=DAY, limit=10) == [2, 1]
+
+    history = [
+        {"event_id": "a", "word_id": 7, "correct": True, "answered_at": "2026-01-01T00:00:00+00:00"},
+        {"event_id": "b", "word_id": 8, "correct": False, "answered_at": "2026-01-02T00:00:00+00:00"},
+    ]
+    loads = []
+
+    async def load_history(user_id):
+        loads.append(user_id)
+        # Answered while the history loads; "b" is also in the history and counts once
+        scheduler.record([{**history[1], "user_id": user_id},
+                          {"event_id": "c", "user_id": user_id, "word_id": 9, "correct": True,
+                           "answered_at": "2026-01-03T00:00:00+00:00"}])
+        return history
+
+    scheduler = ReviewScheduler(load_history, max_learners=2)
+    # Nobody asked for u1's reviews yet: the first load reads the table instead
+    scheduler.record([{**history[0], "user_id": "u1"}])
+    assert len(scheduler) == 0
+
+    async def run():
+        due = await scheduler.due_words("u1", 10)
+        assert await scheduler.due_words("u1", 10) == due
+        return due
+
+    assert asyncio.run(run()) == [7, 8, 9]
+    assert loads == ["u1"]
+    assert scheduler._learners["u1"].cards[8].repetitions == 0
+
+    # Least recently used learners are dropped beyond max_learners
+    asyncio.run(scheduler.learner("u2"))
+    asyncio.run(scheduler.learner("u3"))
+    assert len(scheduler) == 2 and "u1" not in scheduler._learners
+
+
+def test_word_matching_review(mock_supabase_table, jwt_secret):
+    """Test review rounds lead with the learner's due words and fill up with new ones"""
+    from app.services.progress_buffer import progress_buffer
+    from app.services.review_scheduler import ReviewScheduler
+
+    async def load_history(user_id):
+        return [{"event_id": "a", "word_id": 3, "correct": False, "answered_at": "2026-01-01T00:00:00+00:00"},
+                {"event_id": "b", "word_id": 4, "correct": True, "answered_at": "2026-01-01T00:00:00+00:00"},
+                {"event_id": "c", "word_id": 99, "correct": False, "answered_at": "2026-01-01T00:00:00+00:00"}]
+
+    scheduler = ReviewScheduler(load_history, max_learners=10)
+    headers = {"Authorization": f"Bearer {make_token(jwt_secret)}"}
+    with patch("app.services.word_service.review_scheduler", scheduler), \
+            patch("app.services.progress_service.review_scheduler", scheduler), \
+            patch.object(progress_buffer, "rows", []):
+        response = client.get("/api/word-matching/review?count=3", headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        # Word 99 is no longer in the catalog
+        assert body["reviews"] == 2
+        ids = [row["id"] for row in body["data"]]
+        assert ids[:2] == [3, 4] and len(set(ids)) == 3
+
+        # Answering word 3 right reschedules it out of the due queue
+        client.post("/api/progress", headers=headers,
+                    json={"events": [{"word_id": 3, "correct": True}]})
+        body = client.get("/api/word-matching/review?count=3", headers=headers).json()
+        assert [row["id"] for row in body["data"]][:1] == [4]
+        assert body["reviews"] == 1
+
+    assert client.get("/api/word-matching/review").status_code == 401
+
+
+def test_review_history_includes_unwritten_answers(tmp_path):
+    """Test a first load sees answers still buffered, being inserted or spilled"""
+    import asyncio
+    import json
+    from app.services import review_scheduler as scheduler_module
+    from app.services.progress_buffer import WriteBehindBuffer
+    from app.services.review_scheduler import ReviewScheduler
+
+    def answer(event_id, word_id, user_id="u1"):
+        return {"event_id": event_id, "user_id": user_id, "word_id": word_id, "correct": True,
+                "answered_at": "2026-01-01T00:00:00+00:00"}
+
+    # Left by an earlier outage, possibly by another worker
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text("".join(json.dumps(answer(*args)) + "\n" for args in [("s", 5), ("x", 6, "u2")]))
+    written = []
+
+    async def run():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def insert(rows):
+            started.set()
+            await release.wait()
+            written.extend(row["event_id"] for row in rows)
+
+        buffer = WriteBehindBuffer(insert, max_rows=100, batch_size=2, flush_seconds=60,
+                                   spill_path=str(spill))
+        buffer.offer([answer("a", 1), answer("b", 2), answer("c", 3)])
+        flush = asyncio.create_task(buffer.flush())
+        await started.wait()
+        assert buffer.in_flight == 2 and len(buffer.rows) == 1
+
+        async def select_all(*args, **kwargs):
+            # The table is read before the in-flight batch commits
+            table = list(written)
+            release.set()
+            await flush
+            return table
+
+        scheduler = ReviewScheduler(scheduler_module._load_answer_history, max_learners=10)
+        with patch.object(scheduler_module, "progress_buffer", buffer), \
+                patch.object(scheduler_module, "select_all", select_all):
+            return await scheduler.learner("u1")
+
+    queue = asyncio.run(run())
+    assert written[:2] == ["a", "b"]
+    assert sorted(queue.cards) == [1, 2, 3, 5]
+
+
+# Benchmark harness smoke test
+def test_benchmark_harness(tmp_path):
+    """Test the benchmark runs end to end against the fake Supabase"""
+    from benchmarks.run import main as run_benchmark
+
+    output = tmp_path / "results.json"
+    run_benchmark(["--sizes", "50", "--requests", "20", "--warmup", "5", "--concurrency", "4",
+                   "--latency-ms", "0", "--jitter-ms", "0", "--output", str(output)])
+
+    import json
+    report = json.loads(output.read_text())
+    assert {r["scenario"] for r in report["results"]} == {"word_matching", "word_search", "auth_login", "auth_user"}
+    assert all(r["errors"] == 0 for r in report["results"])
+    assert all(r["p50_ms"] <= r["p99_ms"] for r in report["results"])
+
+
+# /metrics tests
+def test_metrics_and_server_timing(mock_supabase_table):
+    """Test /metrics and Server-Timing when telemetry is switched on"""
+    from main import create_application
+    from app.core.telemetry import Telemetry
+
+    enabled = Telemetry(metrics_enabled=True, server_timing_enabled=True)
+    with patch("main.telemetry", enabled), \
+            patch("app.services.catalog_cache.telemetry", enabled), \
+            patch("app.core.database.telemetry", enabled):
+        with TestClient(create_application()) as instrumented:
+            client.get("/api/word-matching")
+            response = instrumented.get("/api/word-matching")
+            assert response.status_code == 200
+            assert response.headers["server-timing"].startswith("app;dur=")
+
+            with enabled.upstream("supabase GET /rest/v1/word_matching"):
+                pass
+            metrics = instrumented.get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/word-matching",status="200"} 1' in metrics
+    assert 'cache_requests_total{cache="catalog",result="hit"} 1' in metrics
+    assert 'upstream_request_duration_seconds_count{operation="supabase GET /rest/v1/word_matching"} 1' in metrics
+    assert "# TYPE event_loop_lag_seconds histogram" in metrics
+
+    # Disabled telemetry adds no header and no endpoint
+    assert "server-timing" not in client.get("/health").headers
+    assert client.get("/metrics").status_code == 404
+
+
+# /api/admin profiling tests
+def test_profiling(mock_supabase_table, jwt_secret):
+    """Test admin-only sampling and per-request profiles, and that nothing is mounted by default"""
+    from app.core.config import settings
+    from main import create_application
+
+    assert client.post("/api/admin/profile?seconds=0.1").status_code == 404
+
+    with patch.object(settings, "profiling_enabled", True):
+        profiled = TestClient(create_application())
+    admin = {"Authorization": f"Bearer {make_token(jwt_secret, app_metadata={'role': 'admin'})}"}
+    user = {"Authorization": f"Bearer {make_token(jwt_secret)}"}
+    assert profiled.post("/api/admin/profile?seconds=0.1", headers=user).status_code == 403
+    assert profiled.post("/api/admin/profile?seconds=600", headers=admin).status_code == 400
+
+    response = profiled.post("/api/admin/profile?seconds=0.2&interval_ms=5", headers=admin)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    # This test's own thread, blocked on the request
+    assert any("test_profiling" in line for line in lines)
+
+    response = profiled.get("/api/word-matching?count=2", headers={**admin, "X-Profile": "1"})
+    assert response.status_code == 200
+    stacks = profiled.get(f"/api/admin/profiles/{response.headers['x-profile-id']}", headers=admin).text
+    assert "WordService.get_word_matching_payload" in stacks
+    assert profiled.get("/api/admin/profiles/unknown", headers=admin).status_code == 404
+
+    # The header does nothing for anyone else
+    response = profiled.get("/api/word-matching?count=2", headers={**user, "X-Profile": "1"})
+    assert "x-profile-id" not in response.headers
+
+
+def test_admin_from_authorization(jwt_secret):
+    """Test the middleware's admin check parses the header like the auth dependency"""
+    import asyncio
+    from app.dependencies.auth import admin_from_authorization
+
+    admin_token = make_token(jwt_secret, app_metadata={"role": "admin"})
+
+    async def run():
+        return [
+            await admin_from_authorization(f"Bearer {admin_token}"),
+            await admin_from_authorization(f"bearer {admin_token}"),
+            await admin_from_authorization(f"Bearer {make_token(jwt_secret)}"),
+            await admin_from_authorization(f"Basic {admin_token}"),
+            await admin_from_authorization("Bearer not-a-jwt"),
+            await admin_from_authorization(None),
+        ]
+
+    admin, lowercase, *others = asyncio.run(run())
+    assert admin["id"] == "user-id-123" and lowercase == admin
+    assert others == [None, None, None, None]
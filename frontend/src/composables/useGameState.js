@@ -1,9 +1,11 @@
 import { ref, computed, reactive } from 'vue'
+import { useProgress } from './useProgress'
 
 export function useMatchingGame() {
   const matches = ref([])
   const selectedMalayalam = ref(null)
   const selectedEnglish = ref(null)
+  const { recordAnswer } = useProgress()
 
   const isMatched = (itemId) => {
     return matches.value.some(match => match.id === itemId)
@@ -23,10 +25,12 @@ export function useMatchingGame() {
 
   const checkForMatch = () => {
     if (selectedMalayalam.value && selectedEnglish.value) {
-      if (selectedMalayalam.value.id === selectedEnglish.value.id) {
+      const correct = selectedMalayalam.value.id === selectedEnglish.value.id
+      if (correct) {
         // Correct match
         matches.value.push(selectedMalayalam.value)
       }
+      recordAnswer(selectedMalayalam.value.id, correct)
       // Reset selections regardless of match result
       selectedMalayalam.value = null
       selectedEnglish.value = null
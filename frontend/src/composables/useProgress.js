@@ -0,0 +1,79 @@
+import { API_ENDPOINTS, GAME_CONFIG } from '../utils/constants'
+
+// Answers not yet accepted by the server, shared by every game in the tab
+const queue = []
+let timer = null
+let retryAt = 0
+
+const authHeaders = () => {
+  const token = localStorage.getItem('token')
+  return token ? { Authorization: `Bearer ${token}` } : null
+}
+
+const schedule = (delay = GAME_CONFIG.PROGRESS_FLUSH_MS) => {
+  if (!timer) {
+    timer = setTimeout(() => {
+      timer = null
+      flush()
+    }, delay)
+  }
+}
+
+const flush = async ({ keepalive = false } = {}) => {
+  const headers = authHeaders()
+  // Guests have no progress to keep; retries wait for the server's Retry-After
+  if (!headers) {
+    queue.length = 0
+    return
+  }
+  if (!queue.length || Date.now() < retryAt) return
+
+  const events = queue.splice(0, GAME_CONFIG.PROGRESS_BATCH_SIZE)
+  try {
+    const response = await fetch(API_ENDPOINTS.PROGRESS, {
+      method: 'POST',
+      headers: { ...headers, 'Content-Type': 'application/json' },
+      body: JSON.stringify({ events }),
+      keepalive
+    })
+    if (response.status === 429 || response.status >= 500) {
+      const seconds = Number(response.headers.get('Retry-After')) || 5
+      retryAt = Date.now() + seconds * 1000
+      queue.unshift(...events)
+      schedule(seconds * 1000)
+      return
+    }
+  } catch (err) {
+    // Offline: keep the answers for the next attempt
+    queue.unshift(...events)
+    schedule()
+    return
+  }
+  if (queue.length) schedule(0)
+}
+
+// The page may be closed next; keepalive lets the last batch outlive it
+document.addEventListener('visibilitychange', () => {
+  if (document.visibilityState === 'hidden') flush({ keepalive: true })
+})
+
+export function useProgress() {
+  const recordAnswer = (wordId, correct, mode = 'random') => {
+    if (!authHeaders()) return
+    // A batch sent again after a lost response carries the same ids, so it is stored once
+    queue.push({
+      event_id: crypto.randomUUID(),
+      word_id: wordId,
+      correct,
+      mode,
+      answered_at: new Date().toISOString()
+    })
+    if (queue.length >= GAME_CONFIG.PROGRESS_BATCH_SIZE) {
+      flush()
+    } else {
+      schedule()
+    }
+  }
+
+  return { recordAnswer, flush }
+}
@@ -0,0 +1,140 @@
+import { API_ENDPOINTS, CATALOG_BUNDLES, GAME_CONFIG } from '../utils/constants'
+
+const STORAGE_KEY = 'wordCatalog'
+
+// One copy of the catalog per tab, mirrored to localStorage between visits
+let catalog = null
+// Shuffled row indexes not yet played, so rounds don't repeat words
+let deck = []
+// One catalog change stream per tab, however many games use the catalog
+let events = null
+let announcedVersion = null
+
+const readStoredCatalog = () => {
+  try {
+    return JSON.parse(localStorage.getItem(STORAGE_KEY))
+  } catch {
+    return null
+  }
+}
+
+const storeCatalog = () => {
+  try {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(catalog))
+  } catch {
+    // Quota exceeded or storage disabled: keep the in-memory copy only
+  }
+}
+
+const applyDelta = (rows, delta) => {
+  const byId = new Map(rows.map(row => [row.id, row]))
+  delta.removed.forEach(id => byId.delete(id))
+  delta.data.forEach(row => byId.set(row.id, row))
+  return [...byId.values()]
+}
+
+export function useWordCatalog() {
+  const setCatalog = (fields) => {
+    if (!catalog || fields.rows !== catalog.rows) {
+      deck = []
+    }
+    catalog = { ...fields, syncedAt: Date.now() }
+    storeCatalog()
+    return catalog.rows
+  }
+
+  // Static bundles published by sheets-sync and served by nginx
+  const syncFromBundles = async () => {
+    const response = await fetch(CATALOG_BUNDLES.MANIFEST)
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+    const entry = (await response.json()).tables?.[CATALOG_BUNDLES.TABLE]
+    if (!entry) {
+      throw new Error(`No ${CATALOG_BUNDLES.TABLE} bundle in the catalog manifest`)
+    }
+    if (catalog && catalog.bundle === entry.all.path) {
+      return setCatalog(catalog)
+    }
+    const bundle = await fetch(`${CATALOG_BUNDLES.ROOT}/${entry.all.path}`)
+    if (!bundle.ok) {
+      throw new Error(`HTTP error! status: ${bundle.status}`)
+    }
+    return setCatalog({ bundle: entry.all.path, rows: (await bundle.json()).data })
+  }
+
+  // The API catalog: only what changed since our version, or 304 if nothing did
+  const syncFromApi = async () => {
+    const since = catalog?.version
+    const url = since !== undefined
+      ? `${API_ENDPOINTS.WORD_MATCHING_CATALOG}?since=${since}`
+      : API_ENDPOINTS.WORD_MATCHING_CATALOG
+    const response = await fetch(url)
+    if (response.status === 304) {
+      return setCatalog(catalog)
+    }
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+
+    const responseJson = await response.json()
+    return setCatalog({
+      version: responseJson.version,
+      rows: responseJson.full ? responseJson.data : applyDelta(catalog.rows, responseJson)
+    })
+  }
+
+  const syncCatalog = async ({ force = false } = {}) => {
+    catalog = catalog || readStoredCatalog()
+    if (catalog && !force && Date.now() - catalog.syncedAt < GAME_CONFIG.CATALOG_REFRESH_MS) {
+      return catalog.rows
+    }
+    try {
+      return await syncFromBundles()
+    } catch (err) {
+      console.warn('Catalog bundles unavailable, using the API:', err)
+      return syncFromApi()
+    }
+  }
+
+  // The server announces each new catalog version; re-sync right away instead of waiting out CATALOG_REFRESH_MS
+  const watchCatalog = () => {
+    if (events || typeof EventSource === 'undefined') return
+    events = new EventSource(API_ENDPOINTS.WORD_MATCHING_EVENTS)
+    events.addEventListener('catalog', (event) => {
+      const { version } = JSON.parse(event.data)
+      const known = announcedVersion
+      announcedVersion = version
+      // Bundle catalogs carry no version: check the manifest once per announcement
+      if (catalog && version !== known && catalog.version !== version) {
+        syncCatalog({ force: true }).catch(err => console.warn('Catalog re-sync failed:', err))
+      }
+    })
+  }
+
+  const sampleRound = (count = GAME_CONFIG.WORDS_PER_ROUND) => {
+    const rows = catalog ? catalog.rows : []
+    const round = []
+    while (round.length < Math.min(count, rows.length)) {
+      if (deck.length === 0) {
+        deck = rows.map((_, i) => i)
+        for (let i = deck.length - 1; i > 0; i--) {
+          const j = Math.floor(Math.random() * (i + 1));
+          [deck[i], deck[j]] = [deck[j], deck[i]]
+        }
+      }
+      const row = rows[deck.pop()]
+      if (!round.includes(row)) {
+        round.push(row)
+      }
+    }
+    return round
+  }
+
+  watchCatalog()
+
+  return {
+    syncCatalog,
+    sampleRound
+  }
+}
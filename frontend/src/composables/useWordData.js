@@ -1,21 +1,77 @@
 import { ref, reactive } from 'vue'
+import { API_ENDPOINTS, GAME_CONFIG } from '../utils/constants'
+import { useWordCatalog } from './useWordCatalog'
 
 export function useWordData() {
   const loading = ref(false)
   const error = ref(null)
   const wordMatchingData = ref([])
+  const { syncCatalog, sampleRound } = useWordCatalog()
+
+  // Rounds prefetched from the session endpoint, consumed one per game
+  let pendingRounds = []
+  let nextCursor = null
+
+  const fetchSession = async () => {
+    const params = new URLSearchParams({ rounds: GAME_CONFIG.SESSION_ROUNDS })
+    if (nextCursor) {
+      params.set('cursor', nextCursor)
+    }
+    const response = await fetch(`${API_ENDPOINTS.WORD_MATCHING_SESSION}?${params}`)
+    if (response.status === 409 && nextCursor) {
+      // The word list changed since the session started, begin a new one
+      nextCursor = null
+      return fetchSession()
+    }
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+    const responseJson = await response.json()
+    pendingRounds = responseJson.rounds
+    nextCursor = responseJson.next_cursor
+  }
+
+  // Signed-in learners get their due words first (spaced repetition)
+  const fetchReviewRound = async () => {
+    const token = localStorage.getItem('token')
+    if (!token) return []
+    const params = new URLSearchParams({ count: GAME_CONFIG.WORDS_PER_ROUND })
+    const response = await fetch(`${API_ENDPOINTS.WORD_MATCHING_REVIEW}?${params}`, {
+      headers: { Authorization: `Bearer ${token}` }
+    })
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+    return (await response.json()).data
+  }
 
   const fetchWordData = async () => {
     loading.value = true
     error.value = null
     
     try {
-      const response = await fetch('/api/word-matching/')
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`)
+      // Sample from the locally synced catalog; fall back to server-side sessions
+      let round = []
+      try {
+        round = await fetchReviewRound()
+      } catch (err) {
+        console.warn('Review round unavailable, using random words:', err)
+      }
+      if (round.length === 0) {
+        try {
+          await syncCatalog()
+          round = sampleRound()
+        } catch (err) {
+          console.warn('Word catalog unavailable, using sessions:', err)
+        }
+      }
+      if (round.length === 0) {
+        if (pendingRounds.length === 0) {
+          await fetchSession()
+        }
+        round = pendingRounds.shift() || []
       }
-      const responseJson = await response.json()
-      wordMatchingData.value = responseJson.data
+      wordMatchingData.value = round
     } catch (err) {
       console.error('Error fetching word matching data:', err)
       error.value = err.message || 'Failed to load word data. Please try again.'
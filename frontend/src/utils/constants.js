@@ -1,16 +1,33 @@
 // API Configuration
 export const API_ENDPOINTS = {
   WORD_MATCHING: '/api/word-matching/',
+  WORD_MATCHING_SESSION: '/api/word-matching/session',
+  WORD_MATCHING_CATALOG: '/api/word-matching/catalog',
+  WORD_MATCHING_EVENTS: '/api/word-matching/events',
+  WORD_MATCHING_REVIEW: '/api/word-matching/review',
+  PROGRESS: '/api/progress',
   AUTH: '/api/auth',
   USERS: '/api/users'
 }
 
+// Static word catalog bundles served by nginx
+export const CATALOG_BUNDLES = {
+  ROOT: '/catalog',
+  MANIFEST: '/catalog/manifest.json',
+  TABLE: 'word_matching'
+}
+
 // Game Configuration
 export const GAME_CONFIG = {
   FLIP_ANIMATION_DURATION: 600, // milliseconds
   MATCH_ANIMATION_DURATION: 1500, // milliseconds
   CARD_FLIP_DELAY: 50, // milliseconds between characters
-  MAX_RETRIES: 3
+  MAX_RETRIES: 3,
+  SESSION_ROUNDS: 20, // rounds fetched per session request
+  WORDS_PER_ROUND: 5,
+  CATALOG_REFRESH_MS: 5 * 60 * 1000, // how long the local word catalog is used before re-syncing
+  PROGRESS_BATCH_SIZE: 20, // answers sent per /api/progress request
+  PROGRESS_FLUSH_MS: 10 * 1000 // longest an answer waits before being sent
 }
 
 // UI Constants
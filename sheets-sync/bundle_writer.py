@@ -0,0 +1,146 @@
+"""Static, content-addressed catalog bundles for nginx to serve.
+
+After a table syncs, its rows are written as JSON bundles: one with every row,
+one per category and one per difficulty level. Each bundle's file name carries
+a hash of its content (``word_matching/category-fruits.3f2a9c1e7b5d4a60.json``)
+and sits next to precompressed ``.gz`` and ``.br`` copies, so nginx can serve
+it with ``immutable`` caching and no work per request. ``manifest.json`` maps
+every table to its current bundles; it is the only file that changes in place
+and is replaced atomically after the bundles it points at are on disk.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import brotli
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+# Columns that only matter to the sync itself
+PRIVATE_COLUMNS = {'created_at', 'updated_at'}
+
+
+def slugify(value: Any) -> str:
+    slug = re.sub(r'[^a-z0-9]+', '-', str(value).strip().lower()).strip('-')
+    return slug or 'blank'
+
+
+def encode_bundle(table_name: str, rows: List[Dict[str, Any]]) -> bytes:
+    payload = {'table': table_name, 'data': rows}
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+class BundleWriter:
+    def __init__(self, output_dir: str, hash_column: Optional[str] = None, retention_seconds: float = 86400.0):
+        self.output_dir = output_dir
+        self.hash_column = hash_column
+        self.retention_seconds = retention_seconds
+
+    def has_bundles(self, table_name: str) -> bool:
+        return table_name in self._read_manifest().get('tables', {})
+
+    def write(self, table_name: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write every bundle for a table, then point the manifest at them"""
+        private = PRIVATE_COLUMNS | ({self.hash_column} if self.hash_column else set())
+        rows = [{k: v for k, v in row.items() if k not in private} for row in rows]
+        rows.sort(key=lambda row: (row.get('id') is None, row.get('id') or 0))
+
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        by_difficulty: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            # Grouped the way the API filters: category case-insensitively
+            if row.get('category'):
+                by_category.setdefault(str(row['category']).strip().lower(), []).append(row)
+            if row.get('difficulty_level') is not None:
+                by_difficulty.setdefault(str(row['difficulty_level']), []).append(row)
+
+        entry = {
+            'rows': len(rows),
+            'all': self._write_bundle(table_name, 'all', rows),
+            'category': {
+                name: self._write_bundle(table_name, f'category-{slugify(name)}', group)
+                for name, group in sorted(by_category.items())
+            },
+            'difficulty': {
+                level: self._write_bundle(table_name, f'difficulty-{slugify(level)}', group)
+                for level, group in sorted(by_difficulty.items())
+            },
+        }
+        # The catalog version is the hash of the full bundle
+        entry['version'] = entry['all']['hash']
+
+        manifest = self._read_manifest()
+        manifest.setdefault('tables', {})[table_name] = entry
+        manifest['generated_at'] = datetime.now(timezone.utc).isoformat()
+        self._write_atomic(os.path.join(self.output_dir, MANIFEST_NAME),
+                           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+        self._remove_stale(table_name, entry)
+        logger.info(f"Wrote {len(entry['category']) + len(entry['difficulty']) + 1} bundles "
+                    f"for {table_name} (version {entry['version']})")
+        return entry
+
+    def _write_bundle(self, table_name: str, name: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        body = encode_bundle(table_name, rows)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        path = f'{table_name}/{name}.{digest}.json'
+        target = os.path.join(self.output_dir, path)
+
+        # Same content, same name: nothing to rewrite
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Compressed copies first so nginx never finds the plain file without them
+            self._write_atomic(target + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+            self._write_atomic(target + '.br', brotli.compress(body, quality=11))
+            self._write_atomic(target, body)
+        else:
+            # Refresh the mtime so retention counts from the latest use
+            os.utime(target)
+        return {'path': path, 'hash': digest, 'rows': len(rows), 'bytes': len(body)}
+
+    def _remove_stale(self, table_name: str, entry: Dict[str, Any]) -> None:
+        """Delete bundles no longer in the manifest once clients had time to move on"""
+        current = {entry['all']['path']}
+        current.update(bundle['path'] for bundle in entry['category'].values())
+        current.update(bundle['path'] for bundle in entry['difficulty'].values())
+        directory = os.path.join(self.output_dir, table_name)
+        cutoff = time.time() - self.retention_seconds
+
+        for file_name in os.listdir(directory):
+            base = re.sub(r'\.(gz|br)$', '', file_name)
+            path = os.path.join(directory, file_name)
+            if f'{table_name}/{base}' in current or os.path.getmtime(path) > cutoff:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old bundle {path}: {str(e)}")
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, path: str, content: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            # nginx runs as another user and needs to read it
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
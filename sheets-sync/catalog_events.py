@@ -0,0 +1,46 @@
+"""Catalog version notices for the backend.
+
+After a sync changes a table, ``publish_version`` replaces
+``<directory>/<table>.json`` with the table's next version number. The
+directory is a volume shared with the backend, which watches these files,
+reloads the table and tells connected clients (see
+``backend/app/services/catalog_events.py``). No broker is involved, and since
+the file is renamed into place, the backend never reads a partial write.
+"""
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def publish_version(directory: str, table_name: str, **details: Any) -> int:
+    """Write the next version notice for a table and return its version"""
+    path = os.path.join(directory, f'{table_name}.json')
+    try:
+        with open(path) as f:
+            version = int(json.load(f)['version']) + 1
+    except (OSError, ValueError, KeyError, TypeError):
+        version = 1
+
+    notice = {
+        'table': table_name,
+        'version': version,
+        'synced_at': datetime.now(timezone.utc).isoformat(),
+        **details,
+    }
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(notice, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    logger.info(f'Published {table_name} version notice {version}')
+    return version
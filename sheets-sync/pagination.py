@@ -0,0 +1,99 @@
+"""Keyset-paginated reads of whole Supabase tables.
+
+A plain ``select('*').execute()`` is silently capped at PostgREST's
+``max-rows`` (1000 on Supabase by default) and arrives as one response. These
+helpers read ``order=<key>.asc`` pages of ``page_size`` rows instead, each
+starting after the last key of the previous page, so every row is read
+exactly once however large the table is. Only an empty page ends the read,
+since a short page may just be capped by a ``max-rows`` below ``page_size``.
+Mirrors ``backend/app/core/pagination.py`` for the synchronous supabase-py
+client.
+"""
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_PREFETCH = 2
+
+# Marks the end of the pages in the prefetch queue
+_DONE = object()
+
+
+def _fetch(client, table_name, columns, key, page_size, last):
+    query = client.table(table_name).select(columns).order(key)
+    if last is not None:
+        query = query.gt(key, last)
+    return query.limit(page_size).execute().data
+
+
+def iter_pages(client, table_name, columns='*', key='id', page_size=DEFAULT_PAGE_SIZE,
+               prefetch=DEFAULT_PREFETCH):
+    """Yield a table's rows page by page in key order.
+
+    With a column projection the key column is always included. A background
+    thread fetches up to ``prefetch`` pages ahead while the caller works on
+    the current one.
+    """
+    if columns != '*' and key not in columns.split(','):
+        columns = f'{key},{columns}'
+
+    if prefetch < 1:
+        last = None
+        while True:
+            page = _fetch(client, table_name, columns, key, page_size, last)
+            if not page:
+                return
+            yield page
+            last = page[-1][key]
+
+    pages = queue.Queue(maxsize=prefetch)
+    stopped = threading.Event()
+
+    def put(item):
+        # Give up once the consumer is gone rather than block forever
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        last = None
+        try:
+            while not stopped.is_set():
+                page = _fetch(client, table_name, columns, key, page_size, last)
+                if not page:
+                    break
+                if not put(page):
+                    return
+                last = page[-1][key]
+        except Exception as e:
+            put(e)
+            return
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, name=f'read-{table_name}', daemon=True)
+    producer.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is _DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stopped.set()
+
+
+def select_all(client, table_name, **kwargs):
+    """Every row of a table in key order; see iter_pages for the arguments"""
+    rows = []
+    for page in iter_pages(client, table_name, **kwargs):
+        rows.extend(page)
+    return rows
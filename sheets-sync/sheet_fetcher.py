@@ -0,0 +1,139 @@
+"""Concurrent, conditional downloads of the published Google Sheets.
+
+All sheets are fetched in parallel over one pooled ``requests.Session``. Each
+request carries the ETag / Last-Modified validators from the previous run, and
+when the server ignores them the body hash is compared instead, so an
+unchanged sheet is skipped before it is parsed. Bodies are streamed into a
+spooled temporary file (memory for small sheets, disk beyond
+``spool_bytes``) and handed to the parser as a text stream, so no sheet is
+ever held in memory whole. Validators live in a small JSON state file and
+are only advanced for sheets that synced successfully.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+
+@dataclass
+class SheetResult:
+    url: str
+    status: str
+    body: Optional[IO[bytes]] = None
+    encoding: Optional[str] = None
+    validators: Dict[str, str] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def open_text(self):
+        """The downloaded body as a text stream suitable for the csv module"""
+        self.body.seek(0)
+        return io.TextIOWrapper(self.body, encoding=self.encoding or 'utf-8-sig', newline='')
+
+    def close(self):
+        if self.body is not None:
+            self.body.close()
+            self.body = None
+
+
+class SheetFetcher:
+    CHUNK_BYTES = 64 * 1024
+
+    def __init__(self, state_path, max_workers=4, connect_timeout=5.0, read_timeout=60.0,
+                 spool_bytes=1024 * 1024):
+        self.state_path = state_path
+        self.spool_bytes = spool_bytes
+        self.max_workers = max_workers
+        self.timeout = (connect_timeout, read_timeout)
+        self.state = self._load_state()
+
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch_all(self, urls: Iterable[str], force=False) -> Dict[str, SheetResult]:
+        """Fetch every sheet concurrently, keyed by URL"""
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls) or 1)) as pool:
+            results = pool.map(lambda url: self.fetch(url, force), urls)
+            return {result.url: result for result in results}
+
+    def fetch(self, url, force=False) -> SheetResult:
+        """Fetch one sheet, returning UNCHANGED when its validators still match"""
+        previous = {} if force else self.state.get(url, {})
+        headers = {}
+        if previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous.get('last_modified'):
+            headers['If-Modified-Since'] = previous['last_modified']
+
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        digest = hashlib.sha256()
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304:
+                    body.close()
+                    return SheetResult(url, UNCHANGED, validators=previous)
+                response.raise_for_status()
+                for chunk in response.iter_content(self.CHUNK_BYTES):
+                    digest.update(chunk)
+                    body.write(chunk)
+        except Exception as e:
+            body.close()
+            logger.error(f"Error fetching data from {url}: {str(e)}")
+            return SheetResult(url, FAILED, error=str(e))
+
+        validators = {'sha256': digest.hexdigest()}
+        if response.headers.get('ETag'):
+            validators['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            validators['last_modified'] = response.headers['Last-Modified']
+
+        if validators['sha256'] == previous.get('sha256'):
+            body.close()
+            return SheetResult(url, UNCHANGED, validators=validators)
+
+        # Published CSVs are UTF-8; requests would assume Latin-1 without a charset
+        encoding = response.encoding if 'charset=' in response.headers.get('Content-Type', '') else None
+        return SheetResult(url, CHANGED, body, encoding, validators)
+
+    def mark_synced(self, result: SheetResult) -> None:
+        """Remember a sheet's validators once its data is safely in Supabase"""
+        if result.validators:
+            self.state[result.url] = result.validators
+
+    def save_state(self) -> None:
+        """Persist validators atomically so a crash never leaves a torn file"""
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable sync state {self.state_path}: {str(e)}")
+            return {}
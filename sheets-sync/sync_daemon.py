@@ -0,0 +1,149 @@
+"""Long-running scheduler for the sheets sync.
+
+Keeps one process (and its authenticated Supabase client) alive between runs
+instead of re-executing the script from cron. Runs are spaced by a jittered
+interval, retried with exponential backoff after a failure, and guarded by an
+exclusive file lock so two runs never overlap, even across processes. A run
+can be requested immediately with ``SIGUSR1`` or ``POST /sync`` on the local
+trigger port.
+"""
+import fcntl
+import json
+import logging
+import random
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+
+class SyncDaemon:
+    def __init__(self, run_sync, interval=7200.0, jitter=0.1, retry_delay=60.0,
+                 max_backoff=3600.0, lock_path='/tmp/sheets-sync.lock',
+                 trigger_host='127.0.0.1', trigger_port=8787):
+        self.run_sync = run_sync
+        self.interval = interval
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.lock_path = lock_path
+        self.trigger_host = trigger_host
+        self.trigger_port = trigger_port
+
+        self.failures = 0
+        self.last_run_at = None
+        self.last_success_at = None
+        self.next_run_at = None
+        self.running = False
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def trigger(self):
+        """Run a sync as soon as the current one (if any) finishes"""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def next_delay(self):
+        """Seconds until the next run: jittered interval, or backoff after failures"""
+        if self.failures:
+            delay = min(self.max_backoff, self.retry_delay * 2 ** (self.failures - 1))
+        else:
+            delay = self.interval
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run_forever(self):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.trigger())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        server = self._start_trigger_server()
+
+        logger.info(f"Sync daemon started, syncing every ~{self.interval:.0f}s")
+        try:
+            while not self._stopping.is_set():
+                self.run_once()
+                delay = self.next_delay()
+                self.next_run_at = time.time() + delay
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+        finally:
+            if server is not None:
+                server.shutdown()
+            logger.info("Sync daemon stopped")
+
+    def run_once(self):
+        """Run one sync unless another one holds the lock; returns True on success"""
+        with open(self.lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.warning("Another sync is already running, skipping this run")
+                return False
+
+            self.running = True
+            self.last_run_at = time.time()
+            try:
+                self.run_sync()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Sync failed ({self.failures} in a row): {str(e)}")
+                return False
+            else:
+                self.failures = 0
+                self.last_success_at = time.time()
+                return True
+            finally:
+                self.running = False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def status(self):
+        return {
+            'running': self.running,
+            'failures': self.failures,
+            'last_run_at': self.last_run_at,
+            'last_success_at': self.last_success_at,
+            'next_run_at': self.next_run_at,
+        }
+
+    def _start_trigger_server(self):
+        if not self.trigger_port:
+            return None
+        daemon = self
+
+        class TriggerHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != '/sync':
+                    self.send_error(404)
+                    return
+                daemon.trigger()
+                self._reply(202, {'status': 'scheduled'})
+
+            def do_GET(self):
+                if self.path != '/status':
+                    self.send_error(404)
+                    return
+                self._reply(200, daemon.status())
+
+            def _reply(self, code, body):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        try:
+            server = ThreadingHTTPServer((self.trigger_host, self.trigger_port), TriggerHandler)
+        except OSError as e:
+            logger.warning(f"Sync trigger endpoint disabled: {str(e)}")
+            return None
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Sync trigger listening on http://{self.trigger_host}:{self.trigger_port}/sync")
+        return server
@@ -0,0 +1,193 @@
+"""Incremental, streaming sheet -> Supabase sync.
+
+Each row written by the sync carries a content hash in ``hash_column``. A run
+only reads ``(key, hash)`` pairs back from Supabase, then streams the sheet's
+CSV row by row: rows are validated, hashed and compared with the stored hash,
+and changed rows are upserted in fixed-size batches as soon as a batch fills.
+Keys that no longer appear in the sheet are deleted at the end, unless the
+sheet has no header or no rows at all. Memory stays proportional to the
+number of keys, not to the size of the sheet.
+
+The target table needs a unique constraint on the key column (for upsert
+``on_conflict``) and a text column for the hash, e.g.::
+
+    alter table word_matching add column if not exists row_hash text;
+    alter table word_matching add constraint word_matching_malayalam_word_key unique (malayalam_word);
+"""
+import csv
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HASH_COLUMN = 'row_hash'
+DEFAULT_CHUNK_SIZE = 500
+
+# Columns owned by the database, never hashed or written by the sync
+SERVER_COLUMNS = {'id', 'created_at', 'updated_at'}
+
+# Column -> (type, required) per table. word_matching mirrors
+# backend/app/models/word_matching.py:WordMatchingEntry
+TABLE_SCHEMAS = {
+    'word_matching': {
+        'english_word': (str, True),
+        'malayalam_word': (str, True),
+        'difficulty_level': (int, False),
+        'category': (str, False),
+    },
+}
+
+MAX_LOGGED_INVALID_ROWS = 10
+
+
+@dataclass
+class SyncStats:
+    """Outcome of syncing one table"""
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    invalid: int = 0
+
+    @property
+    def changed(self):
+        return self.inserted + self.updated + self.deleted
+
+
+class RowValidationError(ValueError):
+    pass
+
+
+def content_columns(columns: Iterable[str], hash_column: str) -> List[str]:
+    """Sheet columns that make up a row's content, in a stable order"""
+    return sorted(c for c in columns if c and c not in SERVER_COLUMNS and c != hash_column)
+
+
+def row_hash(values: Iterable[Any]) -> str:
+    """Hash of a row's content values, given in content_columns order"""
+    joined = '\x1f'.join('' if v is None else str(v) for v in values)
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()[:16]
+
+
+def chunked(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class TableSync:
+    """Streams one sheet into one table.
+
+    ``existing`` maps every key currently in the table to its stored hash.
+    """
+
+    def __init__(self, client, table_name: str, key_column: str, existing: Dict[str, Optional[str]],
+                 hash_column: str = DEFAULT_HASH_COLUMN, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.client = client
+        self.table_name = table_name
+        self.key_column = key_column
+        self.existing = existing
+        self.hash_column = hash_column
+        self.chunk_size = chunk_size
+        self.schema = TABLE_SCHEMAS.get(table_name, {})
+        self.stats = SyncStats()
+        self._seen = set()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, stream: TextIO) -> SyncStats:
+        """Sync every row of a CSV text stream, then delete keys missing from it"""
+        reader = csv.reader(stream)
+        header = [column.strip() for column in next(reader, [])]
+        columns = content_columns(header, self.hash_column)
+        self._check_header(columns)
+        positions = [header.index(column) for column in columns]
+
+        for line_number, values in enumerate(reader, start=2):
+            if not any(values):
+                continue
+            raw = {column: (values[i].strip() if i < len(values) else '') for column, i in zip(columns, positions)}
+            self._add(raw, columns, line_number)
+
+        if not self._seen and self.existing:
+            # A sheet that lost its rows (or an export cut short) must not empty the table
+            raise ValueError(
+                f"Sheet for {self.table_name} has no rows, refusing to delete its {len(self.existing)} rows"
+            )
+        self._flush()
+        self._delete_missing()
+        return self.stats
+
+    def _check_header(self, columns: List[str]) -> None:
+        required = [c for c, (_, is_required) in self.schema.items() if is_required]
+        missing = [c for c in {self.key_column, *required} if c not in columns]
+        if missing:
+            # Refuse to sync rather than treating every row as deleted
+            raise ValueError(f"Sheet for {self.table_name} is missing columns: {', '.join(sorted(missing))}")
+
+    def _add(self, raw: Dict[str, str], columns: List[str], line_number: int) -> None:
+        key = raw[self.key_column]
+        if key:
+            # Even an invalid row keeps its key from being deleted
+            self._seen.add(key)
+        try:
+            record = self._validate(raw)
+        except RowValidationError as e:
+            self.stats.invalid += 1
+            if self.stats.invalid <= MAX_LOGGED_INVALID_ROWS:
+                logger.warning(f"Skipping {self.table_name} row {line_number}: {str(e)}")
+            return
+
+        record[self.hash_column] = row_hash(record[c] for c in columns)
+        if key in self._pending:
+            # Duplicate key in the sheet: the last occurrence wins
+            self._pending[key] = record
+            return
+
+        stored = self.existing.get(key, False)
+        if stored is False:
+            self.stats.inserted += 1
+        elif stored != record[self.hash_column]:
+            self.stats.updated += 1
+        else:
+            self.stats.unchanged += 1
+            return
+
+        self._pending[key] = record
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+
+    def _validate(self, raw: Dict[str, str]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        for column, value in raw.items():
+            expected, required = self.schema.get(column, (str, column == self.key_column))
+            if value == '':
+                if required:
+                    raise RowValidationError(f"{column} is required")
+                record[column] = None
+            elif expected is int:
+                try:
+                    record[column] = int(value)
+                except ValueError:
+                    raise RowValidationError(f"{column} must be an integer, got {value!r}")
+            else:
+                record[column] = value
+        return record
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self.client.table(self.table_name).upsert(
+            batch, on_conflict=self.key_column, returning='minimal'
+        ).execute()
+        for record in batch:
+            # Later duplicates in the sheet compare against what was just written
+            self.existing[record[self.key_column]] = record[self.hash_column]
+        self._pending.clear()
+
+    def _delete_missing(self) -> None:
+        removed = [key for key in self.existing if key not in self._seen]
+        for chunk in chunked(removed, self.chunk_size):
+            self.client.table(self.table_name).delete(returning='minimal').in_(self.key_column, chunk).execute()
+        self.stats.deleted = len(removed)
@@ -1,11 +1,16 @@
+import argparse
 import os
-import pandas as pd
-import requests
+import sys
 from supabase import create_client
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
-from io import StringIO
+from bundle_writer import BundleWriter
+from catalog_events import publish_version
+from pagination import DEFAULT_PAGE_SIZE, DEFAULT_PREFETCH, iter_pages, select_all
+from sync_daemon import SyncDaemon
+from sheet_fetcher import CHANGED, UNCHANGED, SheetFetcher
+from sync_engine import DEFAULT_CHUNK_SIZE, DEFAULT_HASH_COLUMN, TableSync
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,99 +32,224 @@ SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 SUPABASE_EMAIL = os.getenv('SUPABASE_EMAIL')
 SUPABASE_PASSWORD = os.getenv('SUPABASE_PASSWORD')
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    logger.error("Missing required environment variables: SUPABASE_URL and/or SUPABASE_KEY")
-    raise ValueError("Missing required environment variables")
+# Client authenticated as SUPABASE_EMAIL, created on first use and kept
+# alive between runs in daemon mode
+supabase = None
 
-if not SUPABASE_EMAIL or not SUPABASE_PASSWORD:
-    logger.error("Missing required environment variables: SUPABASE_EMAIL and/or SUPABASE_PASSWORD")
-    raise ValueError("Missing required environment variables")
+def validate_config():
+    """Fail fast when required configuration is missing"""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        logger.error("Missing required environment variables: SUPABASE_URL and/or SUPABASE_KEY")
+        raise ValueError("Missing required environment variables")
+    
+    if not SUPABASE_EMAIL or not SUPABASE_PASSWORD:
+        logger.error("Missing required environment variables: SUPABASE_EMAIL and/or SUPABASE_PASSWORD")
+        raise ValueError("Missing required environment variables")
+    
+    if not SHEET_URLS or SHEET_URLS[0] == '':
+        logger.error("No Google Sheets URLs provided in SHEET_URLS environment variable")
+        raise ValueError("No Google Sheets URLs provided")
 
-# Initialize Supabase client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def sign_in(client):
+    """Authenticate the client with email and password"""
+    try:
+        client.auth.sign_in_with_password({
+            "email": SUPABASE_EMAIL, 
+            "password": SUPABASE_PASSWORD
+        })
+        
+        # The session is automatically applied to the client after sign in
+        # No need to create a new client
+        logger.info(f"Successfully authenticated as: {SUPABASE_EMAIL}")
+        
+    except Exception as e:
+        logger.error(f"Authentication failed: {str(e)}")
+        raise
 
-# Authenticate user with email and password
-try:
-    auth_response = supabase.auth.sign_in_with_password({
-        "email": SUPABASE_EMAIL, 
-        "password": SUPABASE_PASSWORD
-    })
+def get_client():
+    """Return the authenticated client, refreshing or renewing its session as needed"""
+    global supabase
+    if supabase is None:
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        sign_in(supabase)
+        return supabase
     
-    # The session is automatically applied to the client after sign in
-    # No need to create a new client
-    logger.info(f"Successfully authenticated as: {SUPABASE_EMAIL}")
-    
-except Exception as e:
-    logger.error(f"Authentication failed: {str(e)}")
-    raise
+    try:
+        # Refreshes the access token when it is about to expire
+        session = supabase.auth.get_session()
+    except Exception as e:
+        logger.warning(f"Session refresh failed: {str(e)}")
+        session = None
+    if session is None:
+        sign_in(supabase)
+    return supabase
 
 # https://docs.google.com/spreadsheets/d/e/2PACX-1vSU7Rxv1j8uWNzH1bQUs9IaYKDFxxOqU43VkAQoVSzmhzupHPRxGA3T69y7YcImPFmcO5VhfhrcWJa4/pub?gid=0&single=true&output=csv
 # Google Sheets URLs (add your URLs here)
 # Each sheet should match its table in supabase
 SHEET_URLS = os.getenv('SHEET_URLS', '').split(',')
 TABLE_NAME = os.getenv('TABLE_NAME', '').split(',')
-if not SHEET_URLS or SHEET_URLS[0] == '':
-    logger.error("No Google Sheets URLs provided in SHEET_URLS environment variable")
-    raise ValueError("No Google Sheets URLs provided")
 
-def get_sheet_data(url):
-    """Fetch data from Google Sheets URL and return as DataFrame"""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return pd.read_csv(StringIO(response.text))
-    except Exception as e:
-        logger.error(f"Error fetching data from {url}: {str(e)}")
-        return None
+# Unique key column for each table, in TABLE_NAME order (the last one is reused)
+KEY_COLUMNS = os.getenv('KEY_COLUMNS', 'malayalam_word').split(',')
+HASH_COLUMN = os.getenv('HASH_COLUMN', DEFAULT_HASH_COLUMN)
+SYNC_CHUNK_SIZE = int(os.getenv('SYNC_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+
+# Supabase reads are keyset-paginated by READ_KEY_COLUMN; a READ_PAGE_SIZE
+# above PostgREST's max-rows still reads everything, in smaller pages
+READ_KEY_COLUMN = os.getenv('READ_KEY_COLUMN', 'id')
+READ_PAGE_SIZE = int(os.getenv('READ_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+READ_PREFETCH = int(os.getenv('READ_PREFETCH', DEFAULT_PREFETCH))
+
+# Per-sheet ETag / Last-Modified / body hash from the previous run
+SYNC_STATE_FILE = os.getenv('SYNC_STATE_FILE', '/app/state/sync_state.json')
+FETCH_WORKERS = int(os.getenv('FETCH_WORKERS', '4'))
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', '60'))
+FORCE_SYNC = os.getenv('FORCE_SYNC', '').lower() in ('1', 'true', 'yes')
+
+fetcher = SheetFetcher(SYNC_STATE_FILE, max_workers=FETCH_WORKERS, read_timeout=FETCH_TIMEOUT)
+
+# Static catalog bundles served by nginx; an empty BUNDLE_DIR turns them off
+BUNDLE_DIR = os.getenv('BUNDLE_DIR', '/app/bundles')
+BUNDLE_RETENTION = float(os.getenv('BUNDLE_RETENTION', '86400'))
+
+bundle_writer = BundleWriter(BUNDLE_DIR, HASH_COLUMN, BUNDLE_RETENTION) if BUNDLE_DIR else None
+
+# Version notices the backend watches (volume shared with it); empty turns them off
+CATALOG_EVENTS_DIR = os.getenv('CATALOG_EVENTS_DIR', '/app/events')
+
+# Daemon mode scheduling
+SYNC_INTERVAL = float(os.getenv('SYNC_INTERVAL', '7200'))
+SYNC_JITTER = float(os.getenv('SYNC_JITTER', '0.1'))
+SYNC_RETRY_DELAY = float(os.getenv('SYNC_RETRY_DELAY', '60'))
+SYNC_MAX_BACKOFF = float(os.getenv('SYNC_MAX_BACKOFF', '3600'))
+SYNC_LOCK_FILE = os.getenv('SYNC_LOCK_FILE', '/tmp/sheets-sync.lock')
+SYNC_TRIGGER_HOST = os.getenv('SYNC_TRIGGER_HOST', '127.0.0.1')
+SYNC_TRIGGER_PORT = int(os.getenv('SYNC_TRIGGER_PORT', '8787'))
 
-def get_existing_data(table_name):
-    """Fetch existing data from Supabase table"""
+def get_key_column(index):
+    """Key column configured for the table at the given position"""
+    return KEY_COLUMNS[min(index, len(KEY_COLUMNS) - 1)].strip()
+
+def get_existing_data(client, table_name, key_column):
+    """Fetch the key and content hash of every row in a Supabase table"""
+    existing = {}
+    pages = iter_pages(client, table_name, f"{key_column},{HASH_COLUMN}",
+                       key=READ_KEY_COLUMN, page_size=READ_PAGE_SIZE, prefetch=READ_PREFETCH)
+    for page in pages:
+        existing.update((row[key_column], row.get(HASH_COLUMN)) for row in page)
+    return existing
+
+def get_all_rows(client, table_name):
+    """Fetch every row of a Supabase table"""
+    return select_all(client, table_name, key=READ_KEY_COLUMN, page_size=READ_PAGE_SIZE,
+                      prefetch=READ_PREFETCH)
+
+def write_bundles(client, table_name):
+    """Publish the table's current rows as static bundles"""
+    bundle_writer.write(table_name, get_all_rows(client, table_name))
+
+def notify_backend(table_name, stats):
+    """Tell the backend a table changed; a failure here does not fail the sync"""
+    if not CATALOG_EVENTS_DIR:
+        return
     try:
-        response = supabase.table(table_name).select("*").execute()
-        return pd.DataFrame(response.data)
+        publish_version(CATALOG_EVENTS_DIR, table_name, inserted=stats.inserted,
+                        updated=stats.updated, deleted=stats.deleted)
     except Exception as e:
-        logger.error(f"Error fetching data from Supabase: {str(e)}")
-        return pd.DataFrame()
+        logger.error(f"Could not publish a version notice for {table_name}: {str(e)}")
 
 def sync_data():
     """Main function to sync data from Google Sheets to Supabase"""
     logger.info("Starting data sync process")
+    client = get_client()
+    failed_tables = []
     
+    # Download every sheet up front, skipping ones that have not changed
+    results = fetcher.fetch_all(SHEET_URLS, force=FORCE_SYNC)
+    
+    try:
+        sync_tables(client, results, failed_tables)
+    finally:
+        # Tables set to the same sheet share its download, so release each once at the end
+        for result in results.values():
+            result.close()
+    
+    fetcher.save_state()
+    if failed_tables:
+        raise RuntimeError(f"Sync failed for: {', '.join(failed_tables)}")
+
+def sync_tables(client, results, failed_tables):
+    """Sync every table from its downloaded sheet, collecting the ones that fail"""
     for index, url in enumerate(SHEET_URLS):
         try:
             table_name = TABLE_NAME[index]
-            
-            # Get new data from Google Sheets
-            new_data = get_sheet_data(url)
-            if new_data is None:
+            result = results[url]
+            if result.status == UNCHANGED:
+                logger.info(f"Sheet for {table_name} unchanged since last sync, skipping")
+                if bundle_writer and not bundle_writer.has_bundles(table_name):
+                    write_bundles(client, table_name)
+                fetcher.mark_synced(result)
                 continue
-                
-            # Get existing data from Supabase
-            existing_data = get_existing_data(table_name)
-            
-            # If no existing data, insert all new data
-            if existing_data.empty:
-                records = new_data.to_dict('records')
-                supabase.table(table_name).insert(records).execute()
-                logger.info(f"Inserted {len(records)} new records into {table_name}")
+            if result.status != CHANGED:
+                failed_tables.append(table_name)
                 continue
             
-            # Find new records by comparing with existing data
-            # Assuming there's a unique identifier column, modify this as needed
-            id_column = 'malayalam_word'
-            existing_ids = set(existing_data[id_column])
-            new_records = new_data[~new_data[id_column].isin(existing_ids)]
+            # Only keys and hashes are read back from Supabase
+            key_column = get_key_column(index)
+            existing_data = get_existing_data(client, table_name, key_column)
+            
+            # Stream the sheet straight into batched upserts
+            table_sync = TableSync(client, table_name, key_column, existing_data, HASH_COLUMN, SYNC_CHUNK_SIZE)
+            text = result.open_text()
+            try:
+                stats = table_sync.run(text)
+            finally:
+                # Closing the wrapper would close the download another table may still read
+                text.detach()
             
-            if not new_records.empty:
-                records = new_records.to_dict('records')
-                supabase.table(table_name).insert(records).execute()
-                logger.info(f"Inserted {len(records)} new records into {table_name}")
+            if stats.changed:
+                logger.info(
+                    f"Synced {table_name}: {stats.inserted} inserted, {stats.updated} updated, "
+                    f"{stats.deleted} deleted, {stats.unchanged} unchanged, {stats.invalid} invalid"
+                )
             else:
-                logger.info(f"No new records found for {table_name}")
+                logger.info(f"No changes found for {table_name} ({stats.unchanged} rows unchanged)")
+            
+            # Bundles carry database ids, so they are built from the table, not the sheet
+            if bundle_writer and (stats.changed or not bundle_writer.has_bundles(table_name)):
+                write_bundles(client, table_name)
+            # After the bundles, so clients told about the change can load it
+            if stats.changed:
+                notify_backend(table_name, stats)
+            fetcher.mark_synced(result)
                 
         except Exception as e:
             logger.error(f"Error processing sheet {url}: {str(e)}")
-            continue
+            failed_tables.append(TABLE_NAME[index] if index < len(TABLE_NAME) else url)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Google Sheets data into Supabase")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running and sync on a schedule instead of once")
+    args = parser.parse_args()
+    
+    validate_config()
+    daemon = SyncDaemon(
+        sync_data,
+        interval=SYNC_INTERVAL,
+        jitter=SYNC_JITTER,
+        retry_delay=SYNC_RETRY_DELAY,
+        max_backoff=SYNC_MAX_BACKOFF,
+        lock_path=SYNC_LOCK_FILE,
+        trigger_host=SYNC_TRIGGER_HOST,
+        trigger_port=SYNC_TRIGGER_PORT,
+    )
+    if args.daemon:
+        daemon.run_forever()
+    elif not daemon.run_once():
+        # One-off runs share the daemon's lock so they never overlap it
+        sys.exit(1)
 
 if __name__ == "__main__":
-    sync_data() 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,500 @@
+import io
+import pytest
+from sync_engine import TableSync, content_columns, row_hash
+
+
+class FakeQuery:
+    """Records one supabase-py query chain on the fake client"""
+
+    def __init__(self, client, table_name):
+        self.client = client
+        self.call = {'table': table_name}
+
+    def upsert(self, rows, on_conflict=None, returning=None):
+        self.call.update(op='upsert', rows=list(rows), on_conflict=on_conflict)
+        return self
+
+    def delete(self, returning=None):
+        self.call.update(op='delete')
+        return self
+
+    def in_(self, column, values):
+        self.call.update(column=column, values=list(values))
+        return self
+
+    def select(self, columns):
+        self.call.update(op='select', columns=columns)
+        return self
+
+    def order(self, column):
+        self.call.update(order=column)
+        return self
+
+    def gt(self, column, value):
+        self.call.update(gt=(column, value))
+        return self
+
+    def limit(self, count):
+        self.call.update(limit=count)
+        return self
+
+    def execute(self):
+        self.client.calls.append(self.call)
+        if self.call['op'] == 'select':
+            self.data = self.client.read(self.call)
+        return self
+
+
+class FakeClient:
+    def __init__(self, tables=None, max_rows=1000):
+        self.calls = []
+        self.tables = tables or {}
+        self.max_rows = max_rows
+
+    def read(self, call):
+        """Rows of a select, capped at max-rows like PostgREST"""
+        rows = sorted(self.tables.get(call['table'], []), key=lambda row: row[call['order']])
+        if 'gt' in call:
+            column, value = call['gt']
+            rows = [row for row in rows if row[column] > value]
+        return rows[:min(call['limit'], self.max_rows)]
+
+    def table(self, table_name):
+        return FakeQuery(self, table_name)
+
+    def ops(self, op):
+        return [call for call in self.calls if call['op'] == op]
+
+
+HEADER = 'english_word,malayalam_word,difficulty_level,category\n'
+
+
+def stored_hash(**row):
+    columns = content_columns(row, 'row_hash')
+    return row_hash(row[column] for column in columns)
+
+
+# Incremental sync tests
+def test_table_sync_inserts_updates_and_skips_unchanged():
+    """Test only new and edited rows are upserted, in batches"""
+    client = FakeClient()
+    existing = {
+        'manga': stored_hash(english_word='mango', malayalam_word='manga', difficulty_level=1, category='Fruits'),
+        'pazham': 'outdated-hash',
+    }
+    sheet = HEADER + 'mango,manga,1,Fruits\nbanana,pazham,1,Fruits\nrice,chore,2,Food\nbeans,kadala,,\n'
+
+    stats = TableSync(client, 'word_matching', 'malayalam_word', existing, chunk_size=2).run(io.StringIO(sheet))
+
+    assert (stats.inserted, stats.updated, stats.unchanged, stats.deleted, stats.invalid) == (2, 1, 1, 0, 0)
+    upserts = client.ops('upsert')
+    assert [len(call['rows']) for call in upserts] == [2, 1]
+    assert all(call['on_conflict'] == 'malayalam_word' for call in upserts)
+    written = {row['malayalam_word']: row for call in upserts for row in call['rows']}
+    assert sorted(written) == ['chore', 'kadala', 'pazham']
+    assert written['kadala']['difficulty_level'] is None
+    assert written['chore']['difficulty_level'] == 2
+    assert client.ops('delete') == []
+
+
+def test_table_sync_deletes_missing_keys():
+    """Test keys gone from the sheet are deleted in chunks"""
+    client = FakeClient()
+    existing = {'manga': None, 'pazham': None, 'chore': None, 'kadala': None}
+    sheet = HEADER + 'mango,manga,1,Fruits\n'
+
+    stats = TableSync(client, 'word_matching', 'malayalam_word', existing, chunk_size=2).run(io.StringIO(sheet))
+
+    assert stats.deleted == 3
+    deletes = client.ops('delete')
+    assert all(call['column'] == 'malayalam_word' for call in deletes)
+    assert sorted(key for call in deletes for key in call['values']) == ['chore', 'kadala', 'pazham']
+    assert [len(call['values']) for call in deletes] == [2, 1]
+
+
+def test_table_sync_duplicate_and_invalid_rows():
+    """Test the last duplicate wins and invalid rows are skipped without deleting their key"""
+    client = FakeClient()
+    existing = {'manga': 'old', 'pazham': 'old'}
+    sheet = (HEADER
+             + 'mango,manga,1,Fruits\n'
+             + 'green mango,manga,1,Fruits\n'
+             + 'banana,pazham,not-a-number,Fruits\n'
+             + ',chore,1,Food\n'
+             + '\n')
+
+    stats = TableSync(client, 'word_matching', 'malayalam_word', existing).run(io.StringIO(sheet))
+
+    assert stats.invalid == 2
+    rows = [row for call in client.ops('upsert') for row in call['rows']]
+    assert [(row['malayalam_word'], row['english_word']) for row in rows] == [('manga', 'green mango')]
+    # pazham failed validation but is still in the sheet, so it is kept
+    assert client.ops('delete') == []
+
+
+@pytest.mark.parametrize('sheet', ['', 'malayalam_word\n', HEADER, HEADER + '\n,,,\n'])
+def test_table_sync_refuses_to_empty_the_table(sheet):
+    """Test a sheet without its header or without rows deletes nothing"""
+    client = FakeClient()
+    existing = {'manga': 'hash', 'pazham': 'hash'}
+
+    with pytest.raises(ValueError):
+        TableSync(client, 'word_matching', 'malayalam_word', existing).run(io.StringIO(sheet))
+    assert client.calls == []
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=b'', headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.encoding = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+
+class FakeSession:
+    """Serves queued responses per URL and records the request headers"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        return self.responses[url].pop(0)
+
+
+SHEET_URL = 'https://sheets.example/words.csv'
+
+
+def make_fetcher(tmp_path, responses):
+    from sheet_fetcher import SheetFetcher
+    fetcher = SheetFetcher(str(tmp_path / 'state' / 'sync_state.json'))
+    fetcher.session = FakeSession(responses)
+    return fetcher
+
+
+# Sheet download tests
+def test_fetcher_sends_validators_and_skips_on_304(tmp_path):
+    """Test the stored ETag and Last-Modified are sent back and a 304 skips the sheet"""
+    from sheet_fetcher import CHANGED, UNCHANGED
+    validators = {'ETag': '"v1"', 'Last-Modified': 'Sat, 17 Oct 2026 10:00:00 GMT'}
+    fetcher = make_fetcher(tmp_path, {SHEET_URL: [
+        FakeResponse(200, (HEADER + 'mango,manga,1,Fruits\n').encode(), validators),
+        FakeResponse(304),
+    ]})
+
+    first = fetcher.fetch(SHEET_URL)
+    assert first.status == CHANGED
+    assert first.validators['etag'] == '"v1"'
+    assert 'manga' in first.open_text().read()
+    first.close()
+    fetcher.mark_synced(first)
+
+    second = fetcher.fetch(SHEET_URL)
+    assert second.status == UNCHANGED
+    assert second.body is None
+    assert fetcher.session.requests[0][1] == {}
+    assert fetcher.session.requests[1][1] == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Sat, 17 Oct 2026 10:00:00 GMT',
+    }
+
+
+def test_fetcher_skips_unchanged_body_without_validators(tmp_path):
+    """Test a server that ignores validators is caught by the body hash"""
+    from sheet_fetcher import CHANGED, UNCHANGED
+    body = (HEADER + 'mango,manga,1,Fruits\n').encode()
+    fetcher = make_fetcher(tmp_path, {SHEET_URL: [
+        FakeResponse(200, body),
+        FakeResponse(200, body),
+        FakeResponse(200, body + b'rice,chore,2,Food\n'),
+    ]})
+
+    first = fetcher.fetch(SHEET_URL)
+    first.close()
+    fetcher.mark_synced(first)
+
+    assert fetcher.fetch(SHEET_URL).status == UNCHANGED
+    changed = fetcher.fetch(SHEET_URL)
+    assert changed.status == CHANGED
+    assert changed.open_text().read().endswith('rice,chore,2,Food\n')
+    changed.close()
+
+
+def test_fetcher_state_persists_only_for_synced_sheets(tmp_path):
+    """Test validators survive a restart once marked synced, and a failed sync refetches"""
+    from sheet_fetcher import CHANGED
+    other_url = 'https://sheets.example/sentences.csv'
+    fetcher = make_fetcher(tmp_path, {
+        SHEET_URL: [FakeResponse(200, b'a', {'ETag': '"v1"'})],
+        other_url: [FakeResponse(200, b'b', {'ETag': '"w1"'})],
+    })
+    results = fetcher.fetch_all([SHEET_URL, other_url])
+    # Only the first sheet reached Supabase
+    fetcher.mark_synced(results[SHEET_URL])
+    for result in results.values():
+        result.close()
+    fetcher.save_state()
+
+    restarted = make_fetcher(tmp_path, {
+        SHEET_URL: [FakeResponse(304)],
+        other_url: [FakeResponse(200, b'b', {'ETag': '"w1"'})],
+    })
+    assert restarted.state[SHEET_URL]['etag'] == '"v1"'
+    assert other_url not in restarted.state
+    assert restarted.fetch(other_url).status == CHANGED
+    assert not (tmp_path / 'state' / 'sync_state.json.tmp').exists()
+
+
+def test_fetcher_ignores_unreadable_state(tmp_path):
+    """Test a corrupt state file falls back to a full download"""
+    state_path = tmp_path / 'state' / 'sync_state.json'
+    state_path.parent.mkdir()
+    state_path.write_text('{not json')
+
+    fetcher = make_fetcher(tmp_path, {})
+
+    assert fetcher.state == {}
+
+
+def test_tables_sharing_a_sheet_download_it_once(tmp_path):
+    """Test two tables set to the same sheet share one download and both sync from it"""
+    import sync_sheets_data
+    from unittest.mock import patch
+    sheet = (HEADER + 'mango,manga,1,Fruits\nrice,chore,2,Food\n').encode()
+    fetcher = make_fetcher(tmp_path, {SHEET_URL: [FakeResponse(200, sheet, {'ETag': '"v1"'})]})
+    client = FakeClient()
+    failed_tables = []
+
+    with patch.multiple(sync_sheets_data, SHEET_URLS=[SHEET_URL, SHEET_URL],
+                        TABLE_NAME=['word_matching', 'word_matching_review'],
+                        KEY_COLUMNS=['malayalam_word'], fetcher=fetcher, bundle_writer=None,
+                        CATALOG_EVENTS_DIR='', get_existing_data=lambda *args: {}):
+        results = fetcher.fetch_all(sync_sheets_data.SHEET_URLS)
+        try:
+            sync_sheets_data.sync_tables(client, results, failed_tables)
+        finally:
+            for result in results.values():
+                result.close()
+
+    assert len(fetcher.session.requests) == 1
+    assert failed_tables == []
+    written = {}
+    for call in client.ops('upsert'):
+        written.setdefault(call['table'], []).extend(row['malayalam_word'] for row in call['rows'])
+    assert written == {'word_matching': ['manga', 'chore'], 'word_matching_review': ['manga', 'chore']}
+    assert fetcher.state[SHEET_URL]['etag'] == '"v1"'
+
+
+# Daemon scheduling tests
+def test_daemon_skips_run_while_lock_is_held(tmp_path):
+    """Test a run is skipped, not counted as a failure, while another process holds the lock"""
+    import fcntl
+    from sync_daemon import SyncDaemon
+    runs = []
+    lock_path = str(tmp_path / 'sync.lock')
+    daemon = SyncDaemon(lambda: runs.append(1), lock_path=lock_path)
+
+    with open(lock_path, 'w') as held:
+        fcntl.flock(held, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert daemon.run_once() is False
+        assert runs == []
+        assert daemon.failures == 0
+
+    assert daemon.run_once() is True
+    assert runs == [1]
+
+
+def test_daemon_backoff_grows_and_resets(tmp_path):
+    """Test failures back off exponentially up to the cap and a success restores the interval"""
+    from sync_daemon import SyncDaemon
+    outcomes = [False, False, False, False, True]
+
+    def run_sync():
+        if not outcomes.pop(0):
+            raise RuntimeError("Sync failed for: word_matching")
+
+    daemon = SyncDaemon(run_sync, interval=7200, jitter=0, retry_delay=60, max_backoff=200,
+                        lock_path=str(tmp_path / 'sync.lock'))
+
+    delays = []
+    for _ in range(5):
+        daemon.run_once()
+        delays.append(daemon.next_delay())
+
+    assert delays == [60, 120, 200, 200, 7200]
+    assert daemon.failures == 0
+    assert daemon.last_success_at is not None
+
+
+def test_daemon_sigusr1_runs_immediately(tmp_path):
+    """Test SIGUSR1 cuts the wait short and runs the next sync straight away"""
+    import os
+    import signal
+    import time
+    from sync_daemon import SyncDaemon
+    runs = []
+
+    def run_sync():
+        runs.append(time.monotonic())
+        if len(runs) == 1:
+            os.kill(os.getpid(), signal.SIGUSR1)
+        else:
+            daemon.stop()
+
+    daemon = SyncDaemon(run_sync, interval=5, jitter=0, lock_path=str(tmp_path / 'sync.lock'),
+                        trigger_port=0)
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGUSR1, signal.SIGTERM, signal.SIGINT)}
+    try:
+        daemon.run_forever()
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+    assert len(runs) == 2
+    assert runs[1] - runs[0] < 2
+
+
+def test_daemon_http_trigger_and_status(tmp_path):
+    """Test POST /sync schedules a run and GET /status reports the daemon state"""
+    import json
+    import socket
+    import urllib.request
+    from sync_daemon import SyncDaemon
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    daemon = SyncDaemon(lambda: None, lock_path=str(tmp_path / 'sync.lock'), trigger_port=port)
+    daemon.run_once()
+
+    server = daemon._start_trigger_server()
+    try:
+        request = urllib.request.Request(f'http://127.0.0.1:{port}/sync', method='POST')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 202
+        assert daemon._wakeup.is_set()
+
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/status', timeout=5) as response:
+            status = json.load(response)
+        assert status['failures'] == 0
+        assert status['running'] is False
+        assert status['last_success_at'] is not None
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# Static bundle tests
+BUNDLE_ROWS = [
+    {'id': 2, 'english_word': 'rice', 'malayalam_word': 'chore', 'difficulty_level': 2, 'category': 'Food',
+     'row_hash': 'h2', 'created_at': '2026-10-01T00:00:00Z'},
+    {'id': 1, 'english_word': 'mango', 'malayalam_word': 'manga', 'difficulty_level': 1, 'category': 'Fruits',
+     'row_hash': 'h1', 'created_at': '2026-10-01T00:00:00Z'},
+    {'id': 3, 'english_word': 'banana', 'malayalam_word': 'pazham', 'difficulty_level': 1, 'category': 'fruits ',
+     'row_hash': 'h3', 'created_at': '2026-10-01T00:00:00Z'},
+]
+
+
+def test_bundles_are_content_addressed_and_precompressed(tmp_path):
+    """Test each bundle is named by its hash and has matching .gz and .br copies"""
+    import gzip
+    import hashlib
+    import json
+    import brotli
+    from bundle_writer import BundleWriter
+
+    writer = BundleWriter(str(tmp_path), hash_column='row_hash')
+    entry = writer.write('word_matching', BUNDLE_ROWS)
+
+    bundles = [entry['all'], *entry['category'].values(), *entry['difficulty'].values()]
+    for bundle in bundles:
+        path = tmp_path / bundle['path']
+        body = path.read_bytes()
+        assert bundle['hash'] == hashlib.sha256(body).hexdigest()[:16]
+        assert path.name.endswith(f".{bundle['hash']}.json")
+        assert gzip.decompress((tmp_path / (bundle['path'] + '.gz')).read_bytes()) == body
+        assert brotli.decompress((tmp_path / (bundle['path'] + '.br')).read_bytes()) == body
+
+    data = json.loads((tmp_path / entry['all']['path']).read_bytes())
+    assert data['table'] == 'word_matching'
+    assert [row['id'] for row in data['data']] == [1, 2, 3]
+    assert all('row_hash' not in row and 'created_at' not in row for row in data['data'])
+    assert sorted(entry['category']) == ['food', 'fruits']
+    assert entry['category']['fruits']['rows'] == 2
+    assert sorted(entry['difficulty']) == ['1', '2']
+
+    # Same rows in any order give the same files
+    assert writer.write('word_matching', list(reversed(BUNDLE_ROWS)))['all'] == entry['all']
+
+
+def test_bundle_manifest_lists_every_table(tmp_path):
+    """Test the manifest points at the current bundles of each table"""
+    import json
+    from bundle_writer import MANIFEST_NAME, BundleWriter
+
+    writer = BundleWriter(str(tmp_path), hash_column='row_hash')
+    assert not writer.has_bundles('word_matching')
+    words = writer.write('word_matching', BUNDLE_ROWS)
+    review = writer.write('word_matching_review', BUNDLE_ROWS[:1])
+
+    manifest = json.loads((tmp_path / MANIFEST_NAME).read_text())
+    assert manifest['tables'] == {'word_matching': words, 'word_matching_review': review}
+    assert words['version'] == words['all']['hash']
+    assert words['rows'] == 3
+    assert 'generated_at' in manifest
+    assert writer.has_bundles('word_matching')
+    assert not [name for name in (tmp_path).iterdir() if name.name.startswith('.tmp-')]
+
+
+def test_stale_bundles_are_removed_after_retention(tmp_path):
+    """Test replaced bundles stay for the retention window and are then deleted"""
+    import os
+    import time
+    from bundle_writer import BundleWriter
+
+    writer = BundleWriter(str(tmp_path), hash_column='row_hash', retention_seconds=3600)
+    old = writer.write('word_matching', BUNDLE_ROWS)
+    new = writer.write('word_matching', BUNDLE_ROWS[:2])
+    old_files = [tmp_path / (old['all']['path'] + suffix) for suffix in ('', '.gz', '.br')]
+    assert old['all']['path'] != new['all']['path']
+    # Clients holding the old manifest can still load the old bundle
+    assert all(path.exists() for path in old_files)
+
+    two_hours_ago = time.time() - 7200
+    for path in (tmp_path / 'word_matching').iterdir():
+        os.utime(path, (two_hours_ago, two_hours_ago))
+    writer.write('word_matching', BUNDLE_ROWS[:2])
+
+    assert not any(path.exists() for path in old_files)
+    # Still in the manifest, so kept however old
+    for suffix in ('', '.gz', '.br'):
+        assert (tmp_path / (new['all']['path'] + suffix)).exists()
+    assert (tmp_path / new['category']['fruits']['path']).exists()
+
+
+# Keyset pagination tests
+def test_select_all_reads_past_max_rows():
+    """Test a page size above PostgREST's max-rows still reads every row"""
+    from pagination import iter_pages, select_all
+    rows = [{'id': i, 'malayalam_word': f'word{i}'} for i in range(1, 2501)]
+    client = FakeClient({'word_matching': rows[::-1]}, max_rows=1000)
+
+    assert select_all(client, 'word_matching', page_size=5000) == rows
+    assert select_all(client, 'word_matching', page_size=5000, prefetch=0) == rows
+    assert [len(page) for page in iter_pages(client, 'word_matching', page_size=700, prefetch=0)] == [700, 700, 700, 400]
+    # Only the empty page ends the read
+    assert client.calls[-1]['gt'] == ('id', 2500)